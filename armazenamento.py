@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# O pyarrow é importado dentro das funções que o usam: importar este módulo
+# (por exemplo, em workers de pontuação) custa apenas o pandas.
+import os
+import pandas as pd
+
+import data_generator
+
+# Formatos colunares usados para persistir a base de clientes. O Parquet é o
+# padrão: comprime bem, guarda as colunas categóricas como dicionário e permite
+# ler apenas as colunas necessárias. Feather (Arrow IPC) é mais rápido para
+# leitura local, sem compressão pesada.
+FORMATOS_COLUNARES = {
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+}
+
+# O Excel continua suportado, mas apenas para importação e exportação.
+FORMATOS_EXCEL = ('.xlsx', '.xls')
+
+
+def _detectar_formato(caminho, formato=None):
+    """
+    Retorna o formato colunar ('parquet' ou 'feather') a partir da extensão do arquivo.
+    """
+    if formato is not None:
+        if formato not in set(FORMATOS_COLUNARES.values()):
+            raise ValueError(f"Formato '{formato}' não suportado. Use 'parquet' ou 'feather'.")
+        return formato
+
+    # Uma pasta é tratada como um dataset Parquet particionado (ex.: gerar_base_em_blocos)
+    if os.path.isdir(caminho):
+        return 'parquet'
+
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in FORMATOS_EXCEL:
+        raise ValueError(
+            f"O arquivo '{caminho}' é Excel. Use importar_excel/exportar_excel; "
+            "a base de trabalho deve ser salva em Parquet ou Feather."
+        )
+    if extensao not in FORMATOS_COLUNARES:
+        raise ValueError(f"Extensão '{extensao}' não suportada. Use .parquet, .feather ou .arrow.")
+    return FORMATOS_COLUNARES[extensao]
+
+
+def otimizar_categoricas(df):
+    """
+    Converte as colunas de texto para o dtype 'category'.
+
+    No Parquet e no Feather essas colunas são gravadas como dicionário
+    (códigos inteiros + tabela de valores), o que reduz o tamanho do arquivo
+    e o tempo de leitura, e voltam como 'category' ao carregar.
+
+    Args:
+        df (pd.DataFrame): DataFrame com a base de clientes.
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas de texto convertidas.
+    """
+    colunas_texto = df.select_dtypes(include=['object', 'string']).columns
+    if len(colunas_texto) == 0:
+        return df
+    return df.astype({col: 'category' for col in colunas_texto})
+
+
+def salvar_base(df, caminho, formato=None, compressao='snappy'):
+    """
+    Salva a base de clientes em formato colunar (Parquet por padrão).
+
+    Args:
+        df (pd.DataFrame): DataFrame a ser salvo.
+        caminho (str): Caminho do arquivo (.parquet, .feather ou .arrow).
+        formato (str, opcional): Força o formato ('parquet' ou 'feather').
+        compressao (str): Codec de compressão ('snappy', 'zstd', 'lz4' ou None).
+    """
+    formato = _detectar_formato(caminho, formato)
+    df = otimizar_categoricas(df)
+
+    if formato == 'parquet':
+        df.to_parquet(caminho, index=False, compression=compressao)
+    else:
+        # O Feather só aceita 'lz4', 'zstd' ou 'uncompressed'
+        compressao_feather = compressao if compressao in ('lz4', 'zstd') else 'uncompressed'
+        df.reset_index(drop=True).to_feather(caminho, compression=compressao_feather)
+    print(f"Base salva em '{caminho}' ({formato}).")
+
+
+def carregar_base(caminho, colunas=None, formato=None):
+    """
+    Carrega a base de clientes de um arquivo colunar.
+
+    Args:
+        caminho (str): Caminho do arquivo (.parquet, .feather ou .arrow) ou pasta com
+            um dataset Parquet particionado.
+        colunas (list, opcional): Lista de colunas a ler (projeção). Se None, lê todas.
+        formato (str, opcional): Força o formato ('parquet' ou 'feather').
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas solicitadas.
+    """
+    formato = _detectar_formato(caminho, formato)
+    if formato == 'parquet':
+        return pd.read_parquet(caminho, columns=colunas)
+    return pd.read_feather(caminho, columns=colunas)
+
+
+def listar_colunas(caminho):
+    """
+    Retorna os nomes das colunas da base sem ler os dados.
+    """
+    if os.path.splitext(caminho)[1].lower() == '.csv':
+        return pd.read_csv(caminho, nrows=0).columns.tolist()
+    import pyarrow.dataset as ds
+    formato = 'parquet' if _detectar_formato(caminho) == 'parquet' else 'ipc'
+    return ds.dataset(caminho, format=formato).schema.names
+
+
+def iterar_blocos(caminho, tamanho_bloco=500_000, colunas=None):
+    """
+    Lê a base em blocos de até tamanho_bloco linhas, sem carregá-la inteira na memória.
+
+    Aceita Parquet (arquivo ou pasta particionada), Feather/Arrow e CSV.
+
+    Args:
+        caminho (str): Caminho do arquivo ou pasta.
+        tamanho_bloco (int): Número máximo de linhas por bloco.
+        colunas (list, opcional): Colunas a ler (projeção).
+
+    Yields:
+        pd.DataFrame: Cada bloco da base.
+    """
+    if os.path.splitext(caminho)[1].lower() == '.csv':
+        yield from pd.read_csv(caminho, usecols=colunas, chunksize=tamanho_bloco)
+        return
+
+    import pyarrow.dataset as ds
+    formato = 'parquet' if _detectar_formato(caminho) == 'parquet' else 'ipc'
+    dataset = ds.dataset(caminho, format=formato)
+    for lote in dataset.to_batches(columns=colunas, batch_size=tamanho_bloco):
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+
+class EscritorEmBlocos:
+    """
+    Grava blocos de um DataFrame sequencialmente em um único arquivo Parquet ou CSV.
+
+    Uso:
+        with EscritorEmBlocos('saida.parquet') as escritor:
+            for bloco in blocos:
+                escritor.escrever(bloco)
+    """
+
+    def __init__(self, caminho, compressao='snappy'):
+        self.caminho = caminho
+        self.compressao = compressao
+        self.csv = os.path.splitext(caminho)[1].lower() == '.csv'
+        self._escritor = None
+        self._primeiro = True
+
+    def escrever(self, df):
+        if self.csv:
+            df.to_csv(self.caminho, mode='w' if self._primeiro else 'a', header=self._primeiro, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._escritor is None:
+                self._escritor = pq.ParquetWriter(self.caminho, tabela.schema, compression=self.compressao)
+            self._escritor.write_table(tabela)
+        self._primeiro = False
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def importar_excel(caminho_excel, caminho_destino=None):
+    """
+    Importa uma base em Excel e, opcionalmente, grava a cópia colunar de trabalho.
+
+    Args:
+        caminho_excel (str): Caminho do arquivo .xlsx.
+        caminho_destino (str, opcional): Caminho .parquet/.feather onde salvar a base importada.
+
+    Returns:
+        pd.DataFrame: DataFrame importado, com as colunas de texto como 'category'.
+    """
+    df = otimizar_categoricas(pd.read_excel(caminho_excel))
+    print(f"Base importada de '{caminho_excel}'.")
+    if caminho_destino is not None:
+        salvar_base(df, caminho_destino)
+    return df
+
+
+def exportar_excel(df, caminho_excel):
+    """
+    Exporta a base para Excel (uso apenas para compartilhamento/relatórios).
+    """
+    df.to_excel(caminho_excel, index=False)
+    print(f"Base exportada para '{caminho_excel}'.")
+
+
+def carregar_ou_gerar_base(caminho, n_clientes=30000, seed=42, caminho_excel=None):
+    """
+    Carrega a base colunar de trabalho; se ela não existir, importa o Excel
+    legado (quando informado e existente) ou gera uma nova base sintética.
+
+    Args:
+        caminho (str): Caminho da base colunar (.parquet, .feather ou .arrow).
+        n_clientes (int): Número de registros caso seja necessário gerar a base.
+        seed (int): Semente da geração sintética.
+        caminho_excel (str, opcional): Base Excel legada a ser importada uma única vez.
+
+    Returns:
+        pd.DataFrame: A base de clientes.
+    """
+    if os.path.exists(caminho):
+        print(f"Arquivo '{caminho}' encontrado. Carregando dados existentes...")
+        return carregar_base(caminho)
+
+    if caminho_excel is not None and os.path.exists(caminho_excel):
+        print(f"Arquivo '{caminho}' não encontrado. Importando a base legada '{caminho_excel}'...")
+        return importar_excel(caminho_excel, caminho_destino=caminho)
+
+    print(f"Arquivo '{caminho}' não encontrado. Gerando e salvando nova base de dados...")
+    df = otimizar_categoricas(data_generator.gerar_dados_sinteticos(n_clientes=n_clientes, seed=seed))
+    salvar_base(df, caminho)
+    return df
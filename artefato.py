@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+import preprocessing
+
+# Versão do formato do artefato salvo em disco
+VERSAO_ARTEFATO = 1
+# Arrays numéricos gravados no .npz para cada tipo de artefato
+ARRAYS_POR_TIPO = {
+    'kmeans': ('media', 'escala', 'centros'),
+    'densidade': ('media', 'escala', 'nucleos', 'labels_nucleos', 'normas_nucleos')
+}
+# Árvore KD dos artefatos de densidade, gravada ao lado do .npz
+EXTENSAO_INDICE = '.indice.pkl'
+# Teto (em MB) da matriz de distâncias de cada bloco da busca por força bruta
+MEMORIA_CONSULTA_MB = 64
+
+
+def montar_artefato(esquema, scaler, centros, nomes_segmentos=None):
+    """
+    Reúne tudo o que é necessário para segmentar novos clientes sem reajustar nada:
+    o esquema de codificação, as estatísticas do StandardScaler e os centróides do K-Means.
+
+    Args:
+        esquema (dict): Esquema de preprocessing.extrair_esquema.
+        scaler (StandardScaler): Scaler ajustado em preprocessing.padronizar_dados.
+        centros (np.ndarray): Centróides do K-Means no espaço padronizado (k x p).
+        nomes_segmentos (list, opcional): Nome de negócio de cada cluster.
+
+    Returns:
+        dict: O artefato ({'versao', 'tipo', 'esquema', 'media', 'escala', 'centros', 'nomes_segmentos'}).
+    """
+    centros = np.asarray(centros, dtype=np.float64)
+    if centros.shape[1] != len(esquema['colunas_modelo']):
+        raise ValueError("Os centróides não têm o mesmo número de colunas do esquema de codificação.")
+    return {
+        'versao': VERSAO_ARTEFATO,
+        'tipo': 'kmeans',
+        'esquema': esquema,
+        'media': np.asarray(scaler.mean_, dtype=np.float64),
+        'escala': np.asarray(scaler.scale_, dtype=np.float64),
+        'centros': centros,
+        'nomes_segmentos': list(nomes_segmentos) if nomes_segmentos is not None else None
+    }
+
+
+def montar_artefato_densidade(esquema, scaler, dados, labels, indices_nucleo, eps, min_samples,
+                              nomes_segmentos=None):
+    """
+    Artefato para estender um DBSCAN ajustado a novos clientes sem reajuste.
+
+    Guarda apenas os pontos núcleo e seus clusters: um cliente novo recebe o cluster
+    do núcleo mais próximo dentro de eps, ou -1 (ruído) se não houver núcleo a essa
+    distância, a mesma regra que o DBSCAN aplica aos pontos de borda.
+
+    O índice segue a regra de densidade.construir_indice: árvore KD até
+    densidade.MAX_DIMENSOES_ARVORE dimensões ('arvore_kd'); acima disso, onde as
+    árvores degeneram, força bruta em blocos sobre as normas pré-calculadas ('bruta').
+
+    Args:
+        esquema (dict): Esquema de preprocessing.extrair_esquema.
+        scaler (StandardScaler): Scaler ajustado em preprocessing.padronizar_dados.
+        dados (pd.DataFrame ou np.ndarray): Matriz padronizada usada no ajuste.
+        labels (np.ndarray): Rótulos do DBSCAN (-1 = ruído).
+        indices_nucleo (np.ndarray): Índices dos pontos núcleo (resumo['indices_nucleo']).
+        eps (float): Raio de vizinhança usado no ajuste.
+        min_samples (int): min_samples usado no ajuste (apenas informativo).
+        nomes_segmentos (list, opcional): Nome de negócio de cada cluster.
+
+    Returns:
+        dict: O artefato ({'versao', 'tipo', 'esquema', 'media', 'escala', 'nucleos',
+              'labels_nucleos', 'normas_nucleos', 'indice', 'eps', 'min_samples',
+              'nomes_segmentos'}).
+    """
+    # Importação local: só o ajuste precisa do motor de densidade (e do scikit-learn)
+    import densidade
+    indices_nucleo = np.asarray(indices_nucleo, dtype=np.int64)
+    nucleos = np.asarray(dados, dtype=np.float64)[indices_nucleo]
+    if nucleos.shape[1] != len(esquema['colunas_modelo']):
+        raise ValueError("Os núcleos não têm o mesmo número de colunas do esquema de codificação.")
+    return {
+        'versao': VERSAO_ARTEFATO,
+        'tipo': 'densidade',
+        'esquema': esquema,
+        'media': np.asarray(scaler.mean_, dtype=np.float64),
+        'escala': np.asarray(scaler.scale_, dtype=np.float64),
+        'nucleos': np.ascontiguousarray(nucleos),
+        'labels_nucleos': np.asarray(labels)[indices_nucleo].astype(np.int16),
+        'normas_nucleos': np.einsum('ij,ij->i', nucleos, nucleos),
+        'indice': 'arvore_kd' if nucleos.shape[1] <= densidade.MAX_DIMENSOES_ARVORE else 'bruta',
+        'eps': float(eps),
+        'min_samples': int(min_samples),
+        'nomes_segmentos': list(nomes_segmentos) if nomes_segmentos is not None else None
+    }
+
+
+def ajustar_artefato(df_clientes, n_clusters=4, modo_kmeans='completo'):
+    """
+    Ajusta o pipeline completo (codificação, padronização e K-Means) e devolve o artefato.
+
+    Returns:
+        tuple: (artefato, labels dos clientes de treino)
+    """
+    # Importação local: carregar e aplicar o artefato não exige o scikit-learn
+    import clustering_models
+    esquema = preprocessing.extrair_esquema(df_clientes)
+    _, df_features = preprocessing.selecionar_e_transformar_features(df_clientes, esquema=esquema)
+    df_padronizado, scaler = preprocessing.padronizar_dados(df_features, retornar_scaler=True)
+    labels, ajuste = clustering_models.aplicar_kmeans(df_padronizado, n_clusters, modo=modo_kmeans,
+                                                      retornar_modelo=True)
+    return montar_artefato(esquema, scaler, ajuste['centros']), labels
+
+
+def caminho_indice(caminho):
+    """
+    Caminho da árvore KD gravada ao lado do artefato de densidade.
+    """
+    return os.path.splitext(caminho)[0] + EXTENSAO_INDICE
+
+
+def salvar_artefato(artefato, caminho):
+    """
+    Salva o artefato em um único arquivo .npz compactado: os arrays numéricos em
+    formato binário e o esquema/metadados em JSON. Artefatos de densidade com
+    árvore KD gravam também a árvore ao lado (caminho_indice), para não reconstruí-la
+    a cada carga.
+    """
+    tipo = artefato.get('tipo', 'kmeans')
+    metadados = {
+        'versao': artefato['versao'],
+        'tipo': tipo,
+        'esquema': artefato['esquema'],
+        'nomes_segmentos': artefato['nomes_segmentos']
+    }
+    if tipo == 'densidade':
+        metadados.update(eps=artefato['eps'], min_samples=artefato['min_samples'], indice=artefato['indice'])
+    np.savez_compressed(
+        caminho,
+        metadados=np.array(json.dumps(metadados, ensure_ascii=False)),
+        **{nome: artefato[nome] for nome in ARRAYS_POR_TIPO[tipo]}
+    )
+    if tipo == 'densidade' and artefato['indice'] == 'arvore_kd':
+        # Escrita atômica, como no cache de etapas
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)), suffix='.tmp')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            pickle.dump(indice_nucleos(artefato), arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho_indice(caminho))
+    print(f"Artefato de segmentação salvo em '{caminho}'.")
+
+
+def carregar_artefato(caminho):
+    """
+    Carrega um artefato salvo por salvar_artefato (K-Means ou densidade).
+
+    Em artefatos de densidade com árvore KD, a árvore gravada ao lado do .npz é
+    reaproveitada se corresponder aos núcleos; caso contrário, é reconstruída na
+    primeira consulta. Esse arquivo usa pickle: carregue apenas artefatos de origem confiável.
+    """
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        metadados = json.loads(str(arquivo['metadados']))
+        if metadados['versao'] > VERSAO_ARTEFATO:
+            raise ValueError(f"Artefato na versão {metadados['versao']}, mais nova que a suportada ({VERSAO_ARTEFATO}).")
+        # Artefatos anteriores ao tipo 'densidade' não gravavam o tipo
+        metadados.setdefault('tipo', 'kmeans')
+        modelo = {
+            **metadados,
+            **{nome: arquivo[nome] for nome in ARRAYS_POR_TIPO[metadados['tipo']]}
+        }
+    if modelo['tipo'] == 'densidade' and modelo['indice'] == 'arvore_kd' and os.path.exists(caminho_indice(caminho)):
+        try:
+            with open(caminho_indice(caminho), 'rb') as arquivo:
+                arvore = pickle.load(arquivo)
+            if np.array_equal(arvore.data, modelo['nucleos']):
+                modelo['arvore'] = arvore
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            # Arquivo ausente, corrompido ou de outra versão: a árvore é reconstruída
+            pass
+    return modelo
+
+
+def transformar(artefato, df, dtype=np.float64):
+    """
+    Codifica e padroniza novos clientes com o esquema e as estatísticas do artefato.
+
+    Returns:
+        np.ndarray: Matriz padronizada (n x p).
+    """
+    matriz = preprocessing.codificar_com_esquema(df, artefato['esquema'], dtype=dtype)
+    matriz -= artefato['media'].astype(dtype)
+    matriz /= artefato['escala'].astype(dtype)
+    return matriz
+
+
+def indice_nucleos(artefato):
+    """
+    Árvore KD (scipy.spatial.cKDTree) sobre os núcleos de um artefato de densidade
+    com indice='arvore_kd': a gravada por salvar_artefato ou, na falta dela, uma
+    construída na primeira consulta e reaproveitada pelas seguintes.
+    """
+    if artefato.get('arvore') is None:
+        # Importação local: apenas artefatos de densidade precisam do scipy
+        from scipy.spatial import cKDTree
+        artefato['arvore'] = cKDTree(artefato['nucleos'])
+    return artefato['arvore']
+
+
+def _nucleo_mais_proximo(artefato, matriz):
+    """
+    Núcleo mais próximo de cada linha por força bruta em blocos.
+
+    ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2: com as normas dos núcleos pré-calculadas,
+    cada bloco é um único produto de matrizes (BLAS), limitado a MEMORIA_CONSULTA_MB.
+    A distância ao núcleo escolhido é recalculada diretamente, sem o cancelamento da expansão.
+
+    Returns:
+        tuple: (distâncias, índices dos núcleos)
+    """
+    nucleos, normas = artefato['nucleos'], artefato['normas_nucleos']
+    linhas_por_bloco = max(1, int(MEMORIA_CONSULTA_MB * 2**20 // (8 * len(nucleos))))
+    indices = np.empty(len(matriz), dtype=np.int64)
+    for inicio in range(0, len(matriz), linhas_por_bloco):
+        bloco = matriz[inicio:inicio + linhas_por_bloco]
+        # ||x||^2 é constante em cada linha e não muda o argmin
+        indices[inicio:inicio + linhas_por_bloco] = (normas[None, :] - 2 * bloco @ nucleos.T).argmin(axis=1)
+    diferencas = matriz - nucleos[indices]
+    distancias = np.sqrt(np.einsum('ij,ij->i', diferencas, diferencas))
+    return distancias, indices
+
+
+def atribuir_por_densidade(artefato, matriz, n_jobs=1):
+    """
+    Atribui cada linha de uma matriz já padronizada ao cluster do núcleo mais
+    próximo dentro de eps; linhas sem núcleo a essa distância recebem -1 (ruído).
+
+    A consulta é vetorizada para o bloco inteiro: na árvore KD a busca é podada em
+    eps; na força bruta (mais de densidade.MAX_DIMENSOES_ARVORE dimensões) cada
+    bloco de linhas é um produto de matrizes contra todos os núcleos.
+
+    Args:
+        artefato (dict): Artefato de montar_artefato_densidade ou carregar_artefato.
+        matriz (np.ndarray): Clientes no espaço padronizado (n x p).
+        n_jobs (int): Threads da consulta na árvore KD (-1 = todos os núcleos).
+
+    Returns:
+        tuple: (labels int16, distâncias ao núcleo atribuído; np.inf para ruído)
+    """
+    matriz = np.atleast_2d(np.asarray(matriz, dtype=np.float64))
+    eps = artefato['eps']
+    if artefato['indice'] == 'arvore_kd':
+        # O limite do cKDTree é estrito; o DBSCAN inclui vizinhos à distância exata eps
+        distancias, indices = indice_nucleos(artefato).query(
+            matriz, k=1, distance_upper_bound=np.nextafter(eps, np.inf), workers=n_jobs
+        )
+    else:
+        distancias, indices = _nucleo_mais_proximo(artefato, matriz)
+    dentro = distancias <= eps
+    labels = np.full(len(matriz), -1, dtype=np.int16)
+    labels[dentro] = artefato['labels_nucleos'][indices[dentro]]
+    return labels, np.where(dentro, distancias, np.inf)
+
+
+def atribuir_segmentos(artefato, df):
+    """
+    Atribui cada cliente ao segmento mais próximo: o centróide do K-Means ou, em
+    artefatos de densidade, o cluster do núcleo mais próximo dentro de eps (-1 = ruído).
+
+    Returns:
+        tuple: (labels, distâncias ao centróide/núcleo atribuído)
+    """
+    matriz = transformar(artefato, df)
+    if artefato.get('tipo', 'kmeans') == 'densidade':
+        return atribuir_por_densidade(artefato, matriz)
+    centros = artefato['centros']
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, vetorizado para o bloco inteiro
+    distancias = (
+        np.einsum('ij,ij->i', matriz, matriz)[:, None]
+        - 2 * matriz @ centros.T
+        + np.einsum('ij,ij->i', centros, centros)[None, :]
+    )
+    labels = distancias.argmin(axis=1).astype(np.int16)
+    minimas = np.sqrt(np.maximum(distancias[np.arange(len(labels)), labels], 0))
+    return labels, minimas
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do tempo de carga da base de clientes: Excel (caminho legado)
+contra Parquet e Feather, incluindo leitura com projeção de colunas.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_armazenamento --n-clientes 30000 --repeticoes 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import armazenamento
+import data_generator
+
+COLUNAS_PERFIL = ['idade', 'renda_mensal', 'score_credito', 'tempo_de_debito_meses', 'valor_divida']
+
+
+def _cronometrar(funcao, repeticoes):
+    """
+    Executa a função várias vezes e retorna o menor tempo (em segundos).
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def executar(n_clientes=30000, repeticoes=3, incluir_excel=True):
+    """
+    Grava a mesma base em cada formato e mede o tempo de leitura.
+
+    Returns:
+        pd.DataFrame: Tabela com formato, tamanho do arquivo e tempos de carga.
+    """
+    df = armazenamento.otimizar_categoricas(data_generator.gerar_dados_sinteticos(n_clientes=n_clientes, seed=42))
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = {
+            'parquet': os.path.join(pasta, 'base.parquet'),
+            'feather': os.path.join(pasta, 'base.feather'),
+        }
+        for caminho in caminhos.values():
+            armazenamento.salvar_base(df, caminho)
+
+        if incluir_excel:
+            caminho_excel = os.path.join(pasta, 'base.xlsx')
+            armazenamento.exportar_excel(df, caminho_excel)
+            resultados.append({
+                'formato': 'xlsx',
+                'tamanho_mb': os.path.getsize(caminho_excel) / 1e6,
+                'carga_completa_s': _cronometrar(lambda: pd.read_excel(caminho_excel), repeticoes),
+                'carga_projecao_s': _cronometrar(lambda: pd.read_excel(caminho_excel, usecols=COLUNAS_PERFIL), repeticoes),
+            })
+
+        for formato, caminho in caminhos.items():
+            resultados.append({
+                'formato': formato,
+                'tamanho_mb': os.path.getsize(caminho) / 1e6,
+                'carga_completa_s': _cronometrar(lambda: armazenamento.carregar_base(caminho), repeticoes),
+                'carga_projecao_s': _cronometrar(
+                    lambda: armazenamento.carregar_base(caminho, colunas=COLUNAS_PERFIL), repeticoes
+                ),
+            })
+
+    df_resultados = pd.DataFrame(resultados).set_index('formato')
+    if incluir_excel:
+        df_resultados['speedup_vs_xlsx'] = df_resultados.loc['xlsx', 'carga_completa_s'] / df_resultados['carga_completa_s']
+    return df_resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de carga: Excel x Parquet x Feather.")
+    parser.add_argument('--n-clientes', type=int, default=30000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-excel', action='store_true', help="Pula o Excel (útil para bases muito grandes).")
+    args = parser.parse_args()
+
+    tabela = executar(args.n_clientes, args.repeticoes, incluir_excel=not args.sem_excel)
+    print(f"\nTempo de carga para {args.n_clientes} clientes (melhor de {args.repeticoes}):")
+    print(tabela.to_string(float_format=lambda v: f"{v:.4f}"))
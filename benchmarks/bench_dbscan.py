@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos índices de vizinhança do DBSCAN indexado (densidade.dbscan_indexado):
+força bruta em blocos, ball tree e KD-tree sobre a mesma matriz padronizada,
+com o tempo de cada um e a conferência de que os rótulos são idênticos.
+
+É a medição por trás da regra de densidade.construir_indice(algoritmo='auto'):
+nas 21 colunas do pipeline, a força bruta é a mais rápida.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_dbscan --tamanhos 30000 100000 --eps 2.5 --min-samples 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_generator
+import densidade
+import preprocessing
+
+ALGORITMOS = ('brute', 'ball_tree', 'kd_tree')
+
+
+def _preparar_dados(n_clientes):
+    """
+    Gera a base sintética e devolve a matriz padronizada.
+    """
+    df = data_generator.gerar_dados_sinteticos(n_clientes=n_clientes, seed=42)
+    _, df_features = preprocessing.selecionar_e_transformar_features(df)
+    return preprocessing.padronizar_dados(df_features).to_numpy()
+
+
+def executar(tamanhos, eps=2.5, min_samples=20, algoritmos=ALGORITMOS):
+    """
+    Mede o DBSCAN indexado com cada tipo de índice para cada tamanho de base.
+
+    Returns:
+        pd.DataFrame: Uma linha por tamanho e algoritmo, com o tempo (construção do
+                      índice incluída), o número de clusters e se os rótulos coincidem
+                      com os do primeiro algoritmo.
+    """
+    resultados = []
+    for n in tamanhos:
+        X = _preparar_dados(n)
+        referencia = None
+        for algoritmo in algoritmos:
+            inicio = time.perf_counter()
+            labels, resumo = densidade.dbscan_indexado(X, eps=eps, min_samples=min_samples, algoritmo=algoritmo)
+            tempo = time.perf_counter() - inicio
+            if referencia is None:
+                referencia = labels
+            linha = {'n_linhas': n, 'algoritmo': algoritmo, 'n_dimensoes': X.shape[1], 'tempo_s': tempo,
+                     'n_clusters': resumo['n_clusters'], 'rotulos_iguais': bool(np.array_equal(labels, referencia))}
+            resultados.append(linha)
+            print(linha)
+    return pd.DataFrame(resultados).set_index(['n_linhas', 'algoritmo'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark dos índices de vizinhança do DBSCAN indexado.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[30_000])
+    parser.add_argument('--eps', type=float, default=2.5)
+    parser.add_argument('--min-samples', type=int, default=20)
+    parser.add_argument('--algoritmos', nargs='+', default=list(ALGORITMOS), choices=ALGORITMOS)
+    args = parser.parse_args()
+
+    tabela = executar(args.tamanhos, args.eps, args.min_samples, args.algoritmos)
+    print("\nDBSCAN indexado por tipo de índice:")
+    print(tabela.to_string(float_format=lambda v: f"{v:.2f}"))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de tempo de importação (partida a frio) dos módulos usados pela CLI e
+pelos workers, com orçamentos em milissegundos.
+
+Cada módulo é importado em um interpretador novo com `python -X importtime`;
+o tempo considerado é o acumulado da linha do próprio módulo (mínimo entre as
+repetições). O benchmark também verifica que a importação não carrega
+bibliotecas proibidas para aquele módulo e não cria arquivos ou diretórios.
+Termina com código de saída 1 se algum orçamento ou regra for violado.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_importacao --repeticoes 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Orçamento (ms) de importação a frio de cada módulo
+ORCAMENTOS_MS = {
+    'pontuar': 800,
+    'artefato': 800,
+    'armazenamento': 800,
+    'preprocessing': 800,
+    'visualization': 800,
+    'clustering_models': 3000,
+    'evaluation': 3000,
+    'main': 4000,
+}
+
+# Bibliotecas que a importação de cada módulo não pode carregar
+PROIBIDOS = {
+    'pontuar': ('streamlit', 'matplotlib', 'seaborn', 'sklearn', 'pyarrow.dataset'),
+    'artefato': ('streamlit', 'matplotlib', 'seaborn', 'sklearn'),
+    'armazenamento': ('streamlit', 'matplotlib', 'seaborn', 'sklearn', 'pyarrow.dataset'),
+    'preprocessing': ('streamlit', 'matplotlib', 'seaborn', 'sklearn'),
+    'visualization': ('streamlit', 'matplotlib', 'seaborn', 'sklearn'),
+    'clustering_models': ('streamlit', 'matplotlib', 'seaborn'),
+    'evaluation': ('streamlit', 'matplotlib', 'seaborn'),
+    'main': ('streamlit',),
+}
+
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| (\S+)$')
+
+
+def medir_importacao(modulo):
+    """
+    Importa o módulo em um processo novo, com o diretório de trabalho vazio.
+
+    Returns:
+        dict: {'tempo_ms', 'carregados': bibliotecas proibidas carregadas, 'arquivos_criados'}
+    """
+    proibidos = PROIBIDOS.get(modulo, ())
+    codigo = (
+        f"import sys; sys.path.insert(0, {RAIZ!r}); import {modulo}; "
+        f"import json; print(json.dumps([m for m in {list(proibidos)!r} if m in sys.modules]))"
+    )
+    with tempfile.TemporaryDirectory() as pasta:
+        processo = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo],
+            cwd=pasta, capture_output=True, text=True, check=True
+        )
+        arquivos_criados = sorted(os.listdir(pasta))
+
+    tempo_us = None
+    for linha in processo.stderr.splitlines():
+        casamento = _LINHA_IMPORTTIME.match(linha)
+        if casamento and casamento.group(2) == modulo:
+            tempo_us = int(casamento.group(1))
+    return {
+        'tempo_ms': tempo_us / 1000 if tempo_us is not None else float('nan'),
+        'carregados': json.loads(processo.stdout.strip().splitlines()[-1]),
+        'arquivos_criados': arquivos_criados
+    }
+
+
+def executar(modulos, repeticoes=3):
+    """
+    Mede cada módulo e compara com o orçamento.
+
+    Returns:
+        pd.DataFrame: Uma linha por módulo com tempo mínimo, orçamento e violações.
+    """
+    resultados = []
+    for modulo in modulos:
+        medicoes = [medir_importacao(modulo) for _ in range(repeticoes)]
+        tempo = min(m['tempo_ms'] for m in medicoes)
+        carregados = sorted({b for m in medicoes for b in m['carregados']})
+        arquivos = sorted({a for m in medicoes for a in m['arquivos_criados']})
+        orcamento = ORCAMENTOS_MS.get(modulo)
+        resultados.append({
+            'modulo': modulo,
+            'tempo_ms': tempo,
+            'orcamento_ms': orcamento,
+            'bibliotecas_proibidas': ', '.join(carregados),
+            'efeitos_colaterais': ', '.join(arquivos),
+            'ok': (orcamento is None or tempo <= orcamento) and not carregados and not arquivos
+        })
+        print(f"{modulo}: {tempo:.0f} ms")
+    return pd.DataFrame(resultados).set_index('modulo')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de tempo de importação com orçamentos.")
+    parser.add_argument('--modulos', nargs='+', default=list(ORCAMENTOS_MS))
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    tabela = executar(args.modulos, args.repeticoes)
+    print("\nTempo de importação (partida a frio):")
+    print(tabela.to_string(float_format=lambda v: f"{v:.0f}"))
+    if not tabela['ok'].all():
+        print("\nOrçamento de importação violado.")
+        sys.exit(1)
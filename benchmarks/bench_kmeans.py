@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do K-Means completo (implementação atual) contra o modo minibatch:
+tempo de ajuste e diferença de inércia (WCSS sobre a base inteira).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_kmeans --tamanhos 30000 1000000 10000000 --k 4
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import clustering_models
+import data_generator
+import preprocessing
+
+
+def _preparar_dados(n_clientes):
+    """
+    Gera a base sintética e devolve a matriz padronizada.
+    """
+    df = data_generator.gerar_dados_sinteticos(n_clientes=n_clientes, seed=42)
+    _, df_features = preprocessing.selecionar_e_transformar_features(df)
+    return preprocessing.padronizar_dados(df_features).to_numpy()
+
+
+def executar(tamanhos, k=4, tamanho_lote=clustering_models.TAMANHO_LOTE_PADRAO, max_linhas_completo=None):
+    """
+    Mede tempo e inércia dos dois modos para cada tamanho de base.
+
+    Args:
+        tamanhos (list): Números de linhas avaliados.
+        k (int): Número de clusters.
+        tamanho_lote (int): Tamanho do lote do modo minibatch.
+        max_linhas_completo (int, opcional): Pula o modo completo acima deste tamanho.
+
+    Returns:
+        pd.DataFrame: Uma linha por tamanho com tempos, inércias e a diferença relativa.
+    """
+    resultados = []
+    for n in tamanhos:
+        X = _preparar_dados(n)
+        linha = {'n_linhas': n}
+
+        inicio = time.perf_counter()
+        minibatch = clustering_models.ajustar_kmeans(X, k, modo='minibatch', tamanho_lote=tamanho_lote)
+        linha['tempo_minibatch_s'] = time.perf_counter() - inicio
+        linha['inercia_minibatch'] = minibatch['inercia']
+
+        if max_linhas_completo is None or n <= max_linhas_completo:
+            inicio = time.perf_counter()
+            completo = clustering_models.ajustar_kmeans(X, k, modo='completo')
+            linha['tempo_completo_s'] = time.perf_counter() - inicio
+            linha['inercia_completo'] = completo['inercia']
+            linha['speedup'] = linha['tempo_completo_s'] / linha['tempo_minibatch_s']
+            linha['gap_inercia_pct'] = 100 * (minibatch['inercia'] - completo['inercia']) / completo['inercia']
+
+        resultados.append(linha)
+        print(f"n={n}: {linha}")
+    return pd.DataFrame(resultados).set_index('n_linhas')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark K-Means completo x minibatch.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[30_000, 1_000_000, 10_000_000])
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--tamanho-lote', type=int, default=clustering_models.TAMANHO_LOTE_PADRAO)
+    parser.add_argument('--max-linhas-completo', type=int, default=None,
+                        help="Pula o K-Means completo acima deste número de linhas.")
+    args = parser.parse_args()
+
+    tabela = executar(args.tamanhos, args.k, args.tamanho_lote, args.max_linhas_completo)
+    print("\nK-Means completo x minibatch:")
+    print(tabela.to_string(float_format=lambda v: f"{v:.4f}"))
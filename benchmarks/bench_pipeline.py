@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de todas as etapas públicas do pipeline em várias escalas de base,
+com tempo e pico de memória de cada função gravados em JSON e comparação entre
+duas execuções para detectar regressões.
+
+Para cada tamanho, a base é gerada por data_generator.gerar_dados_sinteticos e
+as etapas rodam na ordem do main.py, com os mesmos parâmetros. O tempo é o menor
+entre as repetições (sem rastreamento de memória); o pico de memória vem de uma
+execução extra medida com monitoramento.medir_etapa (tracemalloc). As figuras são
+gravadas em uma pasta temporária.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_pipeline --tamanhos 30000 300000 1000000 --saida bench_atual.json
+    python -m benchmarks.bench_pipeline --tamanhos 30000 --saida bench_atual.json --base bench_base.json
+    python -m benchmarks.bench_pipeline --comparar bench_base.json bench_atual.json --limite-pct 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import clustering_models
+import data_generator
+import evaluation
+import monitoramento
+import preprocessing
+import projecao
+import visualization
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Parâmetros dos modelos (os mesmos do main.py)
+N_CLUSTERS = 4
+EPS_DBSCAN = 2.5
+MIN_SAMPLES_DBSCAN = 20
+COLUNAS_DEMOGRAFICAS = ['idade', 'numero_dependentes']
+COLUNAS_FINANCEIRAS = ['renda_mensal', 'score_credito', 'historico_pagamento_recente',
+                       'tempo_de_debito_meses', 'valor_divida']
+COLUNAS_CATEGORICAS = ['sexo', 'estado_civil', 'nivel_educacional', 'tipo_emprego']
+FEATURES_RADAR = ['idade', 'renda_mensal', 'score_credito', 'tempo_de_debito_meses', 'valor_divida']
+
+# Regressão: piora relativa acima do limite e absoluta acima do piso (evita ruído em etapas rápidas)
+LIMITE_REGRESSAO_PCT = 20.0
+PISO_TEMPO_S = 0.05
+PISO_MEMORIA_MB = 1.0
+
+
+def _labels(ctx):
+    return {'K-Means': ctx['kmeans'], 'Hierárquico': ctx['hierarquico'], 'DBSCAN': ctx['dbscan']}
+
+
+def _fechar(fig=None):
+    """
+    Fecha as figuras criadas pela etapa (o benchmark não as exibe).
+    """
+    import matplotlib.pyplot as plt
+    plt.close('all')
+    return fig
+
+
+# Etapas na ordem do pipeline: (nome, chave do resultado no contexto, chaves requeridas, função(ctx))
+ETAPAS = [
+    ('selecionar_e_transformar_features', 'features', ('base',),
+     lambda ctx: preprocessing.selecionar_e_transformar_features(ctx['base'])),
+    ('padronizar_dados', 'padronizado', ('features',),
+     lambda ctx: preprocessing.padronizar_dados(ctx['features'][1])),
+    ('encontrar_k_otimo', 'resultados_k', ('padronizado',),
+     lambda ctx: clustering_models.encontrar_k_otimo(ctx['padronizado'], max_k=ctx['max_k'], n_jobs=ctx['n_jobs'])),
+    ('aplicar_kmeans', 'kmeans', ('padronizado',),
+     lambda ctx: clustering_models.aplicar_kmeans(ctx['padronizado'], n_clusters=N_CLUSTERS)),
+    ('aplicar_cluster_hierarquico', 'hierarquico', ('padronizado',),
+     lambda ctx: clustering_models.aplicar_cluster_hierarquico(
+         ctx['padronizado'], n_clusters=N_CLUSTERS, modo='microclusters')[0]),
+    ('aplicar_dbscan', 'dbscan', ('padronizado',),
+     lambda ctx: clustering_models.aplicar_dbscan(
+         ctx['padronizado'], eps=EPS_DBSCAN, min_samples=MIN_SAMPLES_DBSCAN, modo='indexado')),
+    ('avaliar_modelos', None, ('padronizado', 'kmeans', 'hierarquico', 'dbscan'),
+     lambda ctx: evaluation.avaliar_modelos(ctx['padronizado'], _labels(ctx))),
+    ('perfilar_clusters', None, ('base', 'kmeans'),
+     lambda ctx: evaluation.perfilar_clusters(ctx['base'], ctx['kmeans'])),
+    ('analisar_perfis_clusters', None, ('features', 'kmeans'),
+     lambda ctx: evaluation.analisar_perfis_clusters(ctx['features'][0], ctx['kmeans'], 'K-Means')),
+    ('analisar_perfis_categoricos', None, ('base', 'kmeans'),
+     lambda ctx: evaluation.analisar_perfis_categoricos(ctx['base'], ctx['kmeans'], 'K-Means')),
+    ('projetar_pca', 'projecao', ('padronizado',),
+     lambda ctx: projecao.projetar_pca(ctx['padronizado'])),
+    ('plotar_matriz_correlacao', None, ('features',),
+     lambda ctx: _fechar(visualization.plotar_matriz_correlacao(ctx['features'][0]))),
+    ('plotar_distribuicoes_separadas', None, ('features',),
+     lambda ctx: _fechar(visualization.plotar_distribuicoes_separadas(
+         ctx['features'][0], COLUNAS_DEMOGRAFICAS, COLUNAS_FINANCEIRAS))),
+    ('plotar_categoricas', None, ('base',),
+     lambda ctx: _fechar(visualization.plotar_categoricas(ctx['base'], COLUNAS_CATEGORICAS))),
+    ('plotar_cotovelo_e_silhueta_juntos', None, ('resultados_k',),
+     lambda ctx: _fechar(visualization.plotar_cotovelo_e_silhueta_juntos(ctx['resultados_k']))),
+    ('plotar_cluster_pca_individual', None, ('padronizado', 'projecao', 'kmeans', 'hierarquico', 'dbscan'),
+     lambda ctx: [_fechar(visualization.plotar_cluster_pca_individual(
+         ctx['padronizado'], labels, nome, projecao_pca=ctx['projecao'])) for nome, labels in _labels(ctx).items()]),
+    ('plotar_radar_clusters', None, ('features', 'kmeans'),
+     lambda ctx: _fechar(visualization.plotar_radar_clusters(
+         ctx['features'][0][FEATURES_RADAR].assign(cluster=ctx['kmeans']), FEATURES_RADAR, n_clusters=N_CLUSTERS))),
+]
+NOMES_ETAPAS = [nome for nome, _, _, _ in ETAPAS]
+
+
+def _silencioso(funcao, ctx):
+    """
+    Executa a etapa descartando as mensagens de progresso das funções do pipeline.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funcao(ctx)
+
+
+def _medir(funcao, ctx, repeticoes, medir_memoria):
+    """
+    Retorna (resultado, menor tempo entre as repetições, pico de memória em MB).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = _silencioso(funcao, ctx)
+        tempos.append(time.perf_counter() - inicio)
+    pico = None
+    if medir_memoria:
+        registro = []
+        del resultado
+        with monitoramento.medir_etapa('bench', registro):
+            resultado = _silencioso(funcao, ctx)
+        pico = registro[0]['pico_etapa_mb']
+    return resultado, min(tempos), pico
+
+
+def _etapas_necessarias(selecionadas):
+    """
+    Etapas a executar: as selecionadas e as que produzem dados exigidos por elas.
+    """
+    necessarias = set(selecionadas)
+    for nome, saida, requer, _ in reversed(ETAPAS):
+        if nome in necessarias:
+            for chave in requer:
+                necessarias.update(n for n, s, _, _ in ETAPAS if s == chave)
+    return necessarias
+
+
+def metadados(repeticoes):
+    """
+    Ambiente da execução (versões, máquina e commit), gravado junto com os resultados.
+    """
+    import numpy
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'plataforma': platform.platform(),
+        'n_cpus': os.cpu_count(),
+        'repeticoes': repeticoes,
+    }
+
+
+def executar(tamanhos, etapas=None, repeticoes=1, max_k=10, n_jobs=1, medir_memoria=True):
+    """
+    Mede cada etapa do pipeline para cada tamanho de base.
+
+    Args:
+        tamanhos (list): Números de linhas das bases geradas.
+        etapas (list, opcional): Etapas medidas (padrão: todas). As etapas de que elas
+            dependem também rodam, sem medição.
+        repeticoes (int): Repetições cronometradas de cada etapa (vale o menor tempo).
+        max_k (int): Maior K da varredura de encontrar_k_otimo.
+        n_jobs (int): Processos de encontrar_k_otimo.
+        medir_memoria (bool): Roda cada etapa mais uma vez sob tracemalloc para o pico de memória.
+
+    Returns:
+        dict: {'metadados', 'resultados': [{'etapa', 'n_linhas', 'tempo_s', 'pico_mb'}]}
+    """
+    selecionadas = NOMES_ETAPAS if etapas is None else etapas
+    desconhecidas = set(selecionadas) - set(NOMES_ETAPAS)
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {sorted(desconhecidas)}. Disponíveis: {NOMES_ETAPAS}")
+    necessarias = _etapas_necessarias(selecionadas)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    resultados = []
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        # As figuras são gravadas em images/ relativo ao diretório de trabalho
+        os.chdir(pasta)
+        try:
+            for n in tamanhos:
+                ctx = {'max_k': max_k, 'n_jobs': n_jobs}
+                inicio = time.perf_counter()
+                ctx['base'] = data_generator.gerar_dados_sinteticos(n_clientes=n, seed=42)
+                print(f"\nn={n}: base gerada em {time.perf_counter() - inicio:.2f}s")
+                for nome, saida, _, funcao in ETAPAS:
+                    if nome not in necessarias:
+                        continue
+                    if nome in selecionadas:
+                        resultado, tempo, pico = _medir(funcao, ctx, repeticoes, medir_memoria)
+                        resultados.append({'etapa': nome, 'n_linhas': n, 'tempo_s': tempo, 'pico_mb': pico})
+                        texto_pico = '' if pico is None else f", pico {pico:.1f} MB"
+                        print(f"  {nome}: {tempo:.3f}s{texto_pico}")
+                    else:
+                        resultado = _silencioso(funcao, ctx)
+                    if saida is not None:
+                        ctx[saida] = resultado
+                del ctx
+        finally:
+            os.chdir(diretorio_original)
+
+    return {'metadados': metadados(repeticoes), 'resultados': resultados}
+
+
+def salvar_resultados(resultados, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em '{caminho}'.")
+
+
+def carregar_resultados(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def comparar(base, atual, limite_pct=LIMITE_REGRESSAO_PCT, piso_tempo_s=PISO_TEMPO_S,
+             piso_memoria_mb=PISO_MEMORIA_MB):
+    """
+    Compara duas execuções etapa a etapa (mesmo nome e mesmo tamanho de base).
+
+    Uma etapa é marcada como regressão quando o tempo (ou o pico de memória) piora
+    mais que limite_pct e, em valor absoluto, mais que o piso correspondente.
+
+    Args:
+        base (dict): Resultados de referência (executar ou carregar_resultados).
+        atual (dict): Resultados a verificar.
+        limite_pct (float): Piora relativa tolerada, em %.
+        piso_tempo_s (float): Piora absoluta mínima de tempo para contar como regressão.
+        piso_memoria_mb (float): Piora absoluta mínima de memória para contar como regressão.
+
+    Returns:
+        pd.DataFrame: Uma linha por (etapa, n_linhas) presente nas duas execuções.
+    """
+    colunas = ['etapa', 'n_linhas', 'tempo_s', 'pico_mb']
+    df_base = pd.DataFrame(base['resultados'], columns=colunas)
+    df_atual = pd.DataFrame(atual['resultados'], columns=colunas)
+    tabela = df_base.merge(df_atual, on=['etapa', 'n_linhas'], suffixes=('_base', '_atual'))
+    tabela[['pico_mb_base', 'pico_mb_atual']] = tabela[['pico_mb_base', 'pico_mb_atual']].astype(float)
+
+    fator = 1 + limite_pct / 100
+    tabela['variacao_tempo_pct'] = 100 * (tabela['tempo_s_atual'] / tabela['tempo_s_base'] - 1)
+    tabela['variacao_pico_pct'] = 100 * (tabela['pico_mb_atual'] / tabela['pico_mb_base'] - 1)
+    regressao_tempo = ((tabela['tempo_s_atual'] > fator * tabela['tempo_s_base'])
+                       & (tabela['tempo_s_atual'] - tabela['tempo_s_base'] > piso_tempo_s))
+    # Sem medição de memória em uma das execuções, a comparação de pico é ignorada (NaN -> False)
+    regressao_pico = ((tabela['pico_mb_atual'] > fator * tabela['pico_mb_base'])
+                      & (tabela['pico_mb_atual'] - tabela['pico_mb_base'] > piso_memoria_mb))
+    tabela['regressao'] = regressao_tempo | regressao_pico
+    return tabela.set_index(['etapa', 'n_linhas'])
+
+
+def _imprimir_comparacao(tabela, limite_pct):
+    print(f"\nComparação com a execução de referência (limite de {limite_pct:.0f}%):")
+    print(tabela.to_string(float_format=lambda v: f"{v:.3f}"))
+    regressoes = tabela[tabela['regressao']]
+    if regressoes.empty:
+        print("\nNenhuma regressão encontrada.")
+        return True
+    print(f"\n{len(regressoes)} regressão(ões):")
+    for (etapa, n), linha in regressoes.iterrows():
+        print(f"  {etapa} (n={n}): tempo {linha['variacao_tempo_pct']:+.1f}%, pico {linha['variacao_pico_pct']:+.1f}%")
+    return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline em várias escalas.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[30_000, 300_000, 1_000_000])
+    parser.add_argument('--etapas', nargs='+', default=None, choices=NOMES_ETAPAS, metavar='ETAPA',
+                        help="Etapas medidas (padrão: todas).")
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--max-k', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=1, help="Processos de encontrar_k_otimo.")
+    parser.add_argument('--sem-memoria', action='store_true',
+                        help="Não mede o pico de memória (evita a execução extra sob tracemalloc).")
+    parser.add_argument('--saida', default='bench_pipeline.json', help="Arquivo JSON dos resultados.")
+    parser.add_argument('--base', default=None, help="JSON de referência para comparar ao final.")
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'ATUAL'), default=None,
+                        help="Apenas compara dois arquivos JSON já gravados.")
+    parser.add_argument('--limite-pct', type=float, default=LIMITE_REGRESSAO_PCT)
+    args = parser.parse_args()
+
+    if args.comparar:
+        referencia, atual = (carregar_resultados(caminho) for caminho in args.comparar)
+    else:
+        atual = executar(args.tamanhos, args.etapas, args.repeticoes, args.max_k, args.n_jobs,
+                         medir_memoria=not args.sem_memoria)
+        salvar_resultados(atual, args.saida)
+        tabela = pd.DataFrame(atual['resultados']).set_index(['etapa', 'n_linhas'])
+        print("\nTempo e pico de memória por etapa:")
+        tabela = tabela.unstack('n_linhas').reindex([e for e in NOMES_ETAPAS if e in tabela.index.levels[0]])
+        print(tabela.to_string(float_format=lambda v: f"{v:.3f}"))
+        referencia = carregar_resultados(args.base) if args.base else None
+
+    if referencia is not None and not _imprimir_comparacao(comparar(referencia, atual, args.limite_pct),
+                                                           args.limite_pct):
+        sys.exit(1)
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco, endereçado por conteúdo, para as etapas do pipeline.
+
+A chave de cada etapa é o hash de: nome da etapa, chaves das etapas de que ela
+depende (ou o hash dos dados de entrada), parâmetros e versão do código (hash do
+fonte dos módulos usados). Assim, mudar apenas o K ou os parâmetros do DBSCAN
+invalida só as etapas afetadas. Os arquivos mais antigos (por último acesso)
+são removidos quando a pasta passa do tamanho máximo.
+
+Matrizes grandes (etapa_matriz) são gravadas como .npy com um sidecar JSON e
+reabertas por mapeamento de memória, sem desserializar nem copiar os dados.
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import matriz_mapeada
+
+PASTA_CACHE_PADRAO = '.cache_segmentacao'
+TAMANHO_MAX_MB_PADRAO = 2048
+_EXTENSAO = '.pkl'
+
+
+def _atualizar_hash(h, obj):
+    """
+    Alimenta o hash com o conteúdo de obj (DataFrame, Series, ndarray ou estruturas JSON).
+    """
+    if isinstance(obj, pd.DataFrame):
+        h.update(json.dumps([list(map(str, obj.columns)), list(map(str, obj.dtypes))]).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(str(obj.dtype).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype.str}{obj.shape}".encode())
+        # memoryview evita a cópia de tobytes(); só matrizes não contíguas são copiadas
+        h.update(memoryview(np.ascontiguousarray(obj).reshape(-1).view(np.uint8)))
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for item in obj:
+            _atualizar_hash(h, item)
+    elif isinstance(obj, dict):
+        h.update(f"dict{len(obj)}".encode())
+        for chave in sorted(obj, key=str):
+            h.update(str(chave).encode())
+            _atualizar_hash(h, obj[chave])
+    else:
+        h.update(json.dumps(obj, sort_keys=True, default=str).encode())
+
+
+def hash_conteudo(*objetos):
+    """
+    Hash hexadecimal (BLAKE2b, 128 bits) do conteúdo dos objetos.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for obj in objetos:
+        _atualizar_hash(h, obj)
+    return h.hexdigest()
+
+
+def versao_codigo(*modulos):
+    """
+    Hash do código-fonte dos módulos: qualquer edição neles invalida as etapas que os usam.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for modulo in modulos:
+        with open(inspect.getsourcefile(modulo), 'rb') as arquivo:
+            h.update(arquivo.read())
+    return h.hexdigest()
+
+
+class CacheEtapas:
+    """
+    Cache de resultados de etapas em arquivos pickle, um por chave.
+
+    Args:
+        pasta (str): Pasta dos arquivos de cache.
+        tamanho_max_mb (float): Tamanho máximo da pasta; acima dele os arquivos
+            acessados há mais tempo são removidos (LRU). A limpeza nunca remove as
+            matrizes mapeadas por esta instância nem as entradas recém-gravadas,
+            mesmo que sozinhas passem do limite.
+        ativo (bool): Com False, todas as etapas são recalculadas e nada é gravado.
+    """
+
+    def __init__(self, pasta=PASTA_CACHE_PADRAO, tamanho_max_mb=TAMANHO_MAX_MB_PADRAO, ativo=True):
+        self.pasta = pasta
+        self.tamanho_max_mb = tamanho_max_mb
+        self.ativo = ativo
+        # Matrizes mapeadas por esta instância: o arquivo é lido sob demanda (e
+        # repassado a processos do pool), por isso não entra na limpeza
+        self._matrizes_em_uso = set()
+        if ativo:
+            os.makedirs(pasta, exist_ok=True)
+
+    def chave(self, etapa, dependencias=(), parametros=None, modulos=()):
+        """
+        Chave de conteúdo de uma etapa.
+        """
+        return f"{etapa}-{hash_conteudo(etapa, list(dependencias), parametros, versao_codigo(*modulos))}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + _EXTENSAO)
+
+    def etapa(self, nome, funcao, dependencias=(), parametros=None, modulos=()):
+        """
+        Retorna o resultado da etapa do cache ou o calcula com funcao() e o grava.
+
+        Args:
+            nome (str): Nome da etapa (prefixo do arquivo).
+            funcao (callable): Calcula o resultado, sem argumentos.
+            dependencias (iterable): Chaves das etapas anteriores e/ou hashes de dados de entrada.
+            parametros (dict, opcional): Parâmetros da etapa.
+            modulos (iterable): Módulos cujo código define a etapa.
+
+        Returns:
+            tuple: (resultado, chave), a chave serve de dependência para as etapas seguintes.
+        """
+        chave = self.chave(nome, dependencias, parametros, modulos)
+        if not self.ativo:
+            return funcao(), chave
+
+        encontrado, resultado = self._ler(chave, nome)
+        if encontrado:
+            return resultado, chave
+        resultado = funcao()
+        self._gravar(chave, resultado)
+        self.limpar(preservar=[chave])
+        return resultado, chave
+
+    def etapas_em_lote(self, nome, funcao, itens, modulos=()):
+        """
+        Várias etapas de mesmo nome (uma por item, cada uma com a sua chave) calculadas
+        juntas: funcao recebe só os itens ausentes do cache e os calcula de uma vez
+        (ex.: avaliar em paralelo os modelos que mudaram).
+
+        Args:
+            nome (str): Nome das etapas.
+            funcao (callable): Recebe a lista de itens pendentes e retorna {item: resultado}.
+            itens (dict): {item: (dependencias, parametros)} de cada etapa.
+            modulos (iterable): Módulos cujo código define as etapas.
+
+        Returns:
+            dict: {item: (resultado, chave)}, na ordem de itens.
+        """
+        chaves = {item: self.chave(nome, dependencias, parametros, modulos)
+                  for item, (dependencias, parametros) in itens.items()}
+        resultados = {}
+        if self.ativo:
+            for item, chave in chaves.items():
+                encontrado, resultado = self._ler(chave, nome)
+                if encontrado:
+                    resultados[item] = resultado
+        pendentes = [item for item in itens if item not in resultados]
+        if pendentes:
+            calculados = funcao(pendentes)
+            for item in pendentes:
+                resultados[item] = calculados[item]
+                if self.ativo:
+                    self._gravar(chaves[item], calculados[item])
+            if self.ativo:
+                self.limpar(preservar=[chaves[item] for item in pendentes])
+        return {item: (resultados[item], chaves[item]) for item in itens}
+
+    def _ler(self, chave, nome):
+        """
+        Lê um resultado do cache; retorna (encontrado, resultado).
+        """
+        caminho = self._caminho(chave)
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, 'rb') as arquivo:
+                    resultado = pickle.load(arquivo)
+                # Marca o acesso para a política LRU
+                os.utime(caminho)
+                print(f"[cache] Etapa '{nome}' reaproveitada.")
+                return True, resultado
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # Arquivo corrompido ou incompleto: recalcula
+                pass
+        return False, None
+
+    def _gravar(self, chave, resultado):
+        # Escrita atômica: um processo interrompido nunca deixa um arquivo parcial com a chave final
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            pickle.dump(resultado, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, self._caminho(chave))
+
+    def etapa_matriz(self, nome, funcao, dependencias=(), parametros=None, modulos=()):
+        """
+        Como etapa(), para uma matriz numérica grande: o resultado é gravado como
+        .npy C-contíguo com sidecar JSON e devolvido como DataFrame apoiado no
+        arquivo mapeado em memória (somente leitura, sem cópia). Processos que
+        abrem a mesma chave compartilham as páginas do page cache.
+
+        Args:
+            nome (str): Nome da etapa (prefixo do arquivo).
+            funcao (callable): Retorna (matriz, metadados), onde matriz é um DataFrame
+                ou ndarray numérico e metadados um dicionário serializável em JSON.
+            dependencias, parametros, modulos: Como em etapa().
+
+        Returns:
+            tuple: ((DataFrame, metadados), chave).
+        """
+        chave = self.chave(nome, dependencias, parametros, modulos)
+        if not self.ativo:
+            dados, metadados = funcao()
+            if not isinstance(dados, pd.DataFrame):
+                dados = pd.DataFrame(dados, copy=False)
+            return (dados, metadados), chave
+
+        caminho = os.path.join(self.pasta, chave + matriz_mapeada.EXTENSAO_MATRIZ)
+        if matriz_mapeada.existe_matriz(caminho):
+            try:
+                resultado = matriz_mapeada.abrir_dataframe(caminho)
+                os.utime(caminho)
+                self._matrizes_em_uso.add(chave)
+                print(f"[cache] Etapa '{nome}' reaproveitada (matriz mapeada em memória).")
+                return resultado, chave
+            except (OSError, ValueError):
+                # Matriz ou sidecar inválidos: recalcula
+                pass
+
+        dados, metadados = funcao()
+        # Registrada antes da gravação: a matriz (e quem a mapeia) sobrevive à limpeza
+        self._matrizes_em_uso.add(chave)
+        matriz_mapeada.salvar_matriz(dados, caminho, metadados=metadados)
+        # Libera a cópia em memória: a partir daqui todos usam a versão mapeada
+        del dados
+        resultado = matriz_mapeada.abrir_dataframe(caminho)
+        self.limpar()
+        return resultado, chave
+
+    def limpar(self, tamanho_max_mb=None, preservar=()):
+        """
+        Remove os arquivos acessados há mais tempo até a pasta caber no tamanho máximo.
+        Matrizes .npy são contadas e removidas junto com o seu sidecar JSON. As
+        matrizes mapeadas por esta instância e as chaves em preservar contam no
+        tamanho, mas não são removidas.
+
+        Args:
+            tamanho_max_mb (float, opcional): Limite (padrão: o da instância).
+            preservar (iterable): Chaves que não podem ser removidas (ex.: a recém-gravada).
+
+        Returns:
+            int: Número de entradas removidas.
+        """
+        limite = (self.tamanho_max_mb if tamanho_max_mb is None else tamanho_max_mb) * 2**20
+        protegidas = self._matrizes_em_uso | set(preservar)
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(_EXTENSAO) or nome.endswith(matriz_mapeada.EXTENSAO_MATRIZ):
+                caminho = os.path.join(self.pasta, nome)
+                try:
+                    info = os.stat(caminho)
+                    tamanho = info.st_size
+                    sidecar = matriz_mapeada.caminho_sidecar(caminho)
+                    if nome.endswith(matriz_mapeada.EXTENSAO_MATRIZ) and os.path.exists(sidecar):
+                        tamanho += os.path.getsize(sidecar)
+                except FileNotFoundError:
+                    # Removido por outra limpeza concorrente (ex.: outra sessão do dashboard)
+                    continue
+                arquivos.append((info.st_mtime, tamanho, nome))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = 0
+        for _, tamanho, nome in sorted(arquivos):
+            if total <= limite:
+                break
+            if os.path.splitext(nome)[0] in protegidas:
+                continue
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                if nome.endswith(matriz_mapeada.EXTENSAO_MATRIZ):
+                    # Sidecar primeiro: sem ele a matriz deixa de ser considerada completa
+                    sidecar = matriz_mapeada.caminho_sidecar(caminho)
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+                os.remove(caminho)
+                removidos += 1
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        return removidos
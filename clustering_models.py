@@ -1,63 +1,344 @@
 # -*- coding: utf-8 -*-
-from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
-from sklearn.metrics import silhouette_score
+from sklearn.cluster import KMeans, MiniBatchKMeans, AgglomerativeClustering, DBSCAN
+from sklearn.metrics import pairwise_distances_argmin, pairwise_distances_argmin_min
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
 import numpy as np
-import streamlit as st
 
-# >>> OTIMIZAÇÃO: Adicionando cache do Streamlit <<<
-# Esta função é a mais demorada. O cache evita que ela seja
-# reexecutada a cada interação no dashboard, tornando a experiência mais fluida.
+import densidade
+import memoria_compartilhada
+import silhueta
 
-def encontrar_k_otimo(_df_padronizado, max_k=10):
+# Modos de ajuste do K-Means: 'completo' (KMeans em lote) ou 'minibatch'
+# (MiniBatchKMeans alimentado bloco a bloco via partial_fit)
+MODOS_KMEANS = ('completo', 'minibatch')
+TAMANHO_LOTE_PADRAO = 10_000
+TAMANHO_BLOCO_ATRIBUICAO = 100_000
+
+def atribuir_e_inercia(dados, centros, tamanho_bloco=TAMANHO_BLOCO_ATRIBUICAO):
+    """
+    Atribui cada linha ao centro mais próximo e calcula a inércia (WCSS) sobre a
+    base inteira, em blocos de linhas. É a mesma definição do inertia_ do KMeans,
+    o que mantém a curva do cotovelo comparável entre os modos.
+
+    Returns:
+        tuple: (labels, inercia)
+    """
+    X = np.asarray(dados)
+    labels = np.empty(X.shape[0], dtype=np.int32)
+    inercia = 0.0
+    for inicio in range(0, X.shape[0], tamanho_bloco):
+        indices, distancias = pairwise_distances_argmin_min(X[inicio:inicio + tamanho_bloco], centros)
+        labels[inicio:inicio + tamanho_bloco] = indices
+        inercia += float(np.dot(distancias, distancias))
+    return labels, inercia
+
+def compactar_labels(labels):
+    """
+    Converte os rótulos para o menor inteiro com sinal que os comporta (o ruído -1
+    do DBSCAN continua representável). Com K pequeno, int8 usa 1/8 da memória do int64.
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return labels.astype(np.int8)
+    minimo, maximo = int(labels.min()), int(labels.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        limites = np.iinfo(dtype)
+        if limites.min <= minimo and maximo <= limites.max:
+            return labels.astype(dtype, copy=False)
+    return labels.astype(np.int64, copy=False)
+
+def _ajustar_minibatch(X, n_clusters, random_state, tamanho_lote, n_epocas, init='k-means++'):
+    """
+    Ajusta um MiniBatchKMeans de forma incremental: a cada época os blocos contíguos
+    de até tamanho_lote linhas são percorridos em ordem aleatória e enviados ao partial_fit.
+
+    Os blocos têm tamanhos quase iguais e pelo menos n_clusters linhas cada, porque
+    o primeiro partial_fit (que pode ser qualquer bloco) inicializa os centróides.
+    Se não couberem dois blocos assim, o ajuste é feito com um único fit.
+    """
+    modelo = MiniBatchKMeans(n_clusters=n_clusters, init=init, random_state=random_state,
+                             batch_size=tamanho_lote, n_init=1 if not isinstance(init, str) else 'auto')
+    n_linhas = X.shape[0]
+    n_blocos = min(-(-n_linhas // tamanho_lote), n_linhas // max(n_clusters, 1))
+    if n_blocos < 2:
+        return modelo.fit(X)
+    rng = np.random.default_rng(random_state)
+    fronteiras = np.linspace(0, n_linhas, n_blocos + 1).astype(np.int64)
+    blocos = list(zip(fronteiras[:-1], fronteiras[1:]))
+    for _ in range(n_epocas):
+        for i in rng.permutation(n_blocos):
+            inicio, fim = blocos[i]
+            modelo.partial_fit(X[inicio:fim])
+    return modelo
+
+def ajustar_kmeans(dados, n_clusters=4, modo='completo', random_state=42, n_init=None,
+                   tamanho_lote=TAMANHO_LOTE_PADRAO, n_epocas=3, centros_iniciais=None):
+    """
+    Ajusta o K-Means no modo escolhido e retorna rótulos, centros e inércia.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        n_clusters (int): Número de clusters.
+        modo (str): 'completo' (KMeans) ou 'minibatch' (MiniBatchKMeans com partial_fit).
+        random_state (int): Semente.
+        n_init (int, opcional): Número de inicializações; a melhor (menor inércia) é mantida.
+            Se None, usa 10 no modo completo e 3 no minibatch (cada uma é um ajuste incremental).
+        tamanho_lote (int): Linhas por lote no modo minibatch.
+        n_epocas (int): Passagens sobre os dados no modo minibatch.
+        centros_iniciais (np.ndarray, opcional): Centróides de partida (k x p), ex.: os do ajuste
+            anterior (warm start). Com eles há uma única inicialização.
+
+    Returns:
+        dict: {'labels', 'centros', 'inercia', 'modelo'}. A inércia é sempre a WCSS
+              sobre a base inteira, comparável entre os dois modos.
+    """
+    if modo not in MODOS_KMEANS:
+        raise ValueError(f"Modo '{modo}' inválido. Use 'completo' ou 'minibatch'.")
+
+    init = 'k-means++'
+    if centros_iniciais is not None:
+        init = np.asarray(centros_iniciais, dtype=np.float64)
+        n_init = 1
+    if n_init is None:
+        n_init = 10 if modo == 'completo' else 3
+
+    if modo == 'completo':
+        modelo = KMeans(n_clusters=n_clusters, init=init, random_state=random_state, n_init=n_init)
+        modelo.fit(dados)
+        return {'labels': modelo.labels_, 'centros': modelo.cluster_centers_,
+                'inercia': modelo.inertia_, 'modelo': modelo}
+
+    X = np.asarray(dados)
+    melhor = None
+    for semente in np.random.SeedSequence(random_state).generate_state(n_init):
+        modelo = _ajustar_minibatch(X, n_clusters, int(semente), tamanho_lote, n_epocas, init)
+        labels, inercia = atribuir_e_inercia(X, modelo.cluster_centers_)
+        if melhor is None or inercia < melhor['inercia']:
+            melhor = {'labels': labels, 'centros': modelo.cluster_centers_, 'inercia': inercia, 'modelo': modelo}
+    return melhor
+
+def _resultado_k(dados, k, inercia, labels, modo_silhueta):
+    """
+    Monta o resultado de um K, com a silhueta calculada pelo motor de avaliação.
+    """
+    sil = silhueta.calcular_silhueta(dados, labels, modo=modo_silhueta)
+    return {
+        'k': k, 'inercia': inercia, 'score_silhueta': sil['silhueta'],
+        'silhueta_ic': (sil['ic_inferior'], sil['ic_superior'])
+    }
+
+def _avaliar_k(dados, k, random_state=42, n_init=None, modo_silhueta='auto', modo_kmeans='completo'):
+    """
+    Ajusta o K-Means para um valor de K e calcula inércia e silhueta.
+    """
+    ajuste = ajustar_kmeans(dados, k, modo=modo_kmeans, random_state=random_state, n_init=n_init)
+    return _resultado_k(dados, k, ajuste['inercia'], ajuste['labels'], modo_silhueta)
+
+def _tarefa_avaliar_k(k, modo_silhueta, modo_kmeans, n_init):
+    """
+    Tarefa do pool: avalia um K sobre a matriz em memória compartilhada.
+    """
+    return _avaliar_k(memoria_compartilhada.matriz_do_processo(), k, n_init=n_init,
+                      modo_silhueta=modo_silhueta, modo_kmeans=modo_kmeans)
+
+def _tarefa_reinicio_kmeans(k, semente, modo_kmeans):
+    """
+    Tarefa do pool: executa uma única inicialização do K-Means (n_init=1).
+    """
+    ajuste = ajustar_kmeans(memoria_compartilhada.matriz_do_processo(), k, modo=modo_kmeans,
+                            random_state=semente, n_init=1)
+    return k, ajuste['inercia'], ajuste['centros']
+
+def _tarefa_silhueta_centros(k, inercia, centros, modo_silhueta):
+    """
+    Tarefa do pool: atribui os pontos aos centros vencedores e calcula a silhueta.
+    """
+    dados = memoria_compartilhada.matriz_do_processo()
+    labels = pairwise_distances_argmin(dados, centros)
+    return _resultado_k(dados, k, inercia, labels, modo_silhueta)
+
+def iterar_k_otimo(_df_padronizado, max_k=10, n_jobs=1, paralelizar_n_init=False, n_init=None,
+                   modo_silhueta='auto', modo_kmeans='completo'):
+    """
+    Avalia cada K em 2..max_k e produz o resultado de cada um assim que fica pronto
+    (a ordem segue a conclusão, não o valor de K), permitindo exibir progresso.
+
+    Com n_jobs > 1 os valores de K são distribuídos em um pool de processos que
+    lê a matriz padronizada da memória compartilhada (sem serializá-la por tarefa)
+    e com threads BLAS limitadas por processo. Com paralelizar_n_init=True, cada
+    uma das n_init inicializações do K-Means vira uma tarefa separada e a silhueta
+    é calculada apenas para a melhor delas.
+
+    A silhueta usa silhueta.calcular_silhueta: exata em blocos de memória limitada
+    ou estimada por amostragem estratificada (modo_silhueta='auto' decide pelo
+    número de linhas). modo_kmeans escolhe entre o KMeans completo e o minibatch
+    (ver ajustar_kmeans); em ambos a inércia é a WCSS sobre a base inteira.
+
+    Yields:
+        dict: {'k': int, 'inercia': float, 'score_silhueta': float, 'silhueta_ic': tuple}
+    """
+    range_k = range(2, max_k + 1)
+    n_jobs = memoria_compartilhada.resolver_n_jobs(n_jobs)
+
+    if n_jobs == 1:
+        dados = np.asarray(_df_padronizado)
+        for k in range_k:
+            yield _avaliar_k(dados, k, n_init=n_init, modo_silhueta=modo_silhueta, modo_kmeans=modo_kmeans)
+        return
+
+    with memoria_compartilhada.pool_com_matriz(_df_padronizado, n_jobs) as executor:
+        if not paralelizar_n_init:
+            futuros = [executor.submit(_tarefa_avaliar_k, k, modo_silhueta, modo_kmeans, n_init) for k in range_k]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+            return
+
+        # Uma tarefa por (K, inicialização); sementes derivadas de forma reprodutível
+        if n_init is None:
+            n_init = 10 if modo_kmeans == 'completo' else 3
+        sementes = np.random.SeedSequence(42).generate_state(n_init)
+        pendentes = {k: n_init for k in range_k}
+        melhores = {}
+        futuros = {
+            executor.submit(_tarefa_reinicio_kmeans, k, int(semente), modo_kmeans)
+            for k in range_k for semente in sementes
+        }
+        while futuros:
+            concluidos, futuros = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                resultado = futuro.result()
+                if isinstance(resultado, dict):
+                    yield resultado
+                    continue
+                k, inercia, centros = resultado
+                if k not in melhores or inercia < melhores[k][0]:
+                    melhores[k] = (inercia, centros)
+                pendentes[k] -= 1
+                if pendentes[k] == 0:
+                    futuros.add(executor.submit(_tarefa_silhueta_centros, k, *melhores.pop(k), modo_silhueta))
+
+def encontrar_k_otimo(_df_padronizado, max_k=10, n_jobs=1, paralelizar_n_init=False, callback=None,
+                      modo_silhueta='auto', modo_kmeans='completo', n_replicas_estabilidade=0,
+                      orcamento_estabilidade_s=None):
     """
     Calcula a inércia (WCSS) e o coeficiente de silhueta para um range de K.
     O _ antes do nome do DataFrame é uma convenção para indicar ao Streamlit
     que não monitore mudanças no conteúdo do DataFrame para o cache, apenas
     a sua identidade, o que melhora a performance.
+
+    Args:
+        _df_padronizado (pd.DataFrame): Dados padronizados.
+        max_k (int): Maior K avaliado (o range começa em 2).
+        n_jobs (int): Número de processos (1 = serial; None ou -1 = todos os núcleos).
+        paralelizar_n_init (bool): Distribui também as inicializações do K-Means entre os processos.
+        callback (callable, opcional): Chamada com o dicionário de cada K assim que ele termina.
+        modo_silhueta (str): 'exato', 'amostrado' ou 'auto' (ver silhueta.calcular_silhueta).
+        modo_kmeans (str): 'completo' ou 'minibatch' (ver ajustar_kmeans).
+        n_replicas_estabilidade (int): Se > 0, calcula também a curva de estabilidade por
+            reamostragem com este número de réplicas por K (ver estabilidade.py).
+        orcamento_estabilidade_s (float, opcional): Tempo máximo da curva de estabilidade.
+
+    Returns:
+        dict: {'range_k', 'inercias', 'scores_silhueta', 'silhueta_ic'}, ordenados por K.
+              Com n_replicas_estabilidade > 0, também 'estabilidade_ari', 'estabilidade_ari_dp',
+              'estabilidade_jaccard', 'n_replicas' e 'k_recomendado'.
     """
-    inercias = []
-    scores_silhueta = []
-    range_k = range(2, max_k + 1)
-    
-    for k in range_k:
-        kmeans = KMeans(n_clusters=k, init='k-means++', random_state=42, n_init=10)
-        kmeans.fit(_df_padronizado)
-        inercias.append(kmeans.inertia_)
-        # Calcula o score de silhueta para os labels gerados
-        labels = kmeans.labels_
-        scores_silhueta.append(silhouette_score(_df_padronizado, labels))
-        
+    resultados = {}
+    for resultado in iterar_k_otimo(_df_padronizado, max_k, n_jobs, paralelizar_n_init,
+                                    modo_silhueta=modo_silhueta, modo_kmeans=modo_kmeans):
+        resultados[resultado['k']] = resultado
+        if callback is not None:
+            callback(resultado)
+
+    range_k = sorted(resultados)
     print("Cálculo de inércia e scores de silhueta concluído.")
-    return {'range_k': list(range_k), 'inercias': inercias, 'scores_silhueta': scores_silhueta}
+    saida = {
+        'range_k': range_k,
+        'inercias': [resultados[k]['inercia'] for k in range_k],
+        'scores_silhueta': [resultados[k]['score_silhueta'] for k in range_k],
+        'silhueta_ic': [resultados[k]['silhueta_ic'] for k in range_k]
+    }
+    if n_replicas_estabilidade > 0:
+        # Importação local: o módulo estabilidade depende deste módulo
+        import estabilidade
+        curva = estabilidade.estabilidade_k(
+            _df_padronizado, range_k, n_replicas=n_replicas_estabilidade, n_jobs=n_jobs,
+            orcamento_s=orcamento_estabilidade_s, modo_kmeans=modo_kmeans
+        )
+        for chave in ('estabilidade_ari', 'estabilidade_ari_dp', 'estabilidade_jaccard', 'n_replicas', 'k_recomendado'):
+            saida[chave] = curva[chave]
+    return saida
 
-def aplicar_kmeans(df_padronizado, n_clusters=4):
+def aplicar_kmeans(df_padronizado, n_clusters=4, modo='completo', tamanho_lote=TAMANHO_LOTE_PADRAO,
+                   retornar_modelo=False):
     """
     Aplica o algoritmo K-Means.
+    Com modo='minibatch' o ajuste é incremental (partial_fit em lotes de tamanho_lote linhas).
+    Com retornar_modelo=True, retorna também o dicionário de ajustar_kmeans (centros, inércia, modelo).
     """
-    kmeans = KMeans(n_clusters=n_clusters, init='k-means++', random_state=42, n_init=10)
-    labels = kmeans.fit_predict(df_padronizado)
-    print(f"K-Means aplicado com {n_clusters} clusters.")
-    return labels
+    ajuste = ajustar_kmeans(df_padronizado, n_clusters, modo=modo, tamanho_lote=tamanho_lote)
+    print(f"K-Means ({modo}) aplicado com {n_clusters} clusters.")
+    if retornar_modelo:
+        return ajuste['labels'], ajuste
+    return ajuste['labels']
 
-def aplicar_cluster_hierarquico(df_padronizado, n_clusters=4):
+def aplicar_cluster_hierarquico(df_padronizado, n_clusters=4, modo='exato', n_microclusters=500,
+                                metodo_microclusters='minibatch', arvore=None):
     """
     Aplica o algoritmo de Clusterização Hierárquica Aglomerativa.
+
+    modo='exato' usa o AgglomerativeClustering (quadrático; viável só em amostras).
+    modo='microclusters' resume a base em micro-clusters, aplica Ward ponderado sobre
+    eles e rotula todos os clientes em tempo quase linear (ver hierarquico.py); nesse
+    caso o segundo item retornado é um dicionário com o resumo e a árvore. Uma árvore
+    já construída (hierarquico.construir_arvore) é apenas cortada em n_clusters.
     """
+    if modo == 'microclusters':
+        # Importação local: o módulo hierarquico depende deste módulo
+        import hierarquico
+        labels, modelo = hierarquico.cluster_hierarquico_microclusters(
+            df_padronizado, n_clusters, n_microclusters=n_microclusters, metodo=metodo_microclusters, arvore=arvore
+        )
+        print(f"Clusterização Hierárquica (micro-clusters) aplicada com {n_clusters} clusters "
+              f"sobre {len(modelo['pesos_micro'])} micro-clusters.")
+        return labels, modelo
+    if modo != 'exato':
+        raise ValueError(f"Modo '{modo}' inválido. Use 'exato' ou 'microclusters'.")
+
     agg_clustering = AgglomerativeClustering(n_clusters=n_clusters)
     labels = agg_clustering.fit_predict(df_padronizado)
     print(f"Clusterização Hierárquica aplicada com {n_clusters} clusters.")
     return labels, agg_clustering
 
-def aplicar_dbscan(df_padronizado, eps=0.5, min_samples=5):
+def aplicar_dbscan(df_padronizado, eps=0.5, min_samples=5, modo='sklearn', memoria_max_mb=None,
+                   algoritmo='auto', retornar_resumo=False):
     """
     Aplica o algoritmo DBSCAN.
+
+    modo='indexado' usa o motor de densidade.py: índice de vizinhança construído uma
+    vez, vizinhanças processadas em blocos limitados por memoria_max_mb (MB) e
+    eps='auto' derivado da curva de k-distâncias. Com retornar_resumo=True, retorna
+    também um dicionário com eps, n_clusters, n_ruido e os índices dos núcleos.
     """
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-    labels = dbscan.fit_predict(df_padronizado)
-    n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
-    n_noise = list(labels).count(-1)
-    print(f"DBSCAN aplicado com eps={eps} e min_samples={min_samples}.")
-    print(f"Número de clusters encontrados: {n_clusters}")
-    print(f"Número de pontos de ruído: {n_noise}")
-    return labels
+    if modo == 'indexado':
+        labels, resumo = densidade.dbscan_indexado(
+            df_padronizado, eps=eps, min_samples=min_samples, algoritmo=algoritmo,
+            memoria_max_mb=memoria_max_mb or densidade.MEMORIA_MAX_MB
+        )
+        eps = resumo['eps']
+    elif modo == 'sklearn':
+        if eps == 'auto':
+            raise ValueError("eps='auto' requer modo='indexado'.")
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
+        labels = dbscan.fit_predict(df_padronizado)
+        resumo = densidade.resumir_rotulos(labels, eps=eps, min_samples=min_samples,
+                                           indices_nucleo=dbscan.core_sample_indices_)
+    else:
+        raise ValueError(f"Modo '{modo}' inválido. Use 'sklearn' ou 'indexado'.")
 
+    print(f"DBSCAN aplicado com eps={eps:.4g} e min_samples={min_samples}.")
+    print(f"Número de clusters encontrados: {resumo['n_clusters']}")
+    print(f"Número de pontos de ruído: {resumo['n_ruido']}")
+    if retornar_resumo:
+        return labels, resumo
+    return labels
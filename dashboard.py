@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 import pandas as pd
+import io
 import os
+import threading
+from collections import OrderedDict
 
 # Importando nossos módulos atualizados
-import data_generator
+import armazenamento
+import cache_etapas
+import densidade
+import hierarquico
 import preprocessing
+import projecao
 import clustering_models
 import evaluation
+import silhueta
 import visualization
 
 # Configuração da página do Streamlit
@@ -24,25 +32,188 @@ def carregar_ou_gerar_dados():
     Verifica se a base de dados de 100k registros existe.
     Se não, chama a nova função para gerá-la.
     """
-    nome_arquivo = 'base_sintetica_dividas.xlsx'
+    nome_arquivo = 'base_sintetica_dividas.parquet'
+    nome_arquivo_excel = 'base_sintetica_dividas.xlsx'
     if not os.path.exists(nome_arquivo):
-        with st.spinner('Base de dados não encontrada. Gerando 100.000 registros...'):
-            df = data_generator.gerar_dados_sinteticos(n_clientes=20000, seed=42)
-            df.to_excel(nome_arquivo, index=False)
+        with st.spinner('Base de dados não encontrada. Importando/gerando os registros...'):
+            df = armazenamento.carregar_ou_gerar_base(
+                nome_arquivo, n_clientes=20000, seed=42, caminho_excel=nome_arquivo_excel
+            )
         st.success(f"Base de dados '{nome_arquivo}' criada com sucesso!")
         return df
-    return pd.read_excel(nome_arquivo)
+    return armazenamento.carregar_base(nome_arquivo)
 
-@st.cache_data
+@st.cache_resource
 def processar_dados(df):
     """
     Encapsula o pré-processamento, que agora inclui One-Hot Encoding.
     Retorna um df para análise e outro para modelagem.
+
+    A matriz padronizada é gravada uma vez no cache em disco e mapeada em memória:
+    as sessões e os processos do servidor compartilham as mesmas páginas, sem cópias
+    (st.cache_resource devolve o mesmo objeto, somente leitura, a todas as sessões).
     """
+    cache = obter_cache_processo()['cache_disco']
     # Chamando a nova função de pré-processamento
     df_numerico_original, df_para_modelagem = preprocessing.selecionar_e_transformar_features(df)
-    df_padronizado = preprocessing.padronizar_dados(df_para_modelagem)
-    return df_numerico_original, df_padronizado
+
+    def _padronizacao():
+        df_padronizado, scaler = preprocessing.padronizar_dados(df_para_modelagem, retornar_scaler=True)
+        return df_padronizado, preprocessing.estatisticas_scaler(scaler)
+    # Impressão digital dos dados: a chave da matriz no cache, usada pelos caches de modelos (memória e disco)
+    (df_padronizado, _), impressao_digital = cache.etapa_matriz(
+        'padronizacao', _padronizacao, [cache_etapas.hash_conteudo(df_para_modelagem)], {}, [preprocessing]
+    )
+    return df_numerico_original, df_padronizado, impressao_digital
+
+# --- Cache de modelos compartilhado entre sessões ---
+# st.cache_resource mantém um único objeto por processo do servidor, visível a todas
+# as sessões: aqui, um LRU de resultados em memória com uma trava por chave (a
+# segunda sessão que pede a mesma chave espera o cálculo da primeira em vez de
+# repeti-lo; chaves diferentes são calculadas em paralelo). Por trás dele, o
+# CacheEtapas grava os resultados em disco, de modo que um servidor reiniciado não
+# reajusta nada. As chaves combinam a impressão digital dos dados, os parâmetros e
+# o código dos módulos.
+# Resultados mantidos em memória; os mais antigos continuam disponíveis no disco
+MAX_RESULTADOS_MEMORIA = 64
+
+@st.cache_resource
+def obter_cache_processo():
+    return {'cache_disco': cache_etapas.CacheEtapas(), 'resultados': OrderedDict(),
+            'trava': threading.Lock(), 'travas_chave': {}}
+
+def _consultar_memoria(cache, chave):
+    """
+    Procura a chave no LRU em memória; retorna (encontrado, resultado).
+    """
+    with cache['trava']:
+        if chave in cache['resultados']:
+            cache['resultados'].move_to_end(chave)
+            return True, cache['resultados'][chave]
+        return False, None
+
+def _memorizar(chave, calcular):
+    """
+    Resultado compartilhado entre sessões: memória do processo, depois disco, depois cálculo.
+
+    A trava global protege só o dicionário (nunca um cálculo); o cálculo é feito
+    sob a trava da própria chave, de modo que uma varredura longa não bloqueia as
+    outras sessões nem as consultas a resultados já prontos.
+    """
+    cache = obter_cache_processo()
+    encontrado, resultado = _consultar_memoria(cache, chave)
+    if encontrado:
+        return resultado
+    with cache['trava']:
+        trava_chave = cache['travas_chave'].setdefault(chave, threading.Lock())
+    with trava_chave:
+        # Verificação dupla: outra sessão pode ter concluído o cálculo enquanto esperávamos
+        encontrado, resultado = _consultar_memoria(cache, chave)
+        if encontrado:
+            return resultado
+        resultado = calcular(cache['cache_disco'])
+        with cache['trava']:
+            cache['resultados'][chave] = resultado
+            while len(cache['resultados']) > MAX_RESULTADOS_MEMORIA:
+                cache['resultados'].popitem(last=False)
+            cache['travas_chave'].pop(chave, None)
+    return resultado
+
+def obter_resultados_k(impressao_digital, df_padronizado, max_k=10, callback=None):
+    """
+    Varredura de K compartilhada entre sessões e persistida em disco.
+    """
+    return _memorizar(('k_otimo', impressao_digital, max_k), lambda cache: cache.etapa(
+        'k_otimo',
+        lambda: clustering_models.encontrar_k_otimo(df_padronizado, max_k=max_k, n_jobs=-1, callback=callback),
+        [impressao_digital], {'max_k': max_k}, [clustering_models, silhueta]
+    )[0])
+
+def obter_projecao_pca(impressao_digital, df_padronizado):
+    """
+    Projeção PCA da base, compartilhada pelas figuras de todos os modelos e sessões.
+    A chave é a impressão digital já calculada na padronização: a matriz não é
+    hasheada de novo a cada figura.
+    """
+    return _memorizar(('projecao_pca', impressao_digital), lambda cache: cache.etapa(
+        'projecao_pca', lambda: projecao.projetar_pca(df_padronizado),
+        [impressao_digital], {}, [projecao]
+    )[0])
+
+def obter_modelos(impressao_digital, df_padronizado, df_numerico_original, n_clusters, eps, min_samples):
+    """
+    Rótulos dos três modelos, centróides do K-Means, métricas e perfil do K-Means,
+    compartilhados entre sessões e persistidos em disco.
+    """
+    return _memorizar(
+        ('modelos', impressao_digital, n_clusters, eps, min_samples),
+        lambda cache: _ajustar_modelos(cache, impressao_digital, df_padronizado, df_numerico_original,
+                                       n_clusters, eps, min_samples)
+    )
+
+def _png(fig):
+    """
+    Serializa a figura em PNG (mesmo enquadramento do st.pyplot).
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+def obter_figura(nome, dependencias, desenhar):
+    """
+    PNG de uma figura, desenhado uma única vez para os mesmos dados e parâmetros
+    e reaproveitado (memória do processo e disco) pelas sessões seguintes.
+    """
+    return _memorizar(('figura', nome) + tuple(dependencias), lambda cache: cache.etapa(
+        'figura', lambda: _png(desenhar()), list(dependencias), {'figura': nome}, [visualization]
+    )[0])
+
+def _labels_e_centros(resultado_kmeans):
+    """
+    Guarda do ajuste do K-Means apenas os rótulos e os centróides.
+    """
+    labels, ajuste = resultado_kmeans
+    return labels, ajuste['centros']
+
+def _ajustar_modelos(cache, impressao_digital, df_padronizado, df_numerico_original, n_clusters, eps, min_samples):
+    """
+    Ajusta (ou lê do disco) cada modelo, métrica e perfil como uma etapa separada do cache.
+    """
+    (labels_kmeans, centros_kmeans), chave_kmeans = cache.etapa(
+        'kmeans',
+        lambda: _labels_e_centros(clustering_models.aplicar_kmeans(df_padronizado, n_clusters=n_clusters, retornar_modelo=True)),
+        [impressao_digital], {'n_clusters': n_clusters}, [clustering_models]
+    )
+    labels_hierarquico, chave_hierarquico = cache.etapa(
+        'hierarquico',
+        lambda: clustering_models.aplicar_cluster_hierarquico(df_padronizado, n_clusters=n_clusters, modo='microclusters')[0],
+        [impressao_digital], {'n_clusters': n_clusters, 'modo': 'microclusters'}, [clustering_models, hierarquico]
+    )
+    labels_dbscan, chave_dbscan = cache.etapa(
+        'dbscan',
+        lambda: clustering_models.aplicar_dbscan(df_padronizado, eps=eps, min_samples=min_samples, modo='indexado'),
+        [impressao_digital], {'eps': eps, 'min_samples': min_samples, 'modo': 'indexado'}, [clustering_models, densidade]
+    )
+    labels_dict = {'K-Means': labels_kmeans, 'Hierárquico': labels_hierarquico, 'DBSCAN': labels_dbscan}
+    chaves = {'K-Means': chave_kmeans, 'Hierárquico': chave_hierarquico, 'DBSCAN': chave_dbscan}
+
+    avaliacoes = [avaliacao for avaliacao, _ in cache.etapas_em_lote(
+        'avaliacao',
+        lambda nomes: evaluation.avaliar_por_modelo(df_padronizado, {nome: labels_dict[nome] for nome in nomes}, n_jobs=-1),
+        {nome: ([impressao_digital, chaves[nome]], {'modelo': nome}) for nome in labels_dict},
+        [evaluation, silhueta]
+    ).values()]
+    perfil_kmeans, _ = cache.etapa(
+        'perfil_numerico',
+        lambda: evaluation.analisar_perfis(df_numerico_original, labels_kmeans, 'K-Means')[0],
+        [impressao_digital, chave_kmeans], {'modelo': 'K-Means'}, [evaluation]
+    )
+    return {
+        'labels': labels_dict,
+        'centros_kmeans': centros_kmeans,
+        'avaliacao': pd.concat(avaliacoes, ignore_index=True),
+        'perfil_kmeans': perfil_kmeans
+    }
 
 # --- Parâmetros Fixos da Análise (Ajustados para a nova base) ---
 K_OTIMO = 4
@@ -51,7 +222,7 @@ DBSCAN_MIN_SAMPLES = 20 # Ajustado para a maior densidade de pontos
 
 # --- Carregamento e Processamento dos Dados ---
 df_clientes = carregar_ou_gerar_dados()
-df_numerico_original, df_padronizado = processar_dados(df_clientes)
+df_numerico_original, df_padronizado, impressao_digital = processar_dados(df_clientes)
 
 # --- Título Principal ---
 st.title('👥 Ferramenta de Visualização: Segmentação de Clientes Inadimplentes')
@@ -81,8 +252,8 @@ with tab1:
         
     with col2:
         st.subheader("Matriz de Correlação")
-        fig_corr = visualization.plotar_matriz_correlacao(df_numerico_original)
-        st.pyplot(fig_corr)
+        st.image(obter_figura('matriz_correlacao', [impressao_digital],
+                              lambda: visualization.plotar_matriz_correlacao(df_numerico_original)))
     
     st.markdown("""
     **Análise das Correlações:**
@@ -94,26 +265,36 @@ with tab1:
     st.markdown("---")
     
     st.subheader("Distribuição das Variáveis Numéricas")
-    fig_dist = visualization.plotar_distribuicoes(df_numerico_original)
-    st.pyplot(fig_dist)
+    st.image(obter_figura('distribuicoes', [impressao_digital],
+                          lambda: visualization.plotar_distribuicoes(df_numerico_original)))
 
 with tab2:
     st.header("Definição do Número Ótimo de Clusters (K)")
     st.markdown("Utilizamos o Método do Cotovelo e a Análise de Silhueta para determinar o número ideal de segmentos para a nova base de dados.")
     
-    with st.spinner("Calculando o K ótimo (esta etapa pode ser demorada na primeira execução)..."):
-        resultados_k = clustering_models.encontrar_k_otimo(df_padronizado, max_k=10)
+    # A barra só avança quando a varredura é de fato calculada (primeira sessão para estes dados)
+    barra_progresso = st.progress(0.0, text="Avaliando valores de K...")
+    max_k = 10
+    k_concluidos = []
+
+    def atualizar_progresso(resultado):
+        k_concluidos.append(resultado['k'])
+        # A varredura avalia K = 2..max_k
+        barra_progresso.progress(len(k_concluidos) / (max_k - 1), text=f"K={resultado['k']} concluído")
+
+    resultados_k = obter_resultados_k(impressao_digital, df_padronizado, max_k=max_k, callback=atualizar_progresso)
+    barra_progresso.empty()
     
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Método do Cotovelo (Elbow Method)")
-        fig_cotovelo = visualization.plotar_metodo_cotovelo(resultados_k)
-        st.pyplot(fig_cotovelo)
+        st.image(obter_figura('cotovelo', [impressao_digital, 10],
+                              lambda: visualization.plotar_metodo_cotovelo(resultados_k)))
         st.markdown("**Análise:** O 'cotovelo' da curva, onde o ganho em adicionar mais um cluster diminui, continua bem definido em **K=4**.")
     with col2:
         st.subheader("Coeficiente de Silhueta")
-        fig_silhueta = visualization.plotar_score_silhueta(resultados_k)
-        st.pyplot(fig_silhueta)
+        st.image(obter_figura('silhueta', [impressao_digital, 10],
+                              lambda: visualization.plotar_score_silhueta(resultados_k)))
         st.markdown("**Análise:** O pico do score, que indica a melhor combinação de coesão e separação dos clusters, também ocorre em **K=4**, validando a escolha.")
         
     st.success("Conclusão: Mesmo com a nova base de dados, ambos os métodos convergem para a escolha de **K = 4** como o número ótimo de clusters.")
@@ -121,31 +302,35 @@ with tab2:
 with tab3:
     st.header("Resultados Comparativos dos Modelos de Clusterização")
     
-    labels_kmeans = clustering_models.aplicar_kmeans(df_padronizado, n_clusters=K_OTIMO)
-    labels_hierarquico, _ = clustering_models.aplicar_cluster_hierarquico(df_padronizado, n_clusters=K_OTIMO)
-    labels_dbscan = clustering_models.aplicar_dbscan(df_padronizado, eps=DBSCAN_EPS, min_samples=DBSCAN_MIN_SAMPLES)
-
-    labels_dict = {
-        'K-Means': labels_kmeans,
-        'Hierárquico': labels_hierarquico,
-        'DBSCAN': labels_dbscan
-    }
+    with st.spinner("Ajustando os modelos (apenas na primeira vez para estes dados e parâmetros)..."):
+        modelos = obter_modelos(impressao_digital, df_padronizado, df_numerico_original,
+                                K_OTIMO, DBSCAN_EPS, DBSCAN_MIN_SAMPLES)
+    labels_dict = modelos['labels']
+    labels_kmeans = labels_dict['K-Means']
+    labels_hierarquico = labels_dict['Hierárquico']
+    labels_dbscan = labels_dict['DBSCAN']
     
     st.subheader("Visualização dos Clusters (Projeção 2D com PCA)")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        fig_pca_kmeans = visualization.plotar_cluster_pca_individual(df_padronizado, labels_kmeans, 'K-Means')
-        st.pyplot(fig_pca_kmeans)
+        st.image(obter_figura('pca_kmeans', [impressao_digital, K_OTIMO, DBSCAN_EPS, DBSCAN_MIN_SAMPLES],
+                              lambda: visualization.plotar_cluster_pca_individual(
+                                  df_padronizado, labels_kmeans, 'K-Means',
+                                  projecao_pca=obter_projecao_pca(impressao_digital, df_padronizado))))
     with col2:
-        fig_pca_hier = visualization.plotar_cluster_pca_individual(df_padronizado, labels_hierarquico, 'Hierárquico')
-        st.pyplot(fig_pca_hier)
+        st.image(obter_figura('pca_hier', [impressao_digital, K_OTIMO, DBSCAN_EPS, DBSCAN_MIN_SAMPLES],
+                              lambda: visualization.plotar_cluster_pca_individual(
+                                  df_padronizado, labels_hierarquico, 'Hierárquico',
+                                  projecao_pca=obter_projecao_pca(impressao_digital, df_padronizado))))
     with col3:
-        fig_pca_dbscan = visualization.plotar_cluster_pca_individual(df_padronizado, labels_dbscan, 'DBSCAN')
-        st.pyplot(fig_pca_dbscan)
+        st.image(obter_figura('pca_dbscan', [impressao_digital, K_OTIMO, DBSCAN_EPS, DBSCAN_MIN_SAMPLES],
+                              lambda: visualization.plotar_cluster_pca_individual(
+                                  df_padronizado, labels_dbscan, 'DBSCAN',
+                                  projecao_pca=obter_projecao_pca(impressao_digital, df_padronizado))))
 
     st.subheader("Métricas de Avaliação Quantitativa")
-    df_avaliacao = evaluation.avaliar_modelos(df_padronizado, labels_dict)
+    df_avaliacao = modelos['avaliacao']
     st.dataframe(df_avaliacao.style.highlight_max(subset=['Coeficiente de Silhueta'], color='lightgreen').highlight_min(subset=['Índice de Davies-Bouldin'], color='lightgreen'))
     st.info("K-Means e Hierárquico novamente apresentam os resultados mais equilibrados para o objetivo de negócio de segmentar toda a base de clientes.")
 
@@ -153,7 +338,7 @@ with tab4:
     st.header("Análise de Perfil dos Clusters (Modelo K-Means)")
     st.markdown(f"Analisando as características de cada um dos **{K_OTIMO}** clusters encontrados pelo K-Means na base de dados.")
     
-    perfil_clusters = evaluation.analisar_perfis_clusters(df_numerico_original, labels_kmeans, 'K-Means')
+    perfil_clusters = modelos['perfil_kmeans']
 
     st.subheader("Tabela de Perfil Médio por Cluster (Dados Numéricos)")
     st.dataframe(perfil_clusters.style.background_gradient(cmap='viridis', axis=0))
@@ -167,8 +352,8 @@ with tab4:
         col1, col2 = st.columns([1, 2])
         
         with col1:
-            fig_radar = visualization.plotar_radar_individual(perfil_clusters, i)
-            st.pyplot(fig_radar)
+            st.image(obter_figura(f'radar_{i}', [impressao_digital, K_OTIMO],
+                                  lambda: visualization.plotar_radar_individual(perfil_clusters, i)))
         
         with col2:
             # A análise agora é baseada nas novas variáveis e nos resultados da clusterização
@@ -1,95 +1,212 @@
 # -*- coding: utf-8 -*-
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-def gerar_dados_sinteticos(n_clientes=30000, seed=42):
+# Tamanho padrão dos blocos de geração. A base é sempre produzida bloco a bloco,
+# cada um com seu próprio fluxo aleatório, de modo que o resultado depende apenas
+# de (seed, tamanho_bloco) e nunca do número de processos usados.
+TAMANHO_BLOCO_PADRAO = 1_000_000
+
+# --- CATEGORIAS E PROBABILIDADES ---
+SEXO = (['Masculino', 'Feminino'], [0.48, 0.52])
+ESTADO_CIVIL = (['Solteiro', 'Casado', 'Divorciado', 'Viúvo'], [0.35, 0.45, 0.15, 0.05])
+NIVEL_EDUCACIONAL = (['Fundamental', 'Médio', 'Superior', 'Pós-graduação'], [0.15, 0.50, 0.25, 0.10])
+TIPO_EMPREGO = (
+    ['CLT', 'Autônomo', 'Funcionário Público', 'Empresário', 'Desempregado'],
+    [0.50, 0.20, 0.10, 0.10, 0.10]
+)
+PRODUTO_ORIGEM_DIVIDA = (
+    ['Cartão de Crédito', 'Empréstimo Pessoal', 'Financiamento Veículo', 'Cheque Especial'],
+    [0.4, 0.3, 0.15, 0.15]
+)
+
+# --- TABELAS DE RENDA (indexadas pela posição da categoria) ---
+BASE_RENDA = {'Fundamental': 1800, 'Médio': 3500, 'Superior': 7000, 'Pós-graduação': 12000}
+MODIFICADOR_EMPREGO = {'CLT': 1.0, 'Autônomo': 1.2, 'Funcionário Público': 1.3, 'Empresário': 1.8, 'Desempregado': 0.3}
+_BASE_RENDA_ARRAY = np.array([BASE_RENDA[c] for c in NIVEL_EDUCACIONAL[0]], dtype=float)
+_MODIFICADOR_EMPREGO_ARRAY = np.array([MODIFICADOR_EMPREGO[c] for c in TIPO_EMPREGO[0]], dtype=float)
+_CODIGO_DESEMPREGADO = TIPO_EMPREGO[0].index('Desempregado')
+
+
+def _sortear_codigos(rng, categorias, n):
     """
-    Gera uma base de dados sintética de clientes inadimplentes,
-    incluindo dados sociodemográficos e de comportamento de crédito.
-    --- VERSÃO COM MAIOR VARIABILIDADE E REALISMO ---
+    Sorteia os códigos inteiros (posição na lista de categorias) conforme as probabilidades.
     """
-    print(f"Iniciando a geração de {n_clientes} registros de dados sintéticos...")
-    np.random.seed(seed)
-    
+    valores, probabilidades = categorias
+    return rng.choice(len(valores), size=n, p=probabilidades).astype(np.int8)
+
+
+def _para_categorico(codigos, categorias):
+    """
+    Constrói uma coluna 'category' a partir dos códigos, com as categorias em
+    ordem alfabética (a mesma ordem que o One-Hot Encoding usaria para texto).
+    """
+    valores = categorias[0]
+    ordenadas = sorted(valores)
+    remapeamento = np.array([ordenadas.index(v) for v in valores], dtype=np.int8)
+    return pd.Categorical.from_codes(remapeamento[codigos], categories=ordenadas)
+
+
+def _gerar_bloco(inicio, n_clientes, semente):
+    """
+    Gera um bloco da base sintética usando um fluxo aleatório independente.
+
+    Args:
+        inicio (int): Posição do primeiro cliente do bloco (define o cliente_id).
+        n_clientes (int): Número de registros do bloco.
+        semente (np.random.SeedSequence): Semente exclusiva do bloco.
+
+    Returns:
+        pd.DataFrame: O bloco gerado.
+    """
+    rng = np.random.default_rng(semente)
+
     # --- DADOS DEMOGRÁFICOS ---
-    cliente_id = np.arange(1, n_clientes + 1)
-    
-    # --- ALTERADO: Idade com distribuição Normal ---
-    # Em vez de uma chance igual para todas as idades (uniforme), usamos uma
-    # distribuição normal (curva de sino) centrada em 45 anos. Mais realista.
-    idade = np.random.normal(loc=45, scale=15, size=n_clientes)
-    idade = np.clip(idade, 18, 85).astype(int) # Garante que as idades fiquem entre 18 e 85
-
-    sexo = np.random.choice(['Masculino', 'Feminino'], size=n_clientes, p=[0.48, 0.52]) # Proporção levemente ajustada
-    estado_civil = np.random.choice(['Solteiro', 'Casado', 'Divorciado', 'Viúvo'], size=n_clientes, p=[0.35, 0.45, 0.15, 0.05])
-
-    # --- ALTERADO: Dependentes com distribuição de Poisson ---
-    # A distribuição de Poisson é ideal para dados de contagem. A maioria das pessoas
-    # terá 0, 1 ou 2 dependentes, e poucos terão mais que isso.
-    numero_dependentes = np.random.poisson(lam=1.2, size=n_clientes)
-    numero_dependentes = np.clip(numero_dependentes, 0, 8) # Evita valores extremos raros
-    
-    nivel_educacional = np.random.choice(
-        ['Fundamental', 'Médio', 'Superior', 'Pós-graduação'], 
-        size=n_clientes, p=[0.15, 0.50, 0.25, 0.10]
-    )
-    tipo_emprego = np.random.choice(
-        ['CLT', 'Autônomo', 'Funcionário Público', 'Empresário', 'Desempregado'],
-        size=n_clientes, p=[0.50, 0.20, 0.10, 0.10, 0.10]
-    )
+    cliente_id = np.arange(inicio + 1, inicio + n_clientes + 1)
+
+    # Idade com distribuição Normal centrada em 45 anos, limitada entre 18 e 85
+    idade = rng.normal(loc=45, scale=15, size=n_clientes)
+    idade = np.clip(idade, 18, 85).astype(int)
+
+    sexo = _sortear_codigos(rng, SEXO, n_clientes)
+    estado_civil = _sortear_codigos(rng, ESTADO_CIVIL, n_clientes)
+
+    # Dependentes com distribuição de Poisson, evitando valores extremos raros
+    numero_dependentes = rng.poisson(lam=1.2, size=n_clientes)
+    numero_dependentes = np.clip(numero_dependentes, 0, 8)
+
+    nivel_educacional = _sortear_codigos(rng, NIVEL_EDUCACIONAL, n_clientes)
+    tipo_emprego = _sortear_codigos(rng, TIPO_EMPREGO, n_clientes)
 
     # --- DADOS FINANCEIROS E DE DÍVIDA ---
-    base_renda = {'Fundamental': 1800, 'Médio': 3500, 'Superior': 7000, 'Pós-graduação': 12000}
-    modificador_emprego = {'CLT': 1.0, 'Autônomo': 1.2, 'Funcionário Público': 1.3, 'Empresário': 1.8, 'Desempregado': 0.3}
-    renda_mensal = [base_renda[edu] * modificador_emprego[emp] * np.random.uniform(0.7, 1.3) for edu, emp in zip(nivel_educacional, tipo_emprego)]
-    renda_mensal = np.array(renda_mensal).round(2)
-
-    # --- ALTERADO: Histórico de pagamento com mais variabilidade ---
-    # Criamos dois perfis: "bons pagadores" e "pagadores de risco" para que a variável
-    # não seja sempre alta, criando mais contraste.
-    risky_mask = np.random.rand(n_clientes) < 0.3 # 30% são mais arriscados
+    # Consulta vetorizada das tabelas de renda pelos códigos das categorias
+    renda_mensal = (
+        _BASE_RENDA_ARRAY[nivel_educacional]
+        * _MODIFICADOR_EMPREGO_ARRAY[tipo_emprego]
+        * rng.uniform(0.7, 1.3, size=n_clientes)
+    ).round(2)
+
+    # Histórico de pagamento com dois perfis: "bons pagadores" e "pagadores de risco"
+    risky_mask = rng.random(n_clientes) < 0.3 # 30% são mais arriscados
     good_payer_mask = ~risky_mask
     historico_pagamento_recente = np.zeros(n_clientes)
-    historico_pagamento_recente[good_payer_mask] = np.random.beta(a=8, b=2, size=good_payer_mask.sum()) # Tendência a pagar em dia
-    historico_pagamento_recente[risky_mask] = np.random.beta(a=2, b=3, size=risky_mask.sum()) # Tendência a atrasar
+    historico_pagamento_recente[good_payer_mask] = rng.beta(a=8, b=2, size=good_payer_mask.sum()) # Tendência a pagar em dia
+    historico_pagamento_recente[risky_mask] = rng.beta(a=2, b=3, size=risky_mask.sum()) # Tendência a atrasar
     historico_pagamento_recente = historico_pagamento_recente.round(2)
-    
+
     score_credito = 300 + (renda_mensal / 200) + (idade * 1.5) + (historico_pagamento_recente * 300)
-    score_credito += np.random.randint(-50, 50, size=n_clientes)
-    score_credito[tipo_emprego == 'Desempregado'] -= 100
+    score_credito += rng.integers(-50, 50, size=n_clientes)
+    score_credito[tipo_emprego == _CODIGO_DESEMPREGADO] -= 100
     score_credito = np.clip(score_credito, 300, 950).astype(int)
 
-    produto_origem_divida = np.random.choice(
-        ['Cartão de Crédito', 'Empréstimo Pessoal', 'Financiamento Veículo', 'Cheque Especial'],
-        size=n_clientes, p=[0.4, 0.3, 0.15, 0.15]
-    )
+    produto_origem_divida = _sortear_codigos(rng, PRODUTO_ORIGEM_DIVIDA, n_clientes)
 
-    # --- ALTERADO: Tempo de débito com distribuição Exponencial ---
-    # A maioria das dívidas será mais recente, com poucas sendo muito antigas.
-    # A distribuição exponencial modela isso muito bem.
-    tempo_de_debito_meses = np.random.exponential(scale=18, size=n_clientes) # Média de 18 meses
+    # Tempo de débito com distribuição Exponencial (média de 18 meses)
+    tempo_de_debito_meses = rng.exponential(scale=18, size=n_clientes)
     tempo_de_debito_meses = np.clip(tempo_de_debito_meses, 1, 60).astype(int)
-    
-    valor_divida = (renda_mensal * np.random.uniform(0.2, 2.0, size=n_clientes))
+
+    valor_divida = (renda_mensal * rng.uniform(0.2, 2.0, size=n_clientes))
     valor_divida[valor_divida < 100] = 100
-    
-    # --- CRIAÇÃO DO DATAFRAME FINAL ---
-    df = pd.DataFrame({
-        'cliente_id': cliente_id, 
-        'idade': idade, 
-        'sexo': sexo,
-        'estado_civil': estado_civil, 
-        'nivel_educacional': nivel_educacional,
-        'numero_dependentes': numero_dependentes, 
-        'tipo_emprego': tipo_emprego,
-        'renda_mensal': renda_mensal, 
+
+    # --- CRIAÇÃO DO DATAFRAME DO BLOCO ---
+    return pd.DataFrame({
+        'cliente_id': cliente_id,
+        'idade': idade,
+        'sexo': _para_categorico(sexo, SEXO),
+        'estado_civil': _para_categorico(estado_civil, ESTADO_CIVIL),
+        'nivel_educacional': _para_categorico(nivel_educacional, NIVEL_EDUCACIONAL),
+        'numero_dependentes': numero_dependentes,
+        'tipo_emprego': _para_categorico(tipo_emprego, TIPO_EMPREGO),
+        'renda_mensal': renda_mensal,
         'score_credito': score_credito,
         'historico_pagamento_recente': historico_pagamento_recente,
-        'produto_origem_divida': produto_origem_divida,
+        'produto_origem_divida': _para_categorico(produto_origem_divida, PRODUTO_ORIGEM_DIVIDA),
         'tempo_de_debito_meses': tempo_de_debito_meses,
         'valor_divida': valor_divida.round(2)
     })
-    
+
+
+def _planejar_blocos(n_clientes, seed, tamanho_bloco):
+    """
+    Divide a base em blocos de tamanho fixo e associa a cada um uma semente
+    derivada da SeedSequence principal.
+
+    Returns:
+        list: Tuplas (indice, inicio, n_clientes_bloco, semente).
+    """
+    n_blocos = max(1, -(-n_clientes // tamanho_bloco))
+    sementes = np.random.SeedSequence(seed).spawn(n_blocos)
+    blocos = []
+    for indice, semente in enumerate(sementes):
+        inicio = indice * tamanho_bloco
+        blocos.append((indice, inicio, min(tamanho_bloco, n_clientes - inicio), semente))
+    return blocos
+
+
+def gerar_dados_sinteticos(n_clientes=30000, seed=42, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Gera uma base de dados sintética de clientes inadimplentes,
+    incluindo dados sociodemográficos e de comportamento de crédito.
+    --- VERSÃO COM MAIOR VARIABILIDADE E REALISMO ---
+
+    A geração é vetorizada e feita em blocos de tamanho fixo, cada um com um
+    np.random.Generator derivado de SeedSequence(seed). O resultado é idêntico
+    ao de gerar_base_em_blocos com os mesmos seed e tamanho_bloco.
+    """
+    print(f"Iniciando a geração de {n_clientes} registros de dados sintéticos...")
+    blocos = [
+        _gerar_bloco(inicio, n, semente)
+        for _, inicio, n, semente in _planejar_blocos(n_clientes, seed, tamanho_bloco)
+    ]
+    df = blocos[0] if len(blocos) == 1 else pd.concat(blocos, ignore_index=True)
+
     print("Base de dados sintética (com maior variabilidade) gerada com sucesso.")
     print(f"Dimensões do DataFrame: {df.shape}")
-    return df
\ No newline at end of file
+    return df
+
+
+def _gerar_e_salvar_bloco(pasta_saida, indice, inicio, n_clientes, semente):
+    """
+    Gera um bloco e o grava diretamente em disco (executado nos processos do pool).
+    """
+    caminho = os.path.join(pasta_saida, f"parte-{indice:05d}.parquet")
+    _gerar_bloco(inicio, n_clientes, semente).to_parquet(caminho, index=False)
+    return caminho
+
+
+def gerar_base_em_blocos(pasta_saida, n_clientes=10_000_000, seed=42,
+                         tamanho_bloco=TAMANHO_BLOCO_PADRAO, n_workers=None):
+    """
+    Gera uma base sintética grande em blocos, em paralelo, gravando cada bloco
+    como um arquivo Parquet na pasta de saída (um dataset Parquet particionado).
+
+    Cada bloco usa a semente de índice fixo derivada de SeedSequence(seed), por isso
+    a base gerada é a mesma para qualquer número de processos.
+
+    Args:
+        pasta_saida (str): Pasta onde os arquivos 'parte-XXXXX.parquet' serão gravados.
+        n_clientes (int): Número total de registros.
+        seed (int): Semente principal.
+        tamanho_bloco (int): Número de registros por bloco.
+        n_workers (int, opcional): Número de processos. Se None, usa todos os núcleos.
+
+    Returns:
+        list: Caminhos dos arquivos gerados, em ordem.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    blocos = _planejar_blocos(n_clientes, seed, tamanho_bloco)
+    n_workers = n_workers or os.cpu_count() or 1
+    print(f"Gerando {n_clientes} registros em {len(blocos)} blocos com {n_workers} processo(s)...")
+
+    if n_workers == 1:
+        caminhos = [_gerar_e_salvar_bloco(pasta_saida, *bloco) for bloco in blocos]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futuros = [executor.submit(_gerar_e_salvar_bloco, pasta_saida, *bloco) for bloco in blocos]
+            caminhos = [futuro.result() for futuro in futuros]
+
+    print(f"Base sintética gravada em '{pasta_saida}' ({len(caminhos)} arquivos).")
+    return caminhos
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import KDTree, BallTree, NearestNeighbors
+
+# Teto padrão (em MB) para as listas de vizinhos mantidas em memória por bloco
+MEMORIA_MAX_MB = 512
+# Pontos usados para estimar a curva de k-distâncias (consultados contra a base inteira)
+TAMANHO_AMOSTRA_EPS = 20_000
+# Bytes por vizinho retornado pelo índice (índice int64 + distância float64)
+_BYTES_POR_VIZINHO = 16
+# Acima desta dimensão as árvores perdem para a força bruta (mesma regra do scikit-learn).
+# Nas 21 colunas do pipeline (30 mil clientes, eps=2.5), o DBSCAN indexado leva ~7 s com
+# força bruta, ~67 s com ball tree e ~89 s com KD-tree (python -m benchmarks.bench_dbscan)
+MAX_DIMENSOES_ARVORE = 15
+
+
+def construir_indice(dados, algoritmo='auto', leaf_size=40):
+    """
+    Constrói uma única vez o índice de vizinhança sobre os dados.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        algoritmo (str): 'kd_tree', 'ball_tree', 'brute' ou 'auto' (KD-tree até 15
+            dimensões; acima disso força bruta em blocos, pois as árvores degeneram).
+        leaf_size (int): Tamanho das folhas da árvore.
+
+    Returns:
+        KDTree, BallTree ou NearestNeighbors (força bruta): O índice construído.
+    """
+    X = np.ascontiguousarray(np.asarray(dados, dtype=np.float64))
+    if algoritmo == 'auto':
+        algoritmo = 'kd_tree' if X.shape[1] <= MAX_DIMENSOES_ARVORE else 'brute'
+    if algoritmo == 'kd_tree':
+        return KDTree(X, leaf_size=leaf_size)
+    if algoritmo == 'ball_tree':
+        return BallTree(X, leaf_size=leaf_size)
+    if algoritmo == 'brute':
+        return NearestNeighbors(algorithm='brute').fit(X)
+    raise ValueError(f"Algoritmo '{algoritmo}' inválido. Use 'auto', 'kd_tree', 'ball_tree' ou 'brute'.")
+
+
+def _eh_arvore(indice):
+    return isinstance(indice, (KDTree, BallTree))
+
+
+def _k_distancias(indice, X, k):
+    """
+    Distância de cada linha de X ao seu k-ésimo vizinho (contando o próprio ponto).
+    """
+    if _eh_arvore(indice):
+        distancias, _ = indice.query(X, k=k)
+    else:
+        distancias, _ = indice.kneighbors(X, n_neighbors=k)
+    return distancias[:, -1]
+
+
+def _vizinhos_no_raio(indice, X, eps, return_distance=False):
+    """
+    Listas de vizinhos (e distâncias) dentro de eps, com a mesma interface para árvore e força bruta.
+    """
+    if _eh_arvore(indice):
+        return indice.query_radius(X, eps, return_distance=return_distance)
+    resultado = indice.radius_neighbors(X, eps, return_distance=return_distance)
+    if return_distance:
+        distancias, vizinhos = resultado
+        return vizinhos, distancias
+    return resultado
+
+
+def _contar_vizinhos(indice, X, eps, memoria_max_mb):
+    """
+    Número de vizinhos dentro de eps (incluindo o próprio ponto) de cada linha de X.
+
+    Nas árvores a contagem não materializa as listas; na força bruta as linhas são
+    processadas em blocos cujo pior caso (todos vizinhos) cabe no teto de memória.
+    """
+    if _eh_arvore(indice):
+        return indice.query_radius(X, eps, count_only=True)
+    n_indexado = indice.n_samples_fit_
+    linhas_por_bloco = max(1, int(memoria_max_mb * 2**20 // (n_indexado * _BYTES_POR_VIZINHO)))
+    contagens = np.empty(X.shape[0], dtype=np.int64)
+    for inicio in range(0, X.shape[0], linhas_por_bloco):
+        vizinhos = indice.radius_neighbors(X[inicio:inicio + linhas_por_bloco], eps, return_distance=False)
+        contagens[inicio:inicio + linhas_por_bloco] = [len(v) for v in vizinhos]
+    return contagens
+
+
+def _arestas(indice, X, linhas, eps, return_distance=False):
+    """
+    Pares (origem, destino[, distância]) de vizinhos dentro de eps para as linhas indicadas.
+    """
+    resultado = _vizinhos_no_raio(indice, X[linhas], eps, return_distance=return_distance)
+    vizinhos = resultado[0] if return_distance else resultado
+    tamanhos = np.fromiter((len(v) for v in vizinhos), dtype=np.int64, count=len(vizinhos))
+    origem = np.repeat(linhas, tamanhos)
+    destino = np.concatenate(vizinhos) if len(vizinhos) else np.empty(0, dtype=np.int64)
+    if not return_distance:
+        return origem, destino
+    distancia = np.concatenate(resultado[1]) if len(vizinhos) else np.empty(0)
+    return origem, destino, distancia
+
+
+def estimar_eps(dados, min_samples, indice=None, tamanho_amostra=TAMANHO_AMOSTRA_EPS, random_state=42):
+    """
+    Deriva o eps automaticamente a partir da curva de k-distâncias.
+
+    Para uma amostra de pontos, calcula a distância ao min_samples-ésimo vizinho
+    (contando o próprio ponto, como no DBSCAN), ordena essas distâncias e escolhe
+    o "joelho" da curva: o ponto mais distante da reta que liga os extremos.
+
+    Returns:
+        float: O eps sugerido.
+    """
+    X = np.asarray(dados, dtype=np.float64)
+    if indice is None:
+        indice = construir_indice(X)
+
+    n = X.shape[0]
+    if n > tamanho_amostra:
+        amostra = np.random.default_rng(random_state).choice(n, size=tamanho_amostra, replace=False)
+        X = X[amostra]
+
+    k_distancias = np.sort(_k_distancias(indice, X, min_samples))
+
+    # Normaliza a curva para [0, 1] nos dois eixos e mede a distância à corda
+    x = np.linspace(0.0, 1.0, len(k_distancias))
+    amplitude = k_distancias[-1] - k_distancias[0]
+    if amplitude <= 0:
+        return float(k_distancias[-1])
+    y = (k_distancias - k_distancias[0]) / amplitude
+    joelho = int(np.argmax(x - y))
+    return float(k_distancias[joelho])
+
+
+def _blocos_por_memoria(contagens, memoria_max_mb):
+    """
+    Divide as posições em blocos consecutivos cujo total de vizinhos cabe no teto de memória.
+    """
+    limite = max(1, int(memoria_max_mb * 2**20 // _BYTES_POR_VIZINHO))
+    acumulado = np.cumsum(contagens)
+    fronteiras = [0]
+    while fronteiras[-1] < len(contagens):
+        inicio = fronteiras[-1]
+        base = acumulado[inicio - 1] if inicio > 0 else 0
+        fim = int(np.searchsorted(acumulado, base + limite, side='right'))
+        fronteiras.append(max(fim, inicio + 1))
+    return list(zip(fronteiras[:-1], fronteiras[1:]))
+
+
+def dbscan_indexado(dados, eps='auto', min_samples=5, indice=None, memoria_max_mb=MEMORIA_MAX_MB,
+                    algoritmo='auto'):
+    """
+    DBSCAN com índice de vizinhança único (árvore ou força bruta, ver construir_indice)
+    e vizinhanças processadas em blocos de memória limitada.
+
+    1. Conta os vizinhos de cada ponto (sem materializar as listas) e marca os núcleos.
+    2. Percorre os núcleos em blocos dimensionados pelas contagens, de modo que as
+       listas de vizinhos de um bloco nunca passem de memoria_max_mb, e une os
+       núcleos vizinhos com componentes conexos incrementais.
+    3. Atribui cada ponto de borda ao cluster do núcleo mais próximo dentro de eps;
+       os demais pontos são ruído (-1).
+
+    Os clusters são numerados pela ordem do primeiro núcleo na base, como no
+    scikit-learn; a única diferença possível está em pontos de borda equidistantes
+    de clusters distintos.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        eps (float ou 'auto'): Raio de vizinhança; 'auto' usa estimar_eps.
+        min_samples (int): Mínimo de pontos (incluindo o próprio) para um núcleo.
+        indice (opcional): Índice de construir_indice já construído sobre os mesmos dados.
+        memoria_max_mb (float): Teto de memória para as listas de vizinhos de cada bloco.
+        algoritmo (str): Tipo de índice se ele precisar ser construído (ver construir_indice).
+
+    Returns:
+        tuple: (labels, resumo), com resumo = {'eps', 'min_samples', 'n_clusters',
+               'n_ruido', 'indices_nucleo'}
+    """
+    X = np.ascontiguousarray(np.asarray(dados, dtype=np.float64))
+    n = X.shape[0]
+    if indice is None:
+        indice = construir_indice(X, algoritmo)
+    if eps == 'auto':
+        eps = estimar_eps(X, min_samples, indice)
+
+    # 1. Contagem de vizinhos (inclui o próprio ponto) e identificação dos núcleos
+    contagens = np.empty(n, dtype=np.int64)
+    for inicio, fim in _blocos_por_memoria(np.ones(n), memoria_max_mb):
+        contagens[inicio:fim] = _contar_vizinhos(indice, X[inicio:fim], eps, memoria_max_mb)
+    nucleo = contagens >= min_samples
+    indices_nucleo = np.flatnonzero(nucleo)
+
+    # 2. Componentes conexos entre núcleos, bloco a bloco
+    componente = np.arange(n)
+    for inicio, fim in _blocos_por_memoria(contagens[indices_nucleo], memoria_max_mb):
+        origem, destino = _arestas(indice, X, indices_nucleo[inicio:fim], eps)
+        entre_nucleos = nucleo[destino]
+        a = componente[origem[entre_nucleos]]
+        b = componente[destino[entre_nucleos]]
+        grafo = sparse.csr_matrix((np.ones(len(a), dtype=np.int8), (a, b)), shape=(n, n))
+        _, rotulos = connected_components(grafo, directed=False)
+        componente = rotulos[componente]
+
+    labels = _numerar_clusters(componente[indices_nucleo], indices_nucleo, n)
+
+    # 3. Pontos de borda: cluster do núcleo mais próximo dentro de eps
+    candidatos = np.flatnonzero(~nucleo & (contagens > 1))
+    for inicio, fim in _blocos_por_memoria(contagens[candidatos], memoria_max_mb):
+        origem, destino, distancia = _arestas(indice, X, candidatos[inicio:fim], eps, return_distance=True)
+        mascara = nucleo[destino]
+        origem, destino, distancia = origem[mascara], destino[mascara], distancia[mascara]
+        # Ordena por (ponto, distância) e fica com o primeiro núcleo de cada ponto
+        ordem = np.lexsort((distancia, origem))
+        pontos, primeiro = np.unique(origem[ordem], return_index=True)
+        labels[pontos] = labels[destino[ordem][primeiro]]
+
+    return labels, resumir_rotulos(labels, eps=eps, min_samples=min_samples, indices_nucleo=indices_nucleo)
+
+
+def _numerar_clusters(componentes_nucleo, indices_nucleo, n):
+    """
+    Rótulos dos núcleos (demais pontos -1), com os clusters numerados pela ordem do
+    primeiro núcleo de cada componente na base, como no scikit-learn.
+    """
+    labels = np.full(n, -1, dtype=np.int32)
+    if len(indices_nucleo):
+        _, primeira_ocorrencia, inverso = np.unique(componentes_nucleo, return_index=True, return_inverse=True)
+        ordem = np.argsort(np.argsort(primeira_ocorrencia))
+        labels[indices_nucleo] = ordem[inverso.ravel()]
+    return labels
+
+
+def grafo_vizinhanca(dados, eps_max, indice=None, memoria_max_mb=MEMORIA_MAX_MB, algoritmo='auto'):
+    """
+    Grafo esparso de vizinhança no raio eps_max, calculado uma única vez.
+
+    Cada linha guarda os vizinhos do ponto (sem o próprio ponto) ordenados pela
+    distância, de modo que qualquer eps <= eps_max é obtido filtrando o grafo, sem
+    nova busca de vizinhos. A busca é feita em blocos dimensionados pelas contagens.
+
+    Returns:
+        scipy.sparse.csr_matrix: Matriz n x n com as distâncias (índices de cada linha
+            em ordem de distância, não de coluna; não reordene).
+    """
+    X = np.ascontiguousarray(np.asarray(dados, dtype=np.float64))
+    n = X.shape[0]
+    if indice is None:
+        indice = construir_indice(X, algoritmo)
+    contagens = np.empty(n, dtype=np.int64)
+    for inicio, fim in _blocos_por_memoria(np.ones(n), memoria_max_mb):
+        contagens[inicio:fim] = _contar_vizinhos(indice, X[inicio:fim], eps_max, memoria_max_mb)
+
+    destinos, distancias = [], []
+    for inicio, fim in _blocos_por_memoria(contagens, memoria_max_mb):
+        origem, destino, distancia = _arestas(indice, X, np.arange(inicio, fim), eps_max, return_distance=True)
+        fora_diagonal = origem != destino
+        origem, destino, distancia = origem[fora_diagonal], destino[fora_diagonal], distancia[fora_diagonal]
+        ordem = np.lexsort((distancia, origem))
+        destinos.append(destino[ordem].astype(np.int32))
+        distancias.append(distancia[ordem])
+    indptr = np.concatenate(([0], np.cumsum(contagens - 1)))
+    return sparse.csr_matrix((np.concatenate(distancias), np.concatenate(destinos), indptr), shape=(n, n))
+
+
+def dbscan_do_grafo(grafo, eps, min_samples):
+    """
+    DBSCAN para um (eps, min_samples) filtrando um grafo de grafo_vizinhanca (eps <= eps_max).
+
+    Mesmo resultado do dbscan_indexado: núcleos pela contagem de vizinhos no raio
+    (incluindo o próprio ponto), clusters pelos componentes conexos entre núcleos e
+    cada ponto de borda no cluster do núcleo mais próximo.
+
+    Returns:
+        tuple: (labels, resumo) como em dbscan_indexado.
+    """
+    n = grafo.shape[0]
+    origem = np.repeat(np.arange(n), np.diff(grafo.indptr))
+    no_raio = grafo.data <= eps
+    origem, destino = origem[no_raio], grafo.indices[no_raio]
+    nucleo = np.bincount(origem, minlength=n) + 1 >= min_samples
+    indices_nucleo = np.flatnonzero(nucleo)
+
+    entre_nucleos = nucleo[origem] & nucleo[destino]
+    ligacoes = sparse.csr_matrix(
+        (np.ones(int(entre_nucleos.sum()), dtype=np.int8), (origem[entre_nucleos], destino[entre_nucleos])),
+        shape=(n, n)
+    )
+    _, componente = connected_components(ligacoes, directed=False)
+    labels = _numerar_clusters(componente[indices_nucleo], indices_nucleo, n)
+
+    # Bordas: as arestas de cada linha estão em ordem de distância, a primeira até um núcleo é a mais próxima
+    borda = ~nucleo[origem] & nucleo[destino]
+    pontos, primeiro = np.unique(origem[borda], return_index=True)
+    labels[pontos] = labels[destino[borda][primeiro]]
+    return labels, resumir_rotulos(labels, eps=eps, min_samples=min_samples, indices_nucleo=indices_nucleo)
+
+
+def grade_dbscan(dados, valores_eps, valores_min_samples, indice=None, memoria_max_mb=MEMORIA_MAX_MB,
+                 modo_silhueta='amostrado', n_jobs=1, retornar_labels=False):
+    """
+    Avalia todas as combinações (eps, min_samples) com uma única busca de vizinhos.
+
+    O grafo de vizinhança é calculado no maior eps e filtrado para cada combinação; as
+    métricas de todas as combinações saem das mesmas passagens sobre a matriz
+    (evaluation.calcular_metricas) e as silhuetas são calculadas em paralelo com n_jobs > 1.
+    O ruído fica fora das métricas, como em evaluation.avaliar_modelos.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        valores_eps (iterable): Raios avaliados.
+        valores_min_samples (iterable): Valores de min_samples avaliados.
+        indice (opcional): Índice de construir_indice já construído sobre os mesmos dados.
+        memoria_max_mb (float): Teto de memória para as listas de vizinhos de cada bloco.
+        modo_silhueta (str): 'exato', 'amostrado', 'auto' ou None (sem silhueta).
+        n_jobs (int): Processos para as silhuetas.
+        retornar_labels (bool): Retorna também {(eps, min_samples): labels}.
+
+    Returns:
+        pd.DataFrame: Uma linha por combinação, com 'eps', 'min_samples', 'n_clusters',
+            'n_ruido', 'fracao_ruido', 'silhueta', 'davies_bouldin', 'calinski_harabasz',
+            'inercia' e 'separacao_minima' (NaN com menos de 2 clusters).
+    """
+    # Importação local: o motor de métricas só é necessário na grade
+    import pandas as pd
+    import evaluation
+
+    valores_eps = sorted(float(e) for e in valores_eps)
+    valores_min_samples = sorted(int(m) for m in valores_min_samples)
+    X = np.asarray(dados)
+    grafo = grafo_vizinhanca(X, valores_eps[-1], indice, memoria_max_mb)
+
+    labels_dict, linhas = {}, []
+    for eps in valores_eps:
+        for min_samples in valores_min_samples:
+            labels, resumo = dbscan_do_grafo(grafo, eps, min_samples)
+            labels_dict[(eps, min_samples)] = labels
+            linhas.append({'eps': eps, 'min_samples': min_samples, 'n_clusters': resumo['n_clusters'],
+                           'n_ruido': resumo['n_ruido'], 'fracao_ruido': resumo['n_ruido'] / len(labels)})
+
+    metricas = evaluation.calcular_metricas(X, labels_dict)
+    silhuetas = {}
+    if modo_silhueta is not None and metricas:
+        silhuetas = evaluation.silhuetas_modelos(X, {chave: labels_dict[chave] for chave in metricas},
+                                                 modo_silhueta=modo_silhueta, n_jobs=n_jobs)
+    for linha in linhas:
+        chave = (linha['eps'], linha['min_samples'])
+        metrica = metricas.get(chave, {})
+        linha['silhueta'] = silhuetas[chave]['silhueta'] if chave in silhuetas else np.nan
+        for nome in ('davies_bouldin', 'calinski_harabasz', 'inercia', 'separacao_minima'):
+            linha[nome] = metrica.get(nome, np.nan)
+
+    tabela = pd.DataFrame(linhas)
+    print(f"Grade do DBSCAN: {len(tabela)} combinações avaliadas com um grafo de "
+          f"{grafo.nnz:,} arestas (eps máximo {valores_eps[-1]:.4g}).")
+    if retornar_labels:
+        return tabela, labels_dict
+    return tabela
+
+
+def resumir_rotulos(labels, **informacoes):
+    """
+    Conta clusters e pontos de ruído de forma vetorizada.
+
+    Returns:
+        dict: {'n_clusters', 'n_ruido', **informacoes}
+    """
+    labels = np.asarray(labels)
+    n_ruido = int(np.count_nonzero(labels == -1))
+    n_clusters = int(np.unique(labels[labels != -1]).size)
+    return {'n_clusters': n_clusters, 'n_ruido': n_ruido, **informacoes}
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Estabilidade de clusters para a escolha de K por reamostragem.
+
+Para cada réplica, uma subamostra (ou amostra bootstrap) da base é sorteada e o
+K-Means é ajustado nela para cada K. Os centróides de cada ajuste rotulam um
+mesmo conjunto de referência (amostra fixa da base), e a concordância entre as
+réplicas é medida, para todos os pares de uma vez, pelo índice de Rand ajustado
+(ARI) e pelo índice de Jaccard de pares, calculados a partir das tabelas de
+contingência. Um K é estável quando réplicas diferentes dos dados produzem
+partições parecidas.
+
+As réplicas rodam em um pool de processos que lê uma única cópia da matriz em
+memória compartilhada; cada tarefa devolve só os rótulos da referência. Com um
+orçamento de tempo, novas réplicas deixam de ser agendadas quando ele se esgota
+e a curva usa as réplicas concluídas.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+import clustering_models
+import memoria_compartilhada
+
+N_REPLICAS_PADRAO = 20
+FRACAO_AMOSTRA_PADRAO = 0.8
+# Teto de linhas por réplica: acima dele a subamostra é limitada (custo constante em bases grandes)
+TAMANHO_MAX_REPLICA = 50_000
+TAMANHO_REFERENCIA = 5_000
+# K recomendado: o maior K com ARI médio acima deste limiar
+LIMIAR_ESTABILIDADE = 0.9
+# Memória máxima (MB) dos códigos de contingência processados de uma vez
+MEMORIA_MAX_MB = 64
+
+
+def _ajustar_replica(X, k, semente, indices_referencia, tamanho_amostra, bootstrap, modo_kmeans, n_init):
+    """
+    Ajusta o K-Means em uma réplica dos dados e rotula o conjunto de referência.
+    A semente define a réplica: a mesma amostra é usada para todos os K.
+    """
+    rng = np.random.default_rng(semente)
+    amostra = rng.choice(X.shape[0], size=tamanho_amostra, replace=bootstrap)
+    amostra.sort()
+    ajuste = clustering_models.ajustar_kmeans(X[amostra], k, modo=modo_kmeans, random_state=semente, n_init=n_init)
+    labels, _ = clustering_models.atribuir_e_inercia(X[indices_referencia], ajuste['centros'])
+    return labels.astype(np.int16)
+
+
+def _tarefa_replica(k, replica, semente, indices_referencia, tamanho_amostra, bootstrap, modo_kmeans, n_init):
+    """
+    Tarefa do pool: ajusta uma réplica sobre a matriz em memória compartilhada.
+    """
+    labels = _ajustar_replica(memoria_compartilhada.matriz_do_processo(), k, semente, indices_referencia,
+                              tamanho_amostra, bootstrap, modo_kmeans, n_init)
+    return k, replica, labels
+
+
+def _pares_combinacoes(contagens):
+    """
+    Soma de C(n, 2) ao longo do último eixo.
+    """
+    contagens = contagens.astype(np.float64)
+    return (contagens * (contagens - 1) / 2).sum(axis=-1)
+
+
+def concordancia_entre_replicas(rotulos, n_rotulos, memoria_max_mb=MEMORIA_MAX_MB):
+    """
+    ARI e Jaccard de pares entre todas as réplicas, vetorizados pelas tabelas de contingência.
+
+    As tabelas de todos os pares são obtidas por um único bincount sobre os códigos
+    (par, rótulo_a, rótulo_b), em blocos de pares limitados por memoria_max_mb.
+
+    Args:
+        rotulos (np.ndarray): Matriz réplicas x pontos de referência com rótulos em 0..n_rotulos-1.
+        n_rotulos (int): Número de rótulos possíveis (K).
+        memoria_max_mb (float): Memória máxima dos códigos de um bloco de pares.
+
+    Returns:
+        dict: {'ari', 'jaccard'}, arrays com um valor por par de réplicas (i < j).
+    """
+    rotulos = np.asarray(rotulos, dtype=np.int64)
+    n_replicas, n_pontos = rotulos.shape
+    pares_i, pares_j = np.triu_indices(n_replicas, k=1)
+    ari = np.empty(len(pares_i))
+    jaccard = np.empty(len(pares_i))
+    total_pares = n_pontos * (n_pontos - 1) / 2
+    celulas = n_rotulos * n_rotulos
+    pares_por_bloco = max(1, int(memoria_max_mb * 2**20 // (8 * max(n_pontos, 1))))
+
+    for inicio in range(0, len(pares_i), pares_por_bloco):
+        i, j = pares_i[inicio:inicio + pares_por_bloco], pares_j[inicio:inicio + pares_por_bloco]
+        deslocamento = (np.arange(len(i)) * celulas)[:, None]
+        codigos = deslocamento + rotulos[i] * n_rotulos + rotulos[j]
+        tabelas = np.bincount(codigos.ravel(), minlength=len(i) * celulas).reshape(len(i), n_rotulos, n_rotulos)
+
+        soma_celulas = _pares_combinacoes(tabelas.reshape(len(i), -1))
+        soma_a = _pares_combinacoes(tabelas.sum(axis=2))
+        soma_b = _pares_combinacoes(tabelas.sum(axis=1))
+        esperado = soma_a * soma_b / total_pares
+        maximo = (soma_a + soma_b) / 2
+        denominador = maximo - esperado
+        # Partições triviais (ex.: um único grupo nas duas réplicas) concordam perfeitamente
+        ari[inicio:inicio + len(i)] = np.where(
+            denominador == 0, 1.0, (soma_celulas - esperado) / np.where(denominador == 0, 1, denominador)
+        )
+        uniao = soma_a + soma_b - soma_celulas
+        jaccard[inicio:inicio + len(i)] = np.where(uniao == 0, 1.0, soma_celulas / np.where(uniao == 0, 1, uniao))
+    return {'ari': ari, 'jaccard': jaccard}
+
+
+def recomendar_k(estabilidade, limiar=LIMIAR_ESTABILIDADE):
+    """
+    Maior K cujo ARI médio atinge o limiar; se nenhum atingir, o K mais estável.
+    """
+    range_k = np.asarray(estabilidade['range_k'])
+    ari = np.asarray(estabilidade['estabilidade_ari'], dtype=float)
+    validos = ~np.isnan(ari)
+    if not validos.any():
+        return None
+    acima = validos & (ari >= limiar)
+    if acima.any():
+        return int(range_k[acima].max())
+    return int(range_k[validos][np.nanargmax(ari[validos])])
+
+
+def estabilidade_k(dados, range_k=range(2, 11), n_replicas=N_REPLICAS_PADRAO, fracao_amostra=FRACAO_AMOSTRA_PADRAO,
+                   bootstrap=False, n_jobs=-1, orcamento_s=None, random_state=42, modo_kmeans='completo',
+                   n_init=3, tamanho_max_replica=TAMANHO_MAX_REPLICA, tamanho_referencia=TAMANHO_REFERENCIA,
+                   limiar=LIMIAR_ESTABILIDADE, callback=None):
+    """
+    Curva de estabilidade do K-Means para cada K por reamostragem.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        range_k (iterable): Valores de K avaliados.
+        n_replicas (int): Réplicas por K (a concordância é medida entre todos os pares).
+        fracao_amostra (float): Fração das linhas em cada subamostra (sem reposição).
+        bootstrap (bool): Amostras com reposição (bootstrap) em vez de subamostras.
+        n_jobs (int): Número de processos (1 = serial; None ou -1 = todos os núcleos).
+        orcamento_s (float, opcional): Tempo máximo; ao esgotar, novas réplicas não são agendadas.
+        random_state (int): Semente das réplicas e do conjunto de referência.
+        modo_kmeans (str): 'completo' ou 'minibatch' (ver clustering_models.ajustar_kmeans).
+        n_init (int): Inicializações do K-Means em cada réplica.
+        tamanho_max_replica (int): Teto de linhas por réplica.
+        tamanho_referencia (int): Linhas do conjunto de referência rotulado por todas as réplicas.
+        limiar (float): ARI mínimo para recomendar um K (ver recomendar_k).
+        callback (callable, opcional): Chamada com (k, réplica) a cada ajuste concluído.
+
+    Returns:
+        dict: {'range_k', 'estabilidade_ari', 'estabilidade_ari_dp', 'estabilidade_jaccard',
+               'n_replicas', 'k_recomendado', 'tempo_s'}, ordenados por K. K com menos de
+               duas réplicas concluídas recebem NaN.
+    """
+    inicio = time.perf_counter()
+    range_k = sorted(range_k)
+    X = np.asarray(dados)
+    n = X.shape[0]
+    rng = np.random.default_rng(random_state)
+    indices_referencia = np.sort(rng.choice(n, size=min(tamanho_referencia, n), replace=False))
+    if bootstrap:
+        tamanho_amostra = min(n, tamanho_max_replica)
+    else:
+        tamanho_amostra = max(max(range_k), min(int(round(fracao_amostra * n)), tamanho_max_replica))
+    sementes = [int(s) for s in np.random.SeedSequence(random_state).generate_state(n_replicas)]
+    # Ordem réplica a réplica: se o orçamento acabar, todos os K ficam com o mesmo número de réplicas (±1)
+    tarefas = [(k, replica, semente) for replica, semente in enumerate(sementes) for k in range_k]
+    argumentos = (indices_referencia, tamanho_amostra, bootstrap, modo_kmeans, n_init)
+    rotulos = {k: {} for k in range_k}
+
+    def esgotado():
+        return orcamento_s is not None and time.perf_counter() - inicio >= orcamento_s
+
+    def registrar(k, replica, labels):
+        rotulos[k][replica] = labels
+        if callback is not None:
+            callback(k, replica)
+
+    n_jobs = memoria_compartilhada.resolver_n_jobs(n_jobs)
+    if n_jobs == 1:
+        for k, replica, semente in tarefas:
+            if esgotado():
+                break
+            registrar(k, replica, _ajustar_replica(X, k, semente, *argumentos))
+    else:
+        with memoria_compartilhada.pool_com_matriz(X, n_jobs) as executor:
+            pendentes = iter(tarefas)
+            # Mantém no máximo 2 tarefas por processo na fila, para o orçamento ter efeito rápido
+            futuros = {executor.submit(_tarefa_replica, *tarefa, *argumentos)
+                       for tarefa in _proximas(pendentes, 2 * n_jobs)}
+            while futuros:
+                concluidos, futuros = wait(futuros, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    registrar(*futuro.result())
+                    if not esgotado():
+                        futuros |= {executor.submit(_tarefa_replica, *tarefa, *argumentos)
+                                    for tarefa in _proximas(pendentes, 1)}
+
+    ari_medio, ari_dp, jaccard_medio, n_concluidas = [], [], [], []
+    for k in range_k:
+        replicas = [rotulos[k][r] for r in sorted(rotulos[k])]
+        n_concluidas.append(len(replicas))
+        if len(replicas) < 2:
+            ari_medio.append(np.nan)
+            ari_dp.append(np.nan)
+            jaccard_medio.append(np.nan)
+            continue
+        concordancia = concordancia_entre_replicas(np.vstack(replicas), k)
+        ari_medio.append(float(concordancia['ari'].mean()))
+        ari_dp.append(float(concordancia['ari'].std()))
+        jaccard_medio.append(float(concordancia['jaccard'].mean()))
+
+    resultado = {
+        'range_k': range_k,
+        'estabilidade_ari': ari_medio,
+        'estabilidade_ari_dp': ari_dp,
+        'estabilidade_jaccard': jaccard_medio,
+        'n_replicas': n_concluidas,
+        'tempo_s': time.perf_counter() - inicio,
+    }
+    resultado['k_recomendado'] = recomendar_k(resultado, limiar)
+    print(f"Estabilidade calculada com {sum(n_concluidas)} ajustes em {resultado['tempo_s']:.1f}s.")
+    return resultado
+
+
+def _proximas(iterador, quantidade):
+    """
+    Até `quantidade` próximos itens do iterador.
+    """
+    itens = []
+    for item in iterador:
+        itens.append(item)
+        if len(itens) == quantidade:
+            break
+    return itens
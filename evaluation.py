@@ -1,45 +1,388 @@
-from sklearn.metrics import silhouette_score, davies_bouldin_score
 import pandas as pd
 import numpy as np
+from scipy import sparse, stats
+from scipy.spatial.distance import pdist, squareform
 
-def avaliar_modelos(df_padronizado, labels_dict):
+import memoria_compartilhada
+import silhueta
+
+# Identificadores de cliente não entram no perfil numérico
+COLUNAS_IDENTIFICADORAS = ('id_cliente', 'cliente_id')
+# Linhas por bloco nas passagens sobre a matriz das métricas
+TAMANHO_BLOCO_METRICAS = 65_536
+
+def _codigos_modelos(labels_dict, n_linhas, incluir_ruido):
+    """
+    Códigos globais de cluster de todos os modelos: os clusters do modelo i ocupam
+    uma faixa própria de códigos, para que um único produto esparso acumule as
+    estatísticas de todos os modelos. Pontos descartados (ruído) recebem -1.
+    """
+    codigos, modelos, deslocamento = {}, {}, 0
+    for nome, labels in labels_dict.items():
+        labels = np.asarray(labels).ravel()
+        selecionados = np.ones(n_linhas, dtype=bool) if incluir_ruido else labels != -1
+        clusters, codigos_cluster = np.unique(labels[selecionados], return_inverse=True)
+        globais = np.full(n_linhas, -1, dtype=np.int64)
+        globais[selecionados] = deslocamento + codigos_cluster.ravel()
+        codigos[nome] = globais
+        modelos[nome] = {'clusters': clusters, 'inicio': deslocamento, 'n_ruido': int((~selecionados).sum())}
+        deslocamento += len(clusters)
+    return codigos, modelos, deslocamento
+
+def _blocos(X, tamanho_bloco):
+    for inicio in range(0, X.shape[0], tamanho_bloco):
+        yield inicio, np.asarray(X[inicio:inicio + tamanho_bloco], dtype=np.float64)
+
+def estatisticas_suficientes(dados, labels_dict, incluir_ruido=False, tamanho_bloco=TAMANHO_BLOCO_METRICAS):
+    """
+    Contagens, somas e somas de quadrados por cluster de vários modelos em uma
+    única passagem em blocos sobre a matriz.
+
+    Em cada bloco, uma matriz esparsa de pertinência (clusters de todos os modelos x
+    linhas) multiplica o bloco e as normas quadráticas das linhas: um produto por
+    bloco acumula as estatísticas de todos os modelos.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados (n x d).
+        labels_dict (dict): Nomes dos modelos e seus rótulos.
+        incluir_ruido (bool): Trata o ruído (-1) como um cluster em vez de descartá-lo.
+        tamanho_bloco (int): Linhas por bloco.
+
+    Returns:
+        dict: {nome: {'clusters', 'contagens', 'somas', 'somas_quadrados', 'n_ruido'}}, onde
+              'somas' é K x d e 'somas_quadrados' é a soma de ||x||² de cada cluster.
+    """
+    X = np.asarray(dados)
+    n, d = X.shape
+    codigos, modelos, total_clusters = _codigos_modelos(labels_dict, n, incluir_ruido)
+    contagens = np.zeros(total_clusters)
+    somas = np.zeros((total_clusters, d))
+    somas_quadrados = np.zeros(total_clusters)
+
+    for inicio, bloco in _blocos(X, tamanho_bloco):
+        normas = np.einsum('ij,ij->i', bloco, bloco)
+        linhas, colunas = [], []
+        for globais in codigos.values():
+            validos = np.flatnonzero(globais[inicio:inicio + len(bloco)] >= 0)
+            linhas.append(globais[inicio + validos])
+            colunas.append(validos)
+        linhas, colunas = np.concatenate(linhas), np.concatenate(colunas)
+        pertinencia = sparse.csr_matrix((np.ones(len(linhas)), (linhas, colunas)), shape=(total_clusters, len(bloco)))
+        contagens += np.bincount(linhas, minlength=total_clusters)
+        somas += pertinencia @ bloco
+        somas_quadrados += pertinencia @ normas
+
+    resultado = {}
+    for nome, modelo in modelos.items():
+        faixa = slice(modelo['inicio'], modelo['inicio'] + len(modelo['clusters']))
+        resultado[nome] = {'clusters': modelo['clusters'], 'contagens': contagens[faixa], 'somas': somas[faixa],
+                           'somas_quadrados': somas_quadrados[faixa], 'n_ruido': modelo['n_ruido']}
+    return resultado
+
+def _distancias_medias(dados, labels_dict, centroides, incluir_ruido, tamanho_bloco):
+    """
+    Distância euclidiana média de cada cluster ao seu centróide (dispersão do
+    Davies-Bouldin), para todos os modelos na mesma passagem em blocos.
+    """
+    X = np.asarray(dados)
+    codigos, modelos, total_clusters = _codigos_modelos(labels_dict, X.shape[0], incluir_ruido)
+    todos_centroides = np.vstack([centroides[nome] for nome in labels_dict])
+    somas = np.zeros(total_clusters)
+    for inicio, bloco in _blocos(X, tamanho_bloco):
+        for globais in codigos.values():
+            rotulos = globais[inicio:inicio + len(bloco)]
+            validos = rotulos >= 0
+            distancias = np.linalg.norm(bloco[validos] - todos_centroides[rotulos[validos]], axis=1)
+            somas += np.bincount(rotulos[validos], weights=distancias, minlength=total_clusters)
+    return {nome: somas[m['inicio']:m['inicio'] + len(m['clusters'])] for nome, m in modelos.items()}
+
+def metricas_de_estatisticas(estatisticas, distancias_medias=None):
+    """
+    Métricas internas de um modelo a partir das suas estatísticas suficientes.
+
+    Args:
+        estatisticas (dict): Saída de estatisticas_suficientes para um modelo.
+        distancias_medias (np.ndarray, opcional): Soma das distâncias de cada cluster ao
+            centróide (ver _distancias_medias); sem ela o Davies-Bouldin fica NaN.
+
+    Returns:
+        dict: {'inercia', 'calinski_harabasz', 'davies_bouldin', 'separacao_minima', 'separacao_media'}.
+              Mesmas definições do scikit-learn (inertia_, calinski_harabasz_score,
+              davies_bouldin_score).
+    """
+    contagens = estatisticas['contagens']
+    n, k = contagens.sum(), len(contagens)
+    centroides = estatisticas['somas'] / contagens[:, None]
+    media_global = estatisticas['somas'].sum(axis=0) / n
+    normas_centroides = np.einsum('ij,ij->i', centroides, centroides)
+    # Soma dos quadrados dentro de cada cluster: sum ||x||² - n_c ||c||²
+    intra = np.maximum(estatisticas['somas_quadrados'] - contagens * normas_centroides, 0.0)
+    inercia = float(intra.sum())
+    entre = float((contagens * ((centroides - media_global) ** 2).sum(axis=1)).sum())
+    calinski = 1.0 if inercia == 0 else entre * (n - k) / (inercia * (k - 1))
+
+    distancias_centroides = squareform(pdist(centroides))
+    pares = distancias_centroides[np.triu_indices(k, 1)]
+    davies = np.nan
+    if distancias_medias is not None:
+        dispersao = distancias_medias / contagens
+        if np.allclose(dispersao, 0) or np.allclose(distancias_centroides, 0):
+            davies = 0.0
+        else:
+            distancias_centroides[distancias_centroides == 0] = np.inf
+            combinadas = dispersao[:, None] + dispersao[None, :]
+            davies = float(np.max(combinadas / distancias_centroides, axis=1).mean())
+    return {'inercia': inercia, 'calinski_harabasz': float(calinski), 'davies_bouldin': davies,
+            'separacao_minima': float(pares.min()), 'separacao_media': float(pares.mean())}
+
+def calcular_metricas(dados, labels_dict, incluir_ruido=False, tamanho_bloco=TAMANHO_BLOCO_METRICAS):
+    """
+    Inércia, Calinski-Harabasz, Davies-Bouldin e separação entre centróides de vários
+    modelos de uma vez.
+
+    Uma passagem em blocos acumula as estatísticas suficientes de todos os modelos; o
+    Davies-Bouldin (distância média, não quadrática, ao centróide) usa uma segunda
+    passagem, também compartilhada por todos os modelos. Modelos com menos de 2
+    clusters são omitidos.
+
+    Returns:
+        dict: {nome: métricas de metricas_de_estatisticas + 'n_clusters' e 'fracao_ruido'}
+    """
+    estatisticas = estatisticas_suficientes(dados, labels_dict, incluir_ruido, tamanho_bloco)
+    validos = {nome: labels_dict[nome] for nome, est in estatisticas.items() if len(est['clusters']) >= 2}
+    if not validos:
+        return {}
+    centroides = {nome: estatisticas[nome]['somas'] / estatisticas[nome]['contagens'][:, None] for nome in validos}
+    distancias = _distancias_medias(dados, validos, centroides, incluir_ruido, tamanho_bloco)
+    metricas = {}
+    for nome in validos:
+        est = estatisticas[nome]
+        metricas[nome] = metricas_de_estatisticas(est, distancias[nome])
+        metricas[nome]['n_clusters'] = len(est['clusters'])
+        metricas[nome]['fracao_ruido'] = est['n_ruido'] / len(np.asarray(labels_dict[nome]))
+    return metricas
+
+def _silhueta_modelo(X, labels, incluir_ruido, modo_silhueta, max_linhas_exato):
+    """
+    Silhueta de um modelo, com o mesmo tratamento de ruído das demais métricas.
+    """
+    labels = np.asarray(labels).ravel()
+    if not incluir_ruido and (labels == -1).any():
+        selecionados = labels != -1
+        X, labels = np.asarray(X)[selecionados], labels[selecionados]
+    return silhueta.calcular_silhueta(X, labels, modo=modo_silhueta, max_linhas_exato=max_linhas_exato)
+
+def _tarefa_silhueta(nome, labels, incluir_ruido, modo_silhueta, max_linhas_exato):
+    """
+    Tarefa do pool: silhueta de um modelo sobre a matriz compartilhada.
+    """
+    return nome, _silhueta_modelo(memoria_compartilhada.matriz_do_processo(), labels, incluir_ruido,
+                                  modo_silhueta, max_linhas_exato)
+
+def silhuetas_modelos(dados, labels_dict, incluir_ruido=False, modo_silhueta='auto',
+                      max_linhas_exato=silhueta.MAX_LINHAS_EXATO, n_jobs=1):
+    """
+    Silhueta de cada modelo; com n_jobs > 1, os modelos são avaliados em paralelo
+    em um pool que lê a matriz compartilhada.
+
+    Returns:
+        dict: {nome: resultado de silhueta.calcular_silhueta}
+    """
+    argumentos = (incluir_ruido, modo_silhueta, max_linhas_exato)
+    n_jobs = min(memoria_compartilhada.resolver_n_jobs(n_jobs), len(labels_dict))
+    if n_jobs <= 1:
+        return {nome: _silhueta_modelo(dados, labels, *argumentos) for nome, labels in labels_dict.items()}
+    with memoria_compartilhada.pool_com_matriz(dados, n_jobs) as executor:
+        futuros = [executor.submit(_tarefa_silhueta, nome, np.asarray(labels), *argumentos)
+                   for nome, labels in labels_dict.items()]
+        return dict(futuro.result() for futuro in futuros)
+
+def avaliar_modelos(df_padronizado, labels_dict, modo_silhueta='auto', max_linhas_exato=silhueta.MAX_LINHAS_EXATO,
+                    n_jobs=1, incluir_ruido=False):
     """
     Calcula métricas de avaliação para diferentes resultados de clusterização.
 
+    As métricas baseadas em centróides (Davies-Bouldin, Calinski-Harabasz, inércia e
+    separação) saem das estatísticas suficientes acumuladas para todos os modelos nas
+    mesmas passagens sobre a matriz (ver calcular_metricas); a silhueta é calculada
+    por modelo, em paralelo com n_jobs > 1.
+
     Args:
         df_padronizado (pd.DataFrame): DataFrame com dados padronizados.
         labels_dict (dict): Dicionário com nomes dos modelos e seus respectivos rótulos.
+        modo_silhueta (str): 'exato', 'amostrado' ou 'auto' (ver silhueta.calcular_silhueta).
+        max_linhas_exato (int): Orçamento de linhas para a silhueta exata no modo 'auto'.
+        n_jobs (int): Processos para as silhuetas (1 = serial; -1 = todos os núcleos).
+        incluir_ruido (bool): Trata o ruído (-1) como um cluster. Por padrão ele é
+            descartado de todas as métricas (como em perfilar_clusters) e reportado
+            na coluna 'Fração de Ruído'.
 
     Returns:
         pd.DataFrame: DataFrame com as métricas de avaliação para cada modelo.
     """
-    # Correção: Inicializando a lista para armazenar os resultados.
-    resultados = []
-    
-    for nome_modelo, labels in labels_dict.items():
+    metricas = calcular_metricas(df_padronizado, labels_dict, incluir_ruido)
+    for nome_modelo in labels_dict:
         # Ignorar avaliação se houver apenas 1 cluster ou todos os pontos forem ruído.
         # Isso é comum em resultados do DBSCAN com parâmetros mal ajustados.
-        if len(set(labels)) < 2:
+        if nome_modelo not in metricas:
             print(f"Avaliação pulada para o modelo '{nome_modelo}' pois encontrou menos de 2 clusters.")
-            continue
-            
-        sil_score = silhouette_score(df_padronizado, labels)
-        db_score = davies_bouldin_score(df_padronizado, labels)
-        
+    if not metricas:
+        print("Nenhum modelo pôde ser avaliado.")
+        return pd.DataFrame()
+
+    silhuetas = silhuetas_modelos(df_padronizado, {nome: labels_dict[nome] for nome in metricas},
+                           incluir_ruido, modo_silhueta, max_linhas_exato, n_jobs)
+    resultados = []
+    for nome_modelo, metrica in metricas.items():
+        sil = silhuetas[nome_modelo]
         resultados.append({
             'Modelo': nome_modelo,
-            'Coeficiente de Silhueta': sil_score,
-            'Índice de Davies-Bouldin': db_score
+            'Coeficiente de Silhueta': sil['silhueta'],
+            'Silhueta IC Inferior': sil['ic_inferior'],
+            'Silhueta IC Superior': sil['ic_superior'],
+            'Modo da Silhueta': sil['modo'],
+            'Índice de Davies-Bouldin': metrica['davies_bouldin'],
+            'Índice de Calinski-Harabasz': metrica['calinski_harabasz'],
+            'Inércia': metrica['inercia'],
+            'Separação Mínima entre Centróides': metrica['separacao_minima'],
+            'Separação Média entre Centróides': metrica['separacao_media'],
+            'Número de Clusters': metrica['n_clusters'],
+            'Fração de Ruído': metrica['fracao_ruido']
         })
-        
-    if not resultados:
-        print("Nenhum modelo pôde ser avaliado.")
-        return pd.DataFrame()
 
     df_resultados = pd.DataFrame(resultados)
     print("Avaliação dos modelos concluída.")
     return df_resultados
 
+def avaliar_por_modelo(df_padronizado, labels_dict, **kwargs):
+    """
+    avaliar_modelos para todos os modelos de uma vez, com a tabela separada por modelo
+    (um DataFrame de uma linha, ou vazio se o modelo foi pulado), para cache por modelo.
+    """
+    tabela = avaliar_modelos(df_padronizado, labels_dict, **kwargs)
+    if tabela.empty:
+        return {nome: pd.DataFrame() for nome in labels_dict}
+    return {nome: tabela[tabela['Modelo'] == nome].reset_index(drop=True) for nome in labels_dict}
+
+def _codificar_categorias(serie):
+    """
+    Códigos inteiros 0..m-1 de uma coluna categórica e a lista de categorias.
+    Colunas 'category' reaproveitam os próprios códigos; valores ausentes recebem -1.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), list(serie.cat.categories)
+    codigos, categorias = pd.factorize(serie, sort=True)
+    return codigos, list(categorias)
+
+def perfilar_clusters(df_original, labels, colunas_numericas=None, colunas_categoricas=None,
+                      incluir_ruido=False):
+    """
+    Calcula o perfil numérico e categórico de todos os clusters em uma única passagem
+    vetorizada: os rótulos são codificados uma vez e cada coluna vira um np.bincount
+    (somas por cluster nas numéricas; tabela de contingência cluster x categoria nas
+    categóricas), sem groupby nem funções Python por grupo.
+
+    Args:
+        df_original (pd.DataFrame): DataFrame original (não padronizado).
+        labels (array-like): Rótulos dos clusters (-1 = ruído do DBSCAN).
+        colunas_numericas (list, opcional): Colunas numéricas; por padrão todas, exceto os identificadores.
+        colunas_categoricas (list, opcional): Colunas categóricas; por padrão as de texto/category.
+        incluir_ruido (bool): Mantém o ruído (-1) como um grupo próprio em vez de descartá-lo.
+
+    Returns:
+        dict: {
+            'n_clientes': pd.Series com o tamanho de cada cluster,
+            'numerico': pd.DataFrame com a média de cada variável numérica por cluster,
+            'modas': pd.DataFrame com a categoria mais frequente por cluster,
+            'categorico': {coluna: {'contagens', 'participacoes', 'lift', 'residuos',
+                                    'qui_quadrado', 'p_valor'}}
+        }
+        Em 'categorico', 'participacoes' é a fração de cada categoria dentro do cluster,
+        'lift' é essa fração dividida pela fração na base, 'residuos' são os resíduos de
+        Pearson (obs - esp) / sqrt(esp), 'qui_quadrado' é a contribuição de cada cluster
+        para a estatística qui-quadrado e 'p_valor' é o do teste de independência da coluna.
+    """
+    labels = np.asarray(labels)
+    if colunas_numericas is None:
+        colunas_numericas = [c for c in df_original.select_dtypes(include='number').columns if c not in COLUNAS_IDENTIFICADORAS]
+    if colunas_categoricas is None:
+        colunas_categoricas = list(df_original.select_dtypes(include=['object', 'category', 'string']).columns)
+
+    selecionados = np.ones(len(labels), dtype=bool) if incluir_ruido else labels != -1
+    clusters, codigos_cluster = np.unique(labels[selecionados], return_inverse=True)
+    codigos_cluster = codigos_cluster.ravel()
+    n_clusters = len(clusters)
+    indice = pd.Index(clusters, name='cluster')
+
+    n_clientes = pd.Series(np.bincount(codigos_cluster, minlength=n_clusters), index=indice, name='n_clientes')
+    tamanhos = n_clientes.to_numpy().astype(np.float64)
+
+    # Perfil numérico: médias por cluster a partir das somas do bincount
+    medias = {}
+    for coluna in colunas_numericas:
+        valores = df_original[coluna].to_numpy(dtype=np.float64)[selecionados]
+        presentes = ~np.isnan(valores)
+        somas = np.bincount(codigos_cluster[presentes], weights=valores[presentes], minlength=n_clusters)
+        contagens = np.bincount(codigos_cluster[presentes], minlength=n_clusters)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            medias[coluna] = somas / contagens
+    numerico = pd.DataFrame(medias, index=indice)
+
+    # Perfil categórico: tabela de contingência de cada coluna com um único bincount
+    categorico = {}
+    modas = {}
+    for coluna in colunas_categoricas:
+        codigos, categorias = _codificar_categorias(df_original[coluna])
+        codigos = codigos[selecionados]
+        validos = codigos >= 0
+        m = len(categorias)
+        tabela = np.bincount(codigos_cluster[validos] * m + codigos[validos],
+                             minlength=n_clusters * m).reshape(n_clusters, m)
+        categorico[coluna], modas[coluna] = resumir_contingencia(tabela, indice, categorias, coluna)
+    modas = pd.DataFrame(modas, index=indice)
+
+    return {'n_clientes': n_clientes, 'numerico': numerico, 'modas': modas, 'categorico': categorico}
+
+def resumir_contingencia(tabela, indice, categorias, coluna):
+    """
+    Participações, lift, resíduos de Pearson, qui-quadrado e moda de uma tabela de
+    contingência cluster x categoria (ver perfilar_clusters).
+
+    Args:
+        tabela (np.ndarray): Contagens (n_clusters x n_categorias).
+        indice (pd.Index): Rótulos dos clusters (linhas).
+        categorias (list): Nomes das categorias (colunas).
+        coluna (str): Nome da variável categórica.
+
+    Returns:
+        tuple: (dicionário {'contagens', 'participacoes', 'lift', 'residuos', 'qui_quadrado',
+                'p_valor'}, array com a moda de cada cluster ou None sem categorias)
+    """
+    tabela = np.asarray(tabela, dtype=np.float64)
+    total_cluster = tabela.sum(axis=1, keepdims=True)
+    total_categoria = tabela.sum(axis=0, keepdims=True)
+    esperado = total_cluster * total_categoria / max(tabela.sum(), 1.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        participacoes = tabela / total_cluster
+        lift = participacoes / (total_categoria / max(tabela.sum(), 1.0))
+        residuos = (tabela - esperado) / np.sqrt(esperado)
+    contribuicoes = np.nansum(residuos ** 2, axis=1)
+    graus_liberdade = (np.count_nonzero(total_cluster) - 1) * (np.count_nonzero(total_categoria) - 1)
+    p_valor = float(stats.chi2.sf(contribuicoes.sum(), graus_liberdade)) if graus_liberdade > 0 else np.nan
+
+    colunas_tabela = pd.Index(categorias, name=coluna)
+    resumo = {
+        'contagens': pd.DataFrame(tabela.astype(np.int64), index=indice, columns=colunas_tabela),
+        'participacoes': pd.DataFrame(participacoes, index=indice, columns=colunas_tabela),
+        'lift': pd.DataFrame(lift, index=indice, columns=colunas_tabela),
+        'residuos': pd.DataFrame(residuos, index=indice, columns=colunas_tabela),
+        'qui_quadrado': pd.Series(contribuicoes, index=indice, name=coluna),
+        'p_valor': p_valor
+    }
+    # Moda: primeira categoria de maior contagem (mesmo desempate do Series.mode)
+    moda = np.asarray(categorias, dtype=object)[tabela.argmax(axis=1)] if len(categorias) else None
+    return resumo, moda
+
 def analisar_perfis_clusters(df_original, labels, nome_modelo):
     """
     Calcula as médias das variáveis para cada cluster e cria um perfil.
@@ -52,29 +395,15 @@ def analisar_perfis_clusters(df_original, labels, nome_modelo):
     Returns:
         pd.DataFrame: DataFrame com o perfil médio de cada cluster.
     """
-    df_analise = df_original.copy()
-    coluna_cluster = f'cluster_{nome_modelo}'
-    df_analise[coluna_cluster] = labels
-    
     # Excluir ruído (pontos com label -1) da análise de perfil para DBSCAN
-    if -1 in df_analise[coluna_cluster].unique():
-        df_analise = df_analise[df_analise[coluna_cluster] != -1]
-
-    if df_analise.empty:
+    if not np.any(np.asarray(labels) != -1):
         print(f"Análise de perfil para '{nome_modelo}' não pôde ser gerada (sem clusters válidos).")
         return pd.DataFrame()
 
-    perfil_clusters = df_analise.groupby(coluna_cluster).mean()
-    perfil_clusters['n_clientes'] = df_analise[coluna_cluster].value_counts()
-    
-    # Correção: Verificar se a coluna 'id_cliente' existe antes de tentar removê-la.
-    if 'id_cliente' in perfil_clusters.columns:
-        perfil_clusters = perfil_clusters.drop(columns=['id_cliente'])
-    
-    print(f"Análise de perfil para o modelo '{nome_modelo}' concluída.")
-    return perfil_clusters
+    perfil = perfilar_clusters(df_original, labels, colunas_categoricas=[])
+    return _formatar_perfil_numerico(perfil, nome_modelo)
 
-def analisar_perfis_categoricos(df_original, labels, nome_modelo):
+def analisar_perfis_categoricos(df_original, labels, nome_modelo, incluir_ruido=True):
     """
     Analisa o perfil dos clusters com base nas variáveis categóricas,
     encontrando o valor mais comum (moda) para cada uma.
@@ -83,23 +412,62 @@ def analisar_perfis_categoricos(df_original, labels, nome_modelo):
         df_original (pd.DataFrame): O DataFrame original, antes do pré-processamento.
         labels (array-like): O array com os labels dos clusters.
         nome_modelo (str): O nome do modelo para usar no índice do resultado.
+        incluir_ruido (bool): Mantém o ruído do DBSCAN (-1) como um grupo próprio
+            (padrão, como sempre foi este perfil); False o descarta.
         
     Returns:
         pd.DataFrame: Um DataFrame com o perfil categórico de cada cluster.
+        Para participações, lift e qui-quadrado por categoria, use perfilar_clusters.
     """
-    df_temp = df_original.copy()
-    df_temp['cluster'] = labels
-    
-    # Seleciona apenas colunas de texto (categóricas)
-    colunas_categoricas = df_temp.select_dtypes(include=['object', 'category']).columns
-    
-    # Calcula a moda para cada cluster e cada coluna categórica
-    perfil_categorico = df_temp.groupby('cluster')[colunas_categoricas].agg(lambda x: x.mode()[0])
-    
-    # Adiciona a contagem de clientes por cluster
-    perfil_categorico['n_clientes'] = df_temp['cluster'].value_counts()
-    
+    perfil = perfilar_clusters(df_original, labels, colunas_numericas=[], incluir_ruido=incluir_ruido)
+    return _formatar_perfil_categorico(perfil, nome_modelo)
+
+def analisar_perfis(df_original, labels, nome_modelo, colunas_numericas=None, colunas_categoricas=None):
+    """
+    Perfis numérico e categórico de um modelo a partir de uma única chamada a
+    perfilar_clusters (os rótulos são codificados uma só vez para as duas tabelas).
+    Equivale a analisar_perfis_clusters e analisar_perfis_categoricos: o perfil
+    numérico descarta o ruído (-1) e o categórico o mantém como um grupo próprio.
+
+    Args:
+        df_original (pd.DataFrame): DataFrame original (não padronizado).
+        labels (array-like): Rótulos dos clusters (-1 = ruído do DBSCAN).
+        nome_modelo (str): Nome do modelo para os índices dos resultados.
+        colunas_numericas (list, opcional): Colunas do perfil numérico (ver perfilar_clusters).
+        colunas_categoricas (list, opcional): Colunas do perfil categórico (ver perfilar_clusters).
+
+    Returns:
+        tuple: (perfil numérico, perfil categórico), ambos pd.DataFrame.
+    """
+    labels = np.asarray(labels)
+    perfil = perfilar_clusters(df_original, labels, colunas_numericas, colunas_categoricas, incluir_ruido=True)
+    perfil_categorico = _formatar_perfil_categorico(perfil, nome_modelo)
+
+    if not np.any(labels != -1):
+        print(f"Análise de perfil para '{nome_modelo}' não pôde ser gerada (sem clusters válidos).")
+        return pd.DataFrame(), perfil_categorico
+    # O perfil numérico não inclui o ruído: basta descartar a linha -1 da mesma passagem
+    validos = perfil['n_clientes'].index != -1
+    perfil_numerico = {'numerico': perfil['numerico'][validos], 'n_clientes': perfil['n_clientes'][validos]}
+    return _formatar_perfil_numerico(perfil_numerico, nome_modelo), perfil_categorico
+
+def _formatar_perfil_numerico(perfil, nome_modelo):
+    """
+    Médias por cluster com o tamanho de cada um, indexadas por 'cluster_<modelo>'.
+    """
+    perfil_clusters = perfil['numerico'].assign(n_clientes=perfil['n_clientes'])
+    perfil_clusters.index.name = f'cluster_{nome_modelo}'
+
+    print(f"Análise de perfil para o modelo '{nome_modelo}' concluída.")
+    return perfil_clusters
+
+def _formatar_perfil_categorico(perfil, nome_modelo):
+    """
+    Modas por cluster com o tamanho de cada um, indexadas por 'cluster_<modelo>_<id>'.
+    """
+    perfil_categorico = perfil['modas'].assign(n_clientes=perfil['n_clientes'])
+
     # Renomeia o índice para incluir o nome do modelo
     perfil_categorico.index = [f"cluster_{nome_modelo}_{i}" for i in perfil_categorico.index]
-    
-    return perfil_categorico
\ No newline at end of file
+
+    return perfil_categorico
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from scipy.cluster.hierarchy import cut_tree, ward
+from sklearn.cluster import Birch
+
+import clustering_models
+import evaluation
+
+# Número padrão de micro-clusters do resumo. O Ward ponderado sobre m micro-clusters
+# custa O(m^2) de memória e O(m^3) de tempo, independente do número de clientes.
+N_MICROCLUSTERS_PADRAO = 500
+MAX_MICROCLUSTERS = 5000
+
+
+def resumir_em_microclusters(dados, n_microclusters=N_MICROCLUSTERS_PADRAO, metodo='minibatch',
+                             limiar_birch=1.5, tamanho_lote=clustering_models.TAMANHO_LOTE_PADRAO):
+    """
+    Resume a base em micro-clusters com uma passagem em fluxo sobre os dados e
+    atribui cada linha ao micro-cluster mais próximo.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        n_microclusters (int): Número de micro-clusters no método 'minibatch'.
+        metodo (str): 'minibatch' (MiniBatchKMeans com partial_fit) ou 'birch' (árvore CF).
+        limiar_birch (float): Raio máximo dos subclusters no método 'birch'.
+        tamanho_lote (int): Linhas por bloco da passagem em fluxo.
+
+    Returns:
+        dict: {'labels': micro-cluster de cada linha, 'centros', 'pesos': clientes por micro-cluster}
+    """
+    X = np.asarray(dados)
+
+    if metodo == 'minibatch':
+        n_microclusters = min(n_microclusters, X.shape[0])
+        # Cada lote precisa de pelo menos n_microclusters linhas (o primeiro inicializa
+        # os centróides); sem dois lotes assim, ajustar_kmeans faz um único fit
+        ajuste = clustering_models.ajustar_kmeans(
+            X, n_microclusters, modo='minibatch', n_init=1, n_epocas=1,
+            tamanho_lote=max(tamanho_lote, n_microclusters)
+        )
+        labels, centros = ajuste['labels'], ajuste['centros']
+    elif metodo == 'birch':
+        birch = Birch(threshold=limiar_birch, n_clusters=None)
+        for inicio in range(0, X.shape[0], tamanho_lote):
+            birch.partial_fit(X[inicio:inicio + tamanho_lote])
+        centros = birch.subcluster_centers_
+        if len(centros) > MAX_MICROCLUSTERS:
+            raise ValueError(
+                f"A árvore CF gerou {len(centros)} subclusters (máximo {MAX_MICROCLUSTERS}). "
+                "Aumente limiar_birch ou use metodo='minibatch'."
+            )
+        labels, _ = clustering_models.atribuir_e_inercia(X, centros)
+    else:
+        raise ValueError(f"Método de micro-clusters '{metodo}' inválido. Use 'minibatch' ou 'birch'.")
+
+    # Descarta micro-clusters vazios e renumera os rótulos
+    pesos = np.bincount(labels, minlength=len(centros))
+    usados = np.flatnonzero(pesos)
+    renumeracao = np.full(len(centros), -1, dtype=np.int32)
+    renumeracao[usados] = np.arange(len(usados))
+    return {'labels': renumeracao[labels], 'centros': centros[usados], 'pesos': pesos[usados]}
+
+
+def linkage_ward_ponderado(centros, pesos):
+    """
+    Constrói a árvore de Ward sobre pontos ponderados (micro-clusters).
+
+    O custo de unir dois grupos A e B é n_A*n_B/(n_A+n_B) * ||c_A - c_B||^2, em que
+    n é o número de clientes de cada grupo, o que reproduz o Ward sobre os clientes
+    originais com cada micro-cluster colapsado no seu centro.
+
+    Args:
+        centros (np.ndarray): Centros dos micro-clusters (m x d).
+        pesos (np.ndarray): Número de clientes em cada micro-cluster.
+
+    Returns:
+        np.ndarray: Matriz de ligação (m-1 x 4) no formato do scipy.cluster.hierarchy,
+                    com as alturas na mesma escala do Ward do scipy (a quarta
+                    coluna conta micro-clusters, como exige o scipy).
+    """
+    centros = np.array(centros, dtype=np.float64)
+    tamanhos = np.asarray(pesos, dtype=np.float64).copy()
+    m = len(centros)
+    ids = np.arange(m)
+    folhas = np.ones(m)
+    linkage = np.zeros((max(m - 1, 0), 4))
+
+    def _custos(i):
+        diferenca = centros - centros[i]
+        return tamanhos * tamanhos[i] / (tamanhos + tamanhos[i]) * np.einsum('ij,ij->i', diferenca, diferenca)
+
+    custos = np.empty((m, m))
+    for i in range(m):
+        custos[i] = _custos(i)
+    np.fill_diagonal(custos, np.inf)
+    ativo = np.ones(m, dtype=bool)
+
+    for passo in range(m - 1):
+        i, j = np.unravel_index(np.argmin(custos), custos.shape)
+        if ids[i] > ids[j]:
+            i, j = j, i
+        linkage[passo] = [ids[i], ids[j], np.sqrt(2 * custos[i, j]), folhas[i] + folhas[j]]
+
+        # O grupo j é absorvido pelo grupo i
+        total = tamanhos[i] + tamanhos[j]
+        centros[i] = (tamanhos[i] * centros[i] + tamanhos[j] * centros[j]) / total
+        tamanhos[i] = total
+        folhas[i] += folhas[j]
+        ids[i] = m + passo
+        ativo[j] = False
+        custos[j, :] = np.inf
+        custos[:, j] = np.inf
+
+        novos = np.where(ativo, _custos(i), np.inf)
+        novos[i] = np.inf
+        custos[i, :] = novos
+        custos[:, i] = novos
+    return linkage
+
+
+def cortar_arvore(linkage, n_clusters):
+    """
+    Retorna o cluster final de cada folha (micro-cluster) para um corte em n_clusters.
+    """
+    return cut_tree(linkage, n_clusters=n_clusters).ravel().astype(np.int32)
+
+
+def construir_arvore(dados, modo='microclusters', n_microclusters=N_MICROCLUSTERS_PADRAO, metodo='minibatch',
+                     **kwargs):
+    """
+    Constrói uma única vez a árvore de Ward, da qual qualquer K sai por um corte barato.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        modo (str): 'microclusters' (Ward ponderado sobre o resumo da base, quase linear) ou
+            'exato' (Ward do scipy sobre todos os clientes; O(n²) de memória, só para amostras).
+        n_microclusters (int), metodo (str): Ver resumir_em_microclusters.
+
+    Returns:
+        dict: {'labels_micro': folha de cada cliente, 'centros_micro', 'pesos_micro', 'linkage'}.
+              No modo 'exato' cada cliente é uma folha.
+    """
+    if modo == 'microclusters':
+        resumo = resumir_em_microclusters(dados, n_microclusters, metodo, **kwargs)
+        return {
+            'labels_micro': resumo['labels'],
+            'centros_micro': resumo['centros'],
+            'pesos_micro': resumo['pesos'],
+            'linkage': linkage_ward_ponderado(resumo['centros'], resumo['pesos'])
+        }
+    if modo != 'exato':
+        raise ValueError(f"Modo '{modo}' inválido. Use 'exato' ou 'microclusters'.")
+    X = np.asarray(dados)
+    return {
+        'labels_micro': np.arange(X.shape[0], dtype=np.int32),
+        'centros_micro': X,
+        'pesos_micro': np.ones(X.shape[0], dtype=np.int64),
+        'linkage': ward(X)
+    }
+
+
+def _mapas_por_k(arvore, range_k):
+    """
+    Cluster de cada folha para cada K, com um único percurso da árvore (cut_tree com vários K).
+    """
+    range_k = [k for k in range_k if k <= len(arvore['pesos_micro'])]
+    mapas = cut_tree(arvore['linkage'], n_clusters=range_k).astype(np.int32)
+    return {k: mapas[:, i] for i, k in enumerate(range_k)}
+
+
+def cortar_em_varios_k(arvore, range_k):
+    """
+    Rótulos de todos os clientes para cada K: a árvore é cortada uma vez para todos os K
+    e o corte das folhas é propagado aos clientes de forma vetorizada.
+
+    Returns:
+        dict: {k: labels}
+    """
+    return {k: mapa[arvore['labels_micro']] for k, mapa in _mapas_por_k(arvore, range_k).items()}
+
+
+def encontrar_k_hierarquico(dados, max_k=10, arvore=None, n_jobs=1, modo_silhueta='auto', **kwargs_arvore):
+    """
+    Inércia (WCSS) e silhueta do Hierárquico para K em 2..max_k, com a árvore
+    construída uma vez (ou reaproveitada) e cortada para todos os K.
+
+    A inércia de cada corte sai das estatísticas suficientes das folhas (contagens,
+    somas e somas de quadrados, acumuladas em uma passagem sobre a matriz) somadas
+    por cluster, sem voltar aos dados. As silhuetas dos K são calculadas em paralelo
+    com n_jobs > 1.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        max_k (int): Maior K avaliado (o range começa em 2).
+        arvore (dict, opcional): Saída de construir_arvore; se None, é construída aqui.
+        n_jobs (int): Processos para as silhuetas (1 = serial; -1 = todos os núcleos).
+        modo_silhueta (str): 'exato', 'amostrado' ou 'auto' (ver silhueta.calcular_silhueta).
+        **kwargs_arvore: Parâmetros de construir_arvore (modo, n_microclusters, metodo).
+
+    Returns:
+        dict: {'range_k', 'inercias', 'scores_silhueta', 'silhueta_ic'}, ordenados por K
+              (mesmo formato de clustering_models.encontrar_k_otimo).
+    """
+    if arvore is None:
+        arvore = construir_arvore(dados, **kwargs_arvore)
+    mapas = _mapas_por_k(arvore, range(2, max_k + 1))
+    range_k = sorted(mapas)
+    labels_por_k = {k: mapas[k][arvore['labels_micro']] for k in range_k}
+
+    folhas = evaluation.estatisticas_suficientes(dados, {'folhas': arvore['labels_micro']}, incluir_ruido=True)['folhas']
+    inercias = []
+    for k in range_k:
+        mapa = mapas[k][folhas['clusters']]
+        contagens = np.bincount(mapa, weights=folhas['contagens'], minlength=k)
+        somas = np.vstack([np.bincount(mapa, weights=folhas['somas'][:, j], minlength=k)
+                           for j in range(folhas['somas'].shape[1])]).T
+        somas_quadrados = np.bincount(mapa, weights=folhas['somas_quadrados'], minlength=k)
+        estatisticas = {'contagens': contagens, 'somas': somas, 'somas_quadrados': somas_quadrados}
+        inercias.append(evaluation.metricas_de_estatisticas(estatisticas)['inercia'])
+
+    silhuetas = evaluation.silhuetas_modelos(dados, labels_por_k, incluir_ruido=True, modo_silhueta=modo_silhueta,
+                                             n_jobs=n_jobs)
+    print("Cálculo de inércia e scores de silhueta do Hierárquico concluído.")
+    return {
+        'range_k': range_k,
+        'inercias': inercias,
+        'scores_silhueta': [silhuetas[k]['silhueta'] for k in range_k],
+        'silhueta_ic': [(silhuetas[k]['ic_inferior'], silhuetas[k]['ic_superior']) for k in range_k]
+    }
+
+
+def cluster_hierarquico_microclusters(dados, n_clusters=4, n_microclusters=N_MICROCLUSTERS_PADRAO,
+                                      metodo='minibatch', arvore=None, **kwargs):
+    """
+    Clusterização hierárquica em duas etapas, em tempo quase linear:
+    1. resumo da base em micro-clusters (uma passagem em fluxo);
+    2. ligação de Ward ponderada sobre os micro-clusters;
+    3. atribuição vetorizada de cada cliente ao cluster final do seu micro-cluster.
+
+    Com uma árvore já construída (construir_arvore), as etapas 1 e 2 são puladas.
+
+    Returns:
+        tuple: (labels de todos os clientes, dicionário com o resumo, a árvore e o mapa)
+    """
+    if arvore is None:
+        arvore = construir_arvore(dados, 'microclusters', n_microclusters, metodo, **kwargs)
+    mapa = cortar_arvore(arvore['linkage'], n_clusters)
+    labels = mapa[arvore['labels_micro']]
+    return labels, {**arvore, 'mapa': mapa}
@@ -1,128 +1,311 @@
 # -*- coding: utf-8 -*-
+import argparse
+
 import pandas as pd
-import os
-import matplotlib.pyplot as plt
 
 # Importando os módulos do projeto
-import data_generator
+import armazenamento
+import artefato
+import cache_etapas
+import densidade
+import estabilidade
+import hierarquico
+import silhueta
 import preprocessing
 import clustering_models
 import evaluation
+import monitoramento
+import projecao
+import relatorio
 import visualization
 
-def main():
+# Módulos cujas funções públicas entram no perfil de execução
+MODULOS_PERFILADOS = (armazenamento, preprocessing, clustering_models, silhueta, evaluation, visualization)
+
+# Curva de estabilidade por reamostragem calculada junto com a varredura de K
+N_REPLICAS_ESTABILIDADE = 20
+ORCAMENTO_ESTABILIDADE_S = 120
+# K usado quando não for escolhido pela estabilidade (--k auto)
+K_PADRAO = 4
+DBSCAN_EPS = 2.5
+DBSCAN_MIN_SAMPLES = 20
+# Combinações avaliadas pela grade do DBSCAN (--grade-dbscan), com uma única busca de vizinhos
+GRADE_DBSCAN_EPS = (1.5, 2.0, 2.5, 3.0)
+GRADE_DBSCAN_MIN_SAMPLES = (10, 20, 40)
+
+def main(baixa_memoria=False, medir_memoria=False, usar_cache=True, n_jobs_relatorio=-1, arquivo_perfil=None,
+         n_clusters=K_PADRAO, grade_dbscan=False):
     """
     Função principal para executar o pipeline completo de clusterização
     com a base de dados de 20.000 registros.
+
+    Args:
+        baixa_memoria (bool): Categóricas como 'category', matrizes em float32
+            padronizadas no próprio buffer e rótulos em inteiros pequenos.
+        medir_memoria (bool): Mede e imprime o pico de memória de cada etapa.
+        usar_cache (bool): Reaproveita do cache em disco (cache_etapas.py) as etapas
+            cujos dados, parâmetros e código não mudaram.
+        n_jobs_relatorio (int): Processos que desenham as figuras do relatório (-1 = todos os núcleos).
+        arquivo_perfil (str, opcional): Liga o perfilador (monitoramento.perfilar) e grava o
+            trace neste arquivo. Se None, vale a variável de ambiente SEGMENTACAO_PERFIL.
+        n_clusters (int ou str): K dos modelos; 'auto' usa o K recomendado pela curva de estabilidade
+            (ou K_PADRAO, com aviso, se o orçamento acabar antes de haver recomendação).
+        grade_dbscan (bool): Avalia também a grade GRADE_DBSCAN_EPS x GRADE_DBSCAN_MIN_SAMPLES
+            (ver densidade.grade_dbscan) e imprime a tabela.
     """
-    nome_arquivo = 'base_sintetica_dividas.xlsx'
+    if arquivo_perfil is None:
+        arquivo_perfil = monitoramento.caminho_perfil_do_ambiente()
+    with monitoramento.perfilar(arquivo_perfil, MODULOS_PERFILADOS):
+        _executar_pipeline(baixa_memoria, medir_memoria, usar_cache, n_jobs_relatorio, n_clusters, grade_dbscan)
+
+def _executar_pipeline(baixa_memoria, medir_memoria, usar_cache, n_jobs_relatorio, n_clusters, grade_dbscan):
+    """
+    Etapas do pipeline (ver main).
+    """
+    registro = [] if medir_memoria else None
+    cache = cache_etapas.CacheEtapas(ativo=usar_cache)
+    nome_arquivo = 'base_sintetica_dividas.parquet'
+    nome_arquivo_excel = 'base_sintetica_dividas.xlsx'
 
     # Etapa 1: Geração ou Carregamento dos Dados
-    if os.path.exists(nome_arquivo):
-        print("Arquivo '{}' encontrado. Carregando dados existentes...".format(nome_arquivo))
-        df_clientes = pd.read_excel(nome_arquivo)
-    else:
-        print("Arquivo '{}' não encontrado. Gerando e salvando nova base de dados...".format(nome_arquivo))
-        df_clientes = data_generator.gerar_dados_sinteticos(n_clientes=30000, seed=42)
-        df_clientes.to_excel(nome_arquivo, index=False)
-        print("Base de dados sintética salva com sucesso.")
+    # A base de trabalho fica em Parquet; o Excel legado é importado apenas uma vez.
+    with monitoramento.medir_etapa('carregamento', registro):
+        df_clientes = armazenamento.carregar_ou_gerar_base(
+            nome_arquivo, n_clientes=30000, seed=42, caminho_excel=nome_arquivo_excel
+        )
+        if baixa_memoria:
+            df_clientes = armazenamento.otimizar_categoricas(df_clientes)
+        hash_base = cache_etapas.hash_conteudo(df_clientes)
     
     # Etapa 2: Pré-processamento
     print("\n--- Iniciando o pré-processamento dos dados ---")
-    df_numerico_original, df_para_modelagem = preprocessing.selecionar_e_transformar_features(df_clientes)
-    df_padronizado = preprocessing.padronizar_dados(df_para_modelagem)
-    
-    # --- NOVO: Visualizações de dados brutos ---
-    print("\n--- Gerando matriz de correlação ---")
-    visualization.plotar_matriz_correlacao(df_numerico_original)
-    plt.show()
+    with monitoramento.medir_etapa('pre_processamento', registro):
+        def _features():
+            esquema = preprocessing.extrair_esquema(df_clientes)
+            # Matriz gravável: com baixa_memoria, a padronização é feita no próprio buffer
+            return (esquema,) + preprocessing.selecionar_e_transformar_features(
+                df_clientes, esquema=esquema, baixa_memoria=baixa_memoria, retornar_matriz=True
+            )
+        (esquema, df_numerico_original, matriz_modelagem), chave_features = cache.etapa(
+            'features', _features, [hash_base], {'baixa_memoria': baixa_memoria, 'matriz': True}, [preprocessing]
+        )
+        def _padronizacao():
+            df, scaler_ajustado = preprocessing.padronizar_dados(
+                matriz_modelagem, retornar_scaler=True, baixa_memoria=baixa_memoria,
+                colunas=esquema['colunas_modelo']
+            )
+            return df, preprocessing.estatisticas_scaler(scaler_ajustado)
+        # A matriz padronizada fica em disco (.npy) e é mapeada em memória: os processos
+        # de ajuste e as próximas execuções a leem sem cópia.
+        (df_padronizado, estatisticas_padronizacao), chave_padronizado = cache.etapa_matriz(
+            'padronizacao', _padronizacao,
+            [chave_features], {'baixa_memoria': baixa_memoria}, [preprocessing]
+        )
+        scaler = preprocessing.montar_scaler(estatisticas_padronizacao)
+        del matriz_modelagem
     
-    print("\n--- Gerando distribuições das variáveis numéricas ---")
-    colunas_demograficas = ['idade', 'numero_dependentes']
-    colunas_financeiras = ['renda_mensal', 'score_credito', 'historico_pagamento_recente', 
-                       'tempo_de_debito_meses', 'valor_divida']
-
-    visualization.plotar_distribuicoes_separadas(df_numerico_original, colunas_demograficas, colunas_financeiras)
-
-    print("\n--- Gerando distribuições das variáveis categóricas ---")
-
-    colunas_categoricas = ['sexo', 'estado_civil', 'nivel_educacional', 'tipo_emprego']
-    visualization.plotar_categoricas(df_clientes, colunas_categoricas, filename_prefix="distribuicoes_categoricas")
-
     # Etapa 3: Determinação do K ótimo para K-Means
     print("\n--- Iniciando a determinação do K ótimo para K-Means ---")
-    resultados_k = clustering_models.encontrar_k_otimo(df_padronizado, max_k=10)
-    
-    print("Exibindo gráfico do Método do Cotovelo e de Silhueta...")
-    visualization.plotar_cotovelo_e_silhueta_juntos(resultados_k, filename="cotovelo_silhueta.png")
-    
-    K_OTIMO = 4
+    with monitoramento.medir_etapa('k_otimo', registro):
+        resultados_k, _ = cache.etapa(
+            'k_otimo',
+            lambda: clustering_models.encontrar_k_otimo(
+                df_padronizado, max_k=10, n_jobs=-1,
+                callback=lambda r: print(f"  K={r['k']}: inércia={r['inercia']:.1f}, silhueta={r['score_silhueta']:.4f}"),
+                n_replicas_estabilidade=N_REPLICAS_ESTABILIDADE, orcamento_estabilidade_s=ORCAMENTO_ESTABILIDADE_S
+            ),
+            [chave_padronizado],
+            {'max_k': 10, 'n_replicas_estabilidade': N_REPLICAS_ESTABILIDADE,
+             'orcamento_estabilidade_s': ORCAMENTO_ESTABILIDADE_S},
+            [clustering_models, silhueta, estabilidade]
+        )
+    print("\nEstabilidade por K (ARI médio entre réplicas):")
+    for k, ari, n_replicas in zip(resultados_k['range_k'], resultados_k['estabilidade_ari'], resultados_k['n_replicas']):
+        print(f"  K={k}: ARI={ari:.3f} ({n_replicas} réplicas)")
+    print(f"K recomendado pela estabilidade: {resultados_k['k_recomendado']}")
+
+    K_OTIMO = resultados_k['k_recomendado'] if n_clusters == 'auto' else n_clusters
+    if K_OTIMO is None:
+        # O orçamento da estabilidade acabou antes de algum K ter duas réplicas
+        print(f"Aviso: a estabilidade não recomendou nenhum K dentro do orçamento; usando K={K_PADRAO}.")
+        K_OTIMO = K_PADRAO
     print("\nNúmero de clusters escolhido com base na análise: {}".format(K_OTIMO))
     
     # Etapa 4: Aplicação dos Modelos
     print("\n--- Aplicando os modelos de clusterização ---")
-    labels_kmeans = clustering_models.aplicar_kmeans(df_padronizado, n_clusters=K_OTIMO)
+    with monitoramento.medir_etapa('kmeans', registro):
+        (labels_kmeans, centros_kmeans), chave_kmeans = cache.etapa(
+            'kmeans',
+            lambda: _labels_e_centros(clustering_models.aplicar_kmeans(df_padronizado, n_clusters=K_OTIMO, retornar_modelo=True)),
+            [chave_padronizado], {'n_clusters': K_OTIMO}, [clustering_models]
+        )
+
+    # Artefato para segmentar novos clientes sem reajuste (ver pontuar.py)
+    artefato.salvar_artefato(
+        artefato.montar_artefato(esquema, scaler, centros_kmeans), 'modelo_segmentacao.npz'
+    )
 
-    print("Aplicando Clusterização Hierárquica em uma amostra...")
-    if len(df_padronizado) > 10000:
-        df_amostra = df_padronizado.sample(n=10000, random_state=42)
-    else:
-        df_amostra = df_padronizado
+    # Hierárquico em duas etapas (micro-clusters + Ward): todos os clientes recebem rótulo.
+    # A árvore é construída uma vez e cortada para cada K (varredura e modelo final).
+    with monitoramento.medir_etapa('hierarquico', registro):
+        arvore, chave_arvore = cache.etapa(
+            'arvore_hierarquica',
+            lambda: hierarquico.construir_arvore(df_padronizado, modo='microclusters'),
+            [chave_padronizado], {'modo': 'microclusters'}, [clustering_models, hierarquico]
+        )
+        # Silhueta amostrada: a varredura do Hierárquico é só comparativa
+        resultados_k_hierarquico, _ = cache.etapa(
+            'k_hierarquico',
+            lambda: hierarquico.encontrar_k_hierarquico(
+                df_padronizado, max_k=10, arvore=arvore, n_jobs=-1, modo_silhueta='amostrado'
+            ),
+            [chave_arvore], {'max_k': 10, 'modo_silhueta': 'amostrado'}, [hierarquico, evaluation, silhueta]
+        )
+        labels_hierarquico, chave_hierarquico = cache.etapa(
+            'hierarquico',
+            lambda: clustering_models.aplicar_cluster_hierarquico(
+                df_padronizado, n_clusters=K_OTIMO, modo='microclusters', arvore=arvore
+            )[0],
+            [chave_arvore], {'n_clusters': K_OTIMO}, [clustering_models, hierarquico]
+        )
+    with monitoramento.medir_etapa('dbscan', registro):
+        (labels_dbscan, nucleos_dbscan), chave_dbscan = cache.etapa(
+            'dbscan',
+            lambda: _labels_e_nucleos(clustering_models.aplicar_dbscan(
+                df_padronizado, eps=DBSCAN_EPS, min_samples=DBSCAN_MIN_SAMPLES, modo='indexado', retornar_resumo=True
+            )),
+            [chave_padronizado],
+            {'eps': DBSCAN_EPS, 'min_samples': DBSCAN_MIN_SAMPLES, 'modo': 'indexado', 'nucleos': True},
+            [clustering_models, densidade]
+        )
+    # Índice sobre os núcleos do DBSCAN para atribuir novos clientes aos clusters de densidade
+    artefato.salvar_artefato(
+        artefato.montar_artefato_densidade(esquema, scaler, df_padronizado, labels_dbscan, nucleos_dbscan,
+                                           DBSCAN_EPS, DBSCAN_MIN_SAMPLES),
+        'modelo_dbscan.npz'
+    )
+    if grade_dbscan:
+        with monitoramento.medir_etapa('grade_dbscan', registro):
+            tabela_dbscan, _ = cache.etapa(
+                'grade_dbscan',
+                lambda: densidade.grade_dbscan(df_padronizado, GRADE_DBSCAN_EPS, GRADE_DBSCAN_MIN_SAMPLES, n_jobs=-1),
+                [chave_padronizado], {'eps': GRADE_DBSCAN_EPS, 'min_samples': GRADE_DBSCAN_MIN_SAMPLES},
+                [densidade, evaluation, silhueta]
+            )
+        print("\nGrade de parâmetros do DBSCAN:")
+        print(tabela_dbscan.to_string(index=False))
 
-    labels_hierarquico, _ = clustering_models.aplicar_cluster_hierarquico(df_amostra, n_clusters=K_OTIMO)
-    labels_dbscan = clustering_models.aplicar_dbscan(df_padronizado, eps=2.5, min_samples=20)
+    if baixa_memoria:
+        labels_kmeans, labels_hierarquico, labels_dbscan = (
+            clustering_models.compactar_labels(rotulos) for rotulos in (labels_kmeans, labels_hierarquico, labels_dbscan)
+        )
     
     labels_dict = {
         'K-Means': labels_kmeans,
         'Hierárquico': labels_hierarquico,
         'DBSCAN': labels_dbscan
     }
+    chaves_labels = {'K-Means': chave_kmeans, 'Hierárquico': chave_hierarquico, 'DBSCAN': chave_dbscan}
     
     # Etapa 5: Avaliação
     print("\n--- Avaliando os modelos ---")
-    labels_dict_full = {
-        'K-Means': labels_kmeans,
-        'DBSCAN': labels_dbscan
-    }
-    df_avaliacao_full = evaluation.avaliar_modelos(df_padronizado, labels_dict_full)
-    labels_dict_sample = {'Hierárquico': labels_hierarquico}
-    df_avaliacao_sample = evaluation.avaliar_modelos(df_amostra, labels_dict_sample)
-    df_avaliacao_final = pd.concat([df_avaliacao_full, df_avaliacao_sample])
+    with monitoramento.medir_etapa('avaliacao', registro):
+        # Um item de cache por modelo: mudar o DBSCAN não reavalia K-Means e Hierárquico.
+        # Os modelos ausentes do cache são avaliados juntos (mesmas passagens sobre a
+        # matriz, silhuetas em paralelo).
+        avaliacoes = cache.etapas_em_lote(
+            'avaliacao',
+            lambda nomes: evaluation.avaliar_por_modelo(df_padronizado, {nome: labels_dict[nome] for nome in nomes}, n_jobs=-1),
+            {nome: ([chave_padronizado, chaves_labels[nome]], {'modelo': nome}) for nome in labels_dict},
+            [evaluation, silhueta]
+        )
+        df_avaliacao_final = pd.concat([avaliacao for avaliacao, _ in avaliacoes.values()], ignore_index=True)
     print("\nTabela de Avaliação Comparativa dos Modelos:")
     print(df_avaliacao_final.sort_values(by='Coeficiente de Silhueta', ascending=False).to_string())
 
-    # Etapa 6: Visualização e Análise de Perfis
-    print("\n--- Gerando visualizações dos clusters via PCA ---")
-    for nome_modelo, labels in labels_dict_full.items():
-        if len(set(labels)) > 1:
-            visualization.plotar_cluster_pca_individual(df_padronizado, labels, nome_modelo)
-            plt.show()
-
-    if 'Hierárquico' in labels_dict_sample:
-        labels_hierarquico = labels_dict_sample['Hierárquico']
-        if len(set(labels_hierarquico)) > 1:
-            visualization.plotar_cluster_pca_individual(df_amostra, labels_hierarquico, "Hierárquico")
-            plt.show()
-
-    print("\n--- Análise de Perfil dos Clusters (K-Means) ---")
-    perfil_kmeans = evaluation.analisar_perfis_clusters(df_numerico_original, labels_kmeans, 'K-Means')
-    print(perfil_kmeans.to_string())
-    perfil_cat_kmeans = evaluation.analisar_perfis_categoricos(df_clientes, labels_kmeans, 'K-Means')
-    print(perfil_cat_kmeans.to_string())
-
-    print("\n--- Análise de Perfil dos Clusters (Hierárquico na Amostra) ---")
-    df_clientes_amostra = df_clientes.loc[df_amostra.index]
-    df_numerico_original_amostra = df_numerico_original.loc[df_amostra.index]
-    perfil_hierarquico_num = evaluation.analisar_perfis_clusters(df_numerico_original_amostra, labels_hierarquico, 'Hierárquico')
-    print(perfil_hierarquico_num.to_string())
-    perfil_hierarquico_cat = evaluation.analisar_perfis_categoricos(df_clientes_amostra, labels_hierarquico, 'Hierárquico')
-    print(perfil_hierarquico_cat.to_string())
-
-    print("\n--- Gerando visualizações de Perfil dos Clusters ---")
-    df_clusters = df_numerico_original.copy()
-    df_clusters["cluster"] = labels_kmeans
-    features = ['idade', 'renda_mensal', 'score_credito', 'tempo_de_debito_meses', 'valor_divida']
-    visualization.plotar_radar_clusters(df_clusters, features, n_clusters=K_OTIMO, output_dir="images")
+    # Etapa 6: Análise de Perfis
+    with monitoramento.medir_etapa('perfis', registro):
+        print("\n--- Análise de Perfil dos Clusters (K-Means) ---")
+        (perfil_kmeans, perfil_cat_kmeans), _ = cache.etapa(
+            'perfis', lambda: _perfis(df_numerico_original, df_clientes, labels_kmeans, 'K-Means'),
+            [hash_base, chave_kmeans], {'modelo': 'K-Means'}, [evaluation]
+        )
+        print(perfil_kmeans.to_string())
+        print(perfil_cat_kmeans.to_string())
+
+        print("\n--- Análise de Perfil dos Clusters (Hierárquico) ---")
+        (perfil_hierarquico_num, perfil_hierarquico_cat), _ = cache.etapa(
+            'perfis', lambda: _perfis(df_numerico_original, df_clientes, labels_hierarquico, 'Hierárquico'),
+            [hash_base, chave_hierarquico], {'modelo': 'Hierárquico'}, [evaluation]
+        )
+        print(perfil_hierarquico_num.to_string())
+        print(perfil_hierarquico_cat.to_string())
+
+    # Etapa 7: Relatório de figuras
+    # Os dados de cada figura são resumidos aqui (histogramas, contagens, médias, grades
+    # de densidade) e as figuras são desenhadas em paralelo, sem janela (backend Agg).
+    print("\n--- Gerando o relatório de figuras ---")
+    with monitoramento.medir_etapa('relatorio', registro):
+        # Uma única projeção da base, compartilhada pelos gráficos de todos os modelos
+        projecao_pca = projecao.projetar_pca(df_padronizado)
+        tarefas = relatorio.tarefas_do_pipeline(
+            df_clientes, df_numerico_original, resultados_k, labels_dict, projecao_pca,
+            labels_referencia=labels_kmeans, n_clusters=K_OTIMO,
+            colunas_demograficas=['idade', 'numero_dependentes'],
+            colunas_financeiras=['renda_mensal', 'score_credito', 'historico_pagamento_recente',
+                                 'tempo_de_debito_meses', 'valor_divida'],
+            colunas_categoricas=['sexo', 'estado_civil', 'nivel_educacional', 'tipo_emprego'],
+            features_radar=['idade', 'renda_mensal', 'score_credito', 'tempo_de_debito_meses', 'valor_divida'],
+            resultados_k_hierarquico=resultados_k_hierarquico
+        )
+        tempos_figuras = relatorio.renderizar_figuras(tarefas, n_jobs=n_jobs_relatorio)
+    print(tempos_figuras.to_string(float_format=lambda v: f"{v:.2f}"))
+
+    if registro is not None:
+        print("\n--- Pico de memória por etapa ---")
+        print(monitoramento.relatorio_memoria(registro).to_string(float_format=lambda v: f"{v:.1f}"))
+
+def _labels_e_centros(resultado_kmeans):
+    """
+    Guarda do ajuste do K-Means apenas o que o pipeline usa (rótulos e centróides).
+    """
+    labels, ajuste = resultado_kmeans
+    return labels, ajuste['centros']
+
+def _labels_e_nucleos(resultado_dbscan):
+    """
+    Guarda do DBSCAN apenas os rótulos e os índices dos pontos núcleo.
+    """
+    labels, resumo = resultado_dbscan
+    return labels, resumo['indices_nucleo']
+
+def _perfis(df_numerico, df_clientes, labels, nome_modelo):
+    """
+    Perfis numérico e categórico de um modelo, numa única passagem de perfilar_clusters.
+    """
+    return evaluation.analisar_perfis(df_clientes, labels, nome_modelo,
+                                      colunas_numericas=list(df_numerico.columns))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline de segmentação de clientes.")
+    parser.add_argument('--baixa-memoria', action='store_true',
+                        help="Usa dtypes compactos (category, float32, rótulos int8/int16).")
+    parser.add_argument('--medir-memoria', action='store_true',
+                        help="Imprime o pico de memória de cada etapa ao final.")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Recalcula todas as etapas sem ler nem gravar o cache em disco.")
+    parser.add_argument('--n-jobs-relatorio', type=int, default=-1,
+                        help="Processos que desenham as figuras do relatório (-1 = todos os núcleos).")
+    parser.add_argument('--perfilar', nargs='?', const=monitoramento.ARQUIVO_PERFIL_PADRAO, default=None,
+                        metavar='ARQUIVO',
+                        help="Grava o tempo, CPU, pico de RSS e linhas de cada etapa e chamada em um trace "
+                             "do Chrome (padrão: perfil_segmentacao.json) e imprime o resumo. "
+                             "Equivale a SEGMENTACAO_PERFIL=1.")
+    parser.add_argument('--k', default=str(K_PADRAO),
+                        help="Número de clusters, ou 'auto' para o K recomendado pela curva de estabilidade.")
+    parser.add_argument('--grade-dbscan', action='store_true',
+                        help="Avalia todas as combinações de eps e min_samples da grade com uma única busca de vizinhos.")
+    args = parser.parse_args()
+    main(baixa_memoria=args.baixa_memoria, medir_memoria=args.medir_memoria, usar_cache=not args.sem_cache,
+         n_jobs_relatorio=args.n_jobs_relatorio, arquivo_perfil=args.perfilar,
+         n_clusters=args.k if args.k == 'auto' else int(args.k), grade_dbscan=args.grade_dbscan)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Matriz de features padronizada materializada uma única vez em disco (.npy,
+C-contígua, float32 ou float64) e aberta por mapeamento de memória (mmap).
+
+Um arquivo JSON ao lado da matriz (sidecar) guarda o formato, os nomes das
+colunas e as estatísticas do StandardScaler. Abrir a matriz não copia os dados:
+todos os processos que a mapeiam (execuções do main.py, processos do dashboard,
+pools de ajuste) compartilham as mesmas páginas do page cache do sistema.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+VERSAO_MATRIZ = 1
+EXTENSAO_MATRIZ = '.npy'
+EXTENSAO_SIDECAR = '.json'
+# Linhas copiadas por vez ao gravar a matriz
+TAMANHO_BLOCO_GRAVACAO = 1_000_000
+
+
+def caminho_sidecar(caminho):
+    """
+    Caminho do JSON de metadados da matriz.
+    """
+    return os.path.splitext(caminho)[0] + EXTENSAO_SIDECAR
+
+
+def salvar_matriz(dados, caminho, colunas=None, metadados=None):
+    """
+    Grava a matriz em .npy (C-contígua) e os metadados no sidecar JSON.
+
+    As duas escritas são atômicas (arquivo temporário + os.replace) e o sidecar é
+    gravado por último: a presença dele indica que a matriz está completa.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Matriz numérica; float32 é mantido, o resto vira float64.
+        caminho (str): Arquivo .npy de destino.
+        colunas (list, opcional): Nomes das colunas (padrão: as colunas do DataFrame).
+        metadados (dict, opcional): Informações extras serializáveis em JSON (ex.: estatísticas do scaler).
+
+    Returns:
+        dict: Os metadados gravados no sidecar.
+    """
+    matriz = np.asarray(dados)
+    dtype = np.float32 if matriz.dtype == np.float32 else np.float64
+    if colunas is None:
+        colunas = [str(c) for c in dados.columns] if isinstance(dados, pd.DataFrame) else None
+
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    # Nomes temporários únicos: processos concorrentes podem gravar a mesma matriz
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    os.close(descritor)
+    destino = np.lib.format.open_memmap(temporario, mode='w+', dtype=dtype, shape=matriz.shape)
+    for inicio in range(0, matriz.shape[0], TAMANHO_BLOCO_GRAVACAO):
+        destino[inicio:inicio + TAMANHO_BLOCO_GRAVACAO] = matriz[inicio:inicio + TAMANHO_BLOCO_GRAVACAO]
+    destino.flush()
+    del destino
+    os.replace(temporario, caminho)
+
+    informacoes = {
+        'versao': VERSAO_MATRIZ,
+        'shape': list(matriz.shape),
+        'dtype': np.dtype(dtype).str,
+        'colunas': colunas,
+        **(metadados or {})
+    }
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+        json.dump(informacoes, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho_sidecar(caminho))
+    return informacoes
+
+
+def existe_matriz(caminho):
+    """
+    Indica se a matriz e o sidecar existem (gravação concluída).
+    """
+    return os.path.exists(caminho) and os.path.exists(caminho_sidecar(caminho))
+
+
+def abrir_matriz(caminho):
+    """
+    Mapeia a matriz em memória, somente leitura e sem copiar os dados.
+
+    Returns:
+        tuple: (np.memmap, metadados do sidecar)
+    """
+    with open(caminho_sidecar(caminho), encoding='utf-8') as arquivo:
+        metadados = json.load(arquivo)
+    if metadados['versao'] > VERSAO_MATRIZ:
+        raise ValueError(f"Matriz na versão {metadados['versao']}, mais nova que a suportada ({VERSAO_MATRIZ}).")
+    matriz = np.load(caminho, mmap_mode='r')
+    if list(matriz.shape) != metadados['shape'] or matriz.dtype.str != metadados['dtype']:
+        raise ValueError(f"A matriz '{caminho}' não corresponde ao seu sidecar.")
+    return matriz, metadados
+
+
+def abrir_dataframe(caminho):
+    """
+    DataFrame apoiado diretamente na matriz mapeada (sem cópia), com os nomes de colunas do sidecar.
+
+    Returns:
+        tuple: (pd.DataFrame somente leitura, metadados do sidecar)
+    """
+    matriz, metadados = abrir_matriz(caminho)
+    return pd.DataFrame(matriz, columns=metadados['colunas'], copy=False), metadados
+
+
+def arquivo_mapeado(dados):
+    """
+    Se a matriz for uma vista completa de um arquivo mapeado (np.memmap), retorna
+    (arquivo, deslocamento em bytes); caso contrário, None. Permite que outros
+    processos mapeiem o mesmo arquivo em vez de receber uma cópia.
+    """
+    matriz = np.asarray(dados)
+    base = matriz
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    if base is None or not base.filename or base.offset is None:
+        return None
+    completa = (matriz.ctypes.data == base.ctypes.data and matriz.shape == base.shape
+                and matriz.dtype == base.dtype and matriz.flags.c_contiguous)
+    return (base.filename, base.offset) if completa else None
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+import matriz_mapeada
+
+# Estado de cada processo do pool: a matriz é anexada uma única vez, na
+# inicialização do processo, e as tarefas recebem apenas parâmetros pequenos.
+_ESTADO_PROCESSO = {}
+
+
+def publicar_matriz(dados):
+    """
+    Copia a matriz de dados para um bloco de memória compartilhada.
+
+    Se a matriz já for um arquivo mapeado em memória (ver matriz_mapeada), nada é
+    copiado: os processos mapeiam o mesmo arquivo e compartilham o page cache.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Matriz numérica (ex.: dados padronizados).
+            Matrizes float32 são publicadas em float32; as demais em float64.
+
+    Returns:
+        tuple: (shm, descritor), onde descritor é um dicionário pequeno
+               (nome ou arquivo, shape, dtype) que os processos usam para anexar a
+               matriz. shm é None quando a matriz vem de um arquivo mapeado.
+    """
+    matriz = np.asarray(dados)
+    mapeado = matriz_mapeada.arquivo_mapeado(matriz)
+    if mapeado is not None and matriz.dtype in (np.float32, np.float64):
+        arquivo, deslocamento = mapeado
+        return None, {'arquivo': arquivo, 'offset': deslocamento, 'shape': matriz.shape, 'dtype': matriz.dtype.str}
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32 if matriz.dtype == np.float32 else np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, matriz.nbytes))
+    destino = np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=shm.buf)
+    destino[:] = matriz
+    descritor = {'nome': shm.name, 'shape': matriz.shape, 'dtype': matriz.dtype.str}
+    return shm, descritor
+
+
+def anexar_matriz(descritor):
+    """
+    Anexa (sem copiar) uma matriz publicada por publicar_matriz.
+
+    Returns:
+        tuple: (shm, matriz) com a matriz somente leitura apontando para a memória
+               compartilhada (shm é None para matrizes em arquivo mapeado).
+    """
+    if 'arquivo' in descritor:
+        matriz = np.memmap(descritor['arquivo'], dtype=np.dtype(descritor['dtype']), mode='r',
+                           offset=descritor['offset'], shape=tuple(descritor['shape']))
+        return None, matriz
+    shm = shared_memory.SharedMemory(name=descritor['nome'])
+    matriz = np.ndarray(descritor['shape'], dtype=np.dtype(descritor['dtype']), buffer=shm.buf)
+    matriz.flags.writeable = False
+    return shm, matriz
+
+
+def liberar_matriz(shm):
+    """
+    Fecha e remove o bloco de memória compartilhada criado por publicar_matriz.
+    """
+    if shm is None:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def threads_por_processo(n_jobs):
+    """
+    Número de threads BLAS/OpenMP por processo para não exceder os núcleos disponíveis.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, n_jobs))
+
+
+def _inicializar_processo(descritor, n_threads):
+    """
+    Inicializador dos processos do pool: limita as threads BLAS e anexa a matriz.
+    """
+    threadpool_limits(limits=n_threads)
+    shm, matriz = anexar_matriz(descritor)
+    _ESTADO_PROCESSO['shm'] = shm
+    _ESTADO_PROCESSO['matriz'] = matriz
+
+
+def matriz_do_processo():
+    """
+    Retorna a matriz anexada ao processo atual (usar dentro das tarefas do pool).
+    """
+    return _ESTADO_PROCESSO['matriz']
+
+
+def resolver_n_jobs(n_jobs):
+    """
+    Converte o parâmetro n_jobs (None ou -1 = todos os núcleos) em um inteiro positivo.
+    """
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(1, n_jobs)
+
+
+@contextmanager
+def pool_com_matriz(dados, n_jobs):
+    """
+    Cria um pool de processos que compartilham uma única cópia da matriz.
+
+    A matriz é publicada em memória compartilhada e anexada por cada processo na
+    inicialização, de modo que nenhuma tarefa precisa serializar os dados. As
+    threads BLAS de cada processo são limitadas para evitar sobrecarga de CPU.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Matriz numérica a compartilhar.
+        n_jobs (int): Número de processos.
+
+    Yields:
+        ProcessPoolExecutor: O pool pronto para receber tarefas.
+    """
+    shm, descritor = publicar_matriz(dados)
+    executor = ProcessPoolExecutor(
+        max_workers=n_jobs,
+        initializer=_inicializar_processo,
+        initargs=(descritor, threads_por_processo(n_jobs))
+    )
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        liberar_matriz(shm)
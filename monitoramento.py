@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+import functools
+import inspect
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Variável de ambiente que liga o perfilador: '1' grava o trace no caminho padrão;
+# qualquer outro valor não vazio é usado como caminho do arquivo
+VARIAVEL_AMBIENTE_PERFIL = 'SEGMENTACAO_PERFIL'
+ARQUIVO_PERFIL_PADRAO = 'perfil_segmentacao.json'
+
+# Perfilador ativo no processo (ver perfilar); None = instrumentação desligada
+_PERFILADOR = None
+# Maior VmHWM lido antes de cada _reiniciar_pico_rss: no Linux, zerar o VmHWM também
+# zera o ru_maxrss, e sem este registro o pico do processo inteiro se perderia
+_PICO_PROCESSO_MB = 0.0
+
+
+def _ru_maxrss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+
+
+def _vmhwm_mb():
+    """
+    VmHWM do Linux (pico de RSS desde o último reinício do contador), em MB; None sem /proc.
+    """
+    try:
+        with open('/proc/self/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+def _rss_pico_mb():
+    """
+    Pico de memória residente (RSS) do processo desde o início, em MB, mesmo que o
+    perfilador tenha zerado o contador do sistema no meio do caminho.
+    """
+    return max(_ru_maxrss_mb(), _PICO_PROCESSO_MB, _vmhwm_mb() or 0.0)
+
+
+@contextmanager
+def medir_etapa(nome, registro=None):
+    """
+    Mede o pico de memória alocada (tracemalloc, que enxerga os buffers do NumPy e
+    do pandas) e o tempo de uma etapa do pipeline.
+
+    Com registro=None a medição fica desligada e o bloco roda sem custo adicional.
+    Se houver um perfilador ativo (perfilar), a etapa também entra no trace.
+
+    Args:
+        nome (str): Nome da etapa.
+        registro (list, opcional): Lista que recebe um dicionário por etapa medida.
+    """
+    if _PERFILADOR is not None:
+        with _PERFILADOR.intervalo(nome, categoria='etapa'):
+            with _medir_etapa(nome, registro):
+                yield
+        return
+    with _medir_etapa(nome, registro):
+        yield
+
+
+@contextmanager
+def _medir_etapa(nome, registro):
+    if registro is None:
+        yield
+        return
+
+    ja_rastreava = tracemalloc.is_tracing()
+    if not ja_rastreava:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    atual_inicio, _ = tracemalloc.get_traced_memory()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        atual_fim, pico = tracemalloc.get_traced_memory()
+        registro.append({
+            'etapa': nome,
+            'tempo_s': time.perf_counter() - inicio,
+            'pico_etapa_mb': (pico - atual_inicio) / 2**20,
+            'retido_mb': (atual_fim - atual_inicio) / 2**20,
+            'rss_pico_processo_mb': _rss_pico_mb()
+        })
+        if not ja_rastreava:
+            tracemalloc.stop()
+
+
+def relatorio_memoria(registro):
+    """
+    Tabela com o pico de memória de cada etapa medida por medir_etapa.
+
+    Returns:
+        pd.DataFrame: Uma linha por etapa (pico da etapa, memória retida ao final, tempo
+                      e pico de RSS acumulado do processo).
+    """
+    return pd.DataFrame(registro, columns=['etapa', 'tempo_s', 'pico_etapa_mb', 'retido_mb',
+                                           'rss_pico_processo_mb']).set_index('etapa')
+
+
+def _rss_pico_recente_mb():
+    """
+    Pico de RSS desde o último _reiniciar_pico_rss (VmHWM do Linux), em MB.
+    Sem /proc, cai no pico do processo inteiro (ru_maxrss).
+    """
+    pico = _vmhwm_mb()
+    return _ru_maxrss_mb() if pico is None else pico
+
+
+def _reiniciar_pico_rss():
+    """
+    Zera o pico de RSS do processo (Linux: /proc/self/clear_refs); sem suporte, não faz nada.
+
+    Returns:
+        float: O pico lido imediatamente antes de zerar (MB), que também é somado ao
+               pico do processo inteiro (_rss_pico_mb).
+    """
+    global _PICO_PROCESSO_MB
+    pico = _rss_pico_recente_mb()
+    _PICO_PROCESSO_MB = max(_PICO_PROCESSO_MB, pico)
+    try:
+        with open('/proc/self/clear_refs', 'w') as arquivo:
+            arquivo.write('5')
+    except OSError:
+        pass
+    return pico
+
+
+def _tempo_cpu_filhos():
+    """
+    Tempo de CPU dos processos filhos já encerrados (pools de processos).
+    """
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _contar_linhas(args):
+    """
+    Número de linhas do primeiro argumento tabular (DataFrame, Series ou ndarray), se houver.
+    """
+    for arg in args:
+        forma = getattr(arg, 'shape', None)
+        if forma:
+            return int(forma[0])
+    return None
+
+
+class Perfilador:
+    """
+    Registra intervalos aninhados (etapas do pipeline e chamadas de função) com tempo
+    de parede, tempo de CPU (do processo e dos processos filhos encerrados no
+    intervalo), pico de RSS e número de linhas da entrada.
+
+    O pico de RSS de cada intervalo é medido zerando o VmHWM do Linux no início e
+    lendo-o no fim. Como os intervalos internos também zeram o contador, cada um lê
+    o VmHWM antes de zerá-lo e o acumula no máximo corrente do intervalo externo,
+    junto com o seu próprio pico ao terminar; o pico de um intervalo é o máximo
+    entre a leitura final e esse acumulado.
+    """
+
+    def __init__(self):
+        self.eventos = []
+        self._pilha = []
+        self._origem = time.perf_counter()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def intervalo(self, nome, categoria='etapa', linhas=None):
+        """
+        Mede o bloco como um intervalo do trace.
+
+        Args:
+            nome (str): Nome do intervalo (etapa ou função).
+            categoria (str): Categoria no trace ('etapa' ou o módulo da função).
+            linhas (int, opcional): Número de linhas processadas.
+        """
+        quadro = {'filhos_s': 0.0, 'pico_filhos_mb': 0.0}
+        # O pico atingido pelo intervalo externo até aqui seria apagado pelo reinício
+        pico_anterior = _reiniciar_pico_rss()
+        if self._pilha:
+            pai = self._pilha[-1]
+            pai['pico_filhos_mb'] = max(pai['pico_filhos_mb'], pico_anterior)
+        self._pilha.append(quadro)
+        cpu_inicio, cpu_filhos_inicio = time.process_time(), _tempo_cpu_filhos()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            cpu = time.process_time() - cpu_inicio
+            cpu_filhos = _tempo_cpu_filhos() - cpu_filhos_inicio
+            pico = max(_rss_pico_recente_mb(), quadro['pico_filhos_mb'])
+            self._pilha.pop()
+            if self._pilha:
+                pai = self._pilha[-1]
+                pai['filhos_s'] += duracao
+                pai['pico_filhos_mb'] = max(pai['pico_filhos_mb'], pico)
+            self.eventos.append({
+                'nome': nome,
+                'categoria': categoria,
+                'inicio_s': inicio - self._origem,
+                'tempo_s': duracao,
+                'tempo_proprio_s': duracao - quadro['filhos_s'],
+                'cpu_s': cpu,
+                'cpu_filhos_s': cpu_filhos,
+                'rss_pico_mb': pico,
+                'linhas': linhas,
+                'profundidade': len(self._pilha),
+                'thread': threading.get_ident(),
+            })
+
+    def _envolver(self, funcao, categoria):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with self.intervalo(funcao.__name__, categoria, _contar_linhas(args)):
+                return funcao(*args, **kwargs)
+        envolvida.__wrapped_perfilador__ = funcao
+        return envolvida
+
+    @contextmanager
+    def instrumentar(self, *modulos):
+        """
+        Substitui temporariamente as funções públicas dos módulos por versões medidas.
+
+        Só são envolvidas as funções definidas no próprio módulo e que não são
+        geradores; as chamadas internas entre funções do módulo também são medidas,
+        pois passam pelo atributo do módulo. As funções originais são restauradas ao sair.
+        """
+        originais = []
+        for modulo in modulos:
+            for nome, funcao in vars(modulo).copy().items():
+                if (nome.startswith('_') or not inspect.isfunction(funcao)
+                        or funcao.__module__ != modulo.__name__ or inspect.isgeneratorfunction(funcao)):
+                    continue
+                originais.append((modulo, nome, funcao))
+                setattr(modulo, nome, self._envolver(funcao, modulo.__name__))
+        try:
+            yield self
+        finally:
+            for modulo, nome, funcao in originais:
+                setattr(modulo, nome, funcao)
+
+    def exportar_chrome_trace(self, caminho):
+        """
+        Grava os intervalos no formato Trace Event do Chrome (abrir em chrome://tracing
+        ou https://ui.perfetto.dev).
+        """
+        eventos = [{
+            'name': evento['nome'],
+            'cat': evento['categoria'],
+            'ph': 'X',
+            'ts': evento['inicio_s'] * 1e6,
+            'dur': evento['tempo_s'] * 1e6,
+            'pid': self._pid,
+            'tid': evento['thread'],
+            'args': {chave: evento[chave] for chave in ('cpu_s', 'cpu_filhos_s', 'rss_pico_mb', 'linhas')},
+        } for evento in sorted(self.eventos, key=lambda e: e['inicio_s'])]
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, arquivo)
+
+    def resumo(self):
+        """
+        Tabela agregada por intervalo, do maior para o menor tempo total.
+
+        Returns:
+            pd.DataFrame: chamadas, tempo total e próprio (sem os intervalos internos),
+                          CPU, pico de RSS e maior número de linhas de cada intervalo.
+        """
+        colunas = ['categoria', 'nome', 'tempo_s', 'tempo_proprio_s', 'cpu_s', 'cpu_filhos_s', 'rss_pico_mb', 'linhas']
+        eventos = pd.DataFrame(self.eventos, columns=colunas)
+        tabela = eventos.groupby(['categoria', 'nome'], sort=False).agg(
+            chamadas=('tempo_s', 'size'),
+            tempo_s=('tempo_s', 'sum'),
+            tempo_proprio_s=('tempo_proprio_s', 'sum'),
+            cpu_s=('cpu_s', 'sum'),
+            cpu_filhos_s=('cpu_filhos_s', 'sum'),
+            rss_pico_mb=('rss_pico_mb', 'max'),
+            linhas=('linhas', 'max'),
+        ).astype({'linhas': 'Int64'})
+        return tabela.sort_values('tempo_s', ascending=False)
+
+
+def caminho_perfil_do_ambiente():
+    """
+    Caminho do trace definido pela variável de ambiente, ou None se o perfilador estiver desligado.
+    """
+    valor = os.environ.get(VARIAVEL_AMBIENTE_PERFIL, '').strip()
+    if valor.lower() in ('', '0', 'false', 'nao', 'não'):
+        return None
+    return ARQUIVO_PERFIL_PADRAO if valor.lower() in ('1', 'true', 'sim') else valor
+
+
+@contextmanager
+def perfilar(caminho_trace=None, modulos=()):
+    """
+    Liga o perfilador durante o bloco: as etapas de medir_etapa e as chamadas às
+    funções públicas dos módulos viram intervalos do trace. Ao sair, grava o trace
+    em caminho_trace e imprime o resumo.
+
+    Com caminho_trace=None o bloco roda sem instrumentação.
+
+    Args:
+        caminho_trace (str, opcional): Arquivo JSON do trace (formato do Chrome).
+        modulos (iterable): Módulos cujas funções públicas são medidas.
+    """
+    global _PERFILADOR
+    if caminho_trace is None:
+        yield None
+        return
+
+    perfilador = Perfilador()
+    _PERFILADOR = perfilador
+    try:
+        with perfilador.instrumentar(*modulos):
+            yield perfilador
+    finally:
+        _PERFILADOR = None
+        perfilador.exportar_chrome_trace(caminho_trace)
+        print("\n--- Perfil de execução (etapas e chamadas) ---")
+        print(perfilador.resumo().to_string(float_format=lambda v: f"{v:.2f}"))
+        print(f"Trace gravado em '{caminho_trace}' (abrir em chrome://tracing ou ui.perfetto.dev).")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Pontuação em lote: atribui segmentos a um arquivo de novos clientes usando o
+artefato salvo pelo pipeline (esquema de codificação, scaler e centróides do
+K-Means, ou os núcleos do DBSCAN em modelo_dbscan.npz).
+
+O arquivo de entrada é lido em blocos e os rótulos são gravados bloco a bloco,
+de modo que a memória usada não depende do tamanho da base.
+
+Uso:
+    python pontuar.py --artefato modelo_segmentacao.npz --entrada novos.parquet --saida segmentos.parquet
+    python pontuar.py --artefato modelo_dbscan.npz --entrada novos.parquet --saida densidade.parquet
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import armazenamento
+import artefato
+
+
+def pontuar_arquivo(caminho_artefato, caminho_entrada, caminho_saida, tamanho_bloco=500_000,
+                    coluna_id='cliente_id', incluir_distancia=False):
+    """
+    Lê os clientes em blocos, atribui o segmento de cada um e grava o resultado.
+
+    Args:
+        caminho_artefato (str): Arquivo .npz salvo por artefato.salvar_artefato.
+        caminho_entrada (str): Base de clientes (Parquet, pasta Parquet, Feather ou CSV).
+        caminho_saida (str): Arquivo de saída (.parquet ou .csv).
+        tamanho_bloco (int): Linhas por bloco.
+        coluna_id (str): Coluna de identificação copiada para a saída (se existir).
+        incluir_distancia (bool): Grava também a distância ao centróide (ou ao núcleo, em
+            artefatos de densidade; infinita para ruído).
+
+    Returns:
+        int: Número de clientes pontuados.
+    """
+    modelo = artefato.carregar_artefato(caminho_artefato)
+    esquema = modelo['esquema']
+    # Projeção: lê apenas as colunas usadas pelo esquema (e o identificador, se existir)
+    colunas = esquema['numericas'] + list(esquema['categoricas'])
+    if coluna_id in armazenamento.listar_colunas(caminho_entrada):
+        colunas = [coluna_id] + colunas
+
+    coluna_distancia = 'distancia_nucleo' if modelo['tipo'] == 'densidade' else 'distancia_centroide'
+
+    total = 0
+    inicio = time.perf_counter()
+    with armazenamento.EscritorEmBlocos(caminho_saida) as escritor:
+        for bloco in armazenamento.iterar_blocos(caminho_entrada, tamanho_bloco, colunas=colunas):
+            labels, distancias = artefato.atribuir_segmentos(modelo, bloco)
+            saida = pd.DataFrame({'segmento': labels})
+            if coluna_id in bloco.columns:
+                saida.insert(0, coluna_id, bloco[coluna_id].to_numpy())
+            if incluir_distancia:
+                saida[coluna_distancia] = distancias.astype('float32')
+            escritor.escrever(saida)
+
+            total += len(bloco)
+            decorrido = time.perf_counter() - inicio
+            print(f"{total} clientes pontuados ({total / max(decorrido, 1e-9) * 60:,.0f} clientes/min)")
+
+    print(f"Pontuação concluída: {total} clientes gravados em '{caminho_saida}'.")
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Atribui segmentos a novos clientes em lote.")
+    parser.add_argument('--artefato', required=True, help="Artefato .npz do pipeline de segmentação.")
+    parser.add_argument('--entrada', required=True, help="Base de clientes (.parquet, pasta, .feather ou .csv).")
+    parser.add_argument('--saida', required=True, help="Arquivo de saída (.parquet ou .csv).")
+    parser.add_argument('--tamanho-bloco', type=int, default=500_000)
+    parser.add_argument('--coluna-id', default='cliente_id')
+    parser.add_argument('--incluir-distancia', action='store_true')
+    args = parser.parse_args()
+
+    pontuar_arquivo(args.artefato, args.entrada, args.saida, args.tamanho_bloco,
+                    args.coluna_id, args.incluir_distancia)
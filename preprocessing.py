@@ -1,65 +1,184 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+import numpy as np
 
-def selecionar_e_transformar_features(df):
+def extrair_esquema(df):
+    """
+    Extrai o esquema de codificação da base: features numéricas, categorias de
+    cada feature categórica e a ordem final das colunas de modelagem.
+
+    O esquema fixa o One-Hot Encoding, de modo que novos clientes possam ser
+    codificados exatamente como a base de treino, mesmo que não tragam todas as categorias.
+
+    Args:
+        df (pd.DataFrame): O DataFrame original completo.
+
+    Returns:
+        dict: {'numericas': list, 'categoricas': {coluna: [categorias]}, 'colunas_modelo': list}
+    """
+    features_numericas = df.select_dtypes(include=['number']).columns.tolist()
+    if 'cliente_id' in features_numericas:
+        features_numericas.remove('cliente_id')
+
+    categoricas = {}
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        valores = df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].dropna().unique()
+        categoricas[col] = sorted(str(v) for v in valores)
+
+    # drop_first=True: a primeira categoria de cada feature é a referência (coluna omitida)
+    colunas_modelo = list(features_numericas)
+    for col, categorias in categoricas.items():
+        colunas_modelo += [f"{col}_{categoria}" for categoria in categorias[1:]]
+    return {'numericas': features_numericas, 'categoricas': categoricas, 'colunas_modelo': colunas_modelo}
+
+def _codigos_categoria(serie, categorias):
+    """
+    Posição de cada valor na lista de categorias (-1 se desconhecido).
+    Colunas 'category' são recodificadas pelos códigos, sem materializar strings.
+    """
+    indice = pd.Index(categorias)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        mapa = np.append(indice.get_indexer(serie.cat.categories.astype(str)), -1)
+        return mapa[serie.cat.codes.to_numpy()]
+    return indice.get_indexer(serie.astype(str))
+
+def codificar_com_esquema(df, esquema, dtype=np.float64):
+    """
+    Codifica um DataFrame com um esquema fixo (numéricas + One-Hot com drop_first).
+
+    Categorias desconhecidas (ausentes no esquema) ficam com todas as colunas
+    dummy zeradas, como a categoria de referência.
+
+    Args:
+        df (pd.DataFrame): Clientes a codificar (precisa ter as colunas do esquema).
+        esquema (dict): Esquema gerado por extrair_esquema.
+        dtype: Tipo da matriz resultante.
+
+    Returns:
+        np.ndarray: Matriz (n x len(esquema['colunas_modelo'])) pronta para a padronização.
+    """
+    n_numericas = len(esquema['numericas'])
+    matriz = np.zeros((len(df), len(esquema['colunas_modelo'])), dtype=dtype)
+    matriz[:, :n_numericas] = df[esquema['numericas']].to_numpy(dtype=dtype)
+
+    posicao = n_numericas
+    linhas = np.arange(len(df))
+    for col, categorias in esquema['categoricas'].items():
+        codigos = _codigos_categoria(df[col], categorias)
+        # Código 0 é a categoria de referência e -1 é categoria desconhecida: nenhuma coluna ativa
+        ativos = codigos > 0
+        matriz[linhas[ativos], posicao + codigos[ativos] - 1] = 1
+        posicao += len(categorias) - 1
+    return matriz
+
+def selecionar_e_transformar_features(df, esquema=None, baixa_memoria=False, retornar_matriz=False):
     """
     Seleciona as features relevantes, aplica One-Hot Encoding nas categóricas
     e retorna os dataframes prontos para a próxima etapa.
 
     Args:
         df (pd.DataFrame): O DataFrame original completo.
+        esquema (dict, opcional): Esquema fixo (extrair_esquema). Se None, é extraído do próprio df.
+        baixa_memoria (bool): Gera a matriz de modelagem em float32 em vez de float64.
+        retornar_matriz (bool): Retorna as features de modelagem como np.ndarray gravável
+            (colunas em esquema['colunas_modelo']), que padronizar_dados pode padronizar no lugar.
 
     Returns:
         tuple: Contendo dois DataFrames:
                - df_numerico_original: Apenas com as features numéricas originais (para análise de perfil).
                - df_final_features: Completo, com features numéricas e categóricas transformadas (para modelagem).
+                 Com retornar_matriz=True, o np.ndarray correspondente.
     """
-    # Copia o dataframe para evitar o SettingWithCopyWarning
-    df_processado = df.copy()
+    # 1. Identifica as features numéricas e categóricas (ou usa o esquema informado)
+    if esquema is None:
+        esquema = extrair_esquema(df)
+    features_numericas = esquema['numericas']
+    features_categoricas = list(esquema['categoricas'])
 
-    # 1. Separa as colunas numéricas que serão usadas no clustering
-    features_numericas = df_processado.select_dtypes(include=['number']).columns.tolist()
-    if 'cliente_id' in features_numericas:
-        features_numericas.remove('cliente_id')
-    
     # Guarda o dataframe com apenas as features numéricas originais para a análise de perfil
-    df_numerico_original = df_processado[features_numericas]
+    df_numerico_original = df[features_numericas]
 
-    # 2. Identifica as colunas categóricas para transformação
-    features_categoricas = df_processado.select_dtypes(include=['object', 'category']).columns.tolist()
-    
     print(f"Features numéricas identificadas: {features_numericas}")
     print(f"Features categóricas para One-Hot Encoding: {features_categoricas}")
 
-    # 3. Aplica One-Hot Encoding nas variáveis categóricas
-    # drop_first=True remove a primeira categoria de cada feature para evitar multicolinearidade
-    # dtype=float garante que as novas colunas sejam numéricas
-    df_encoded = pd.get_dummies(df_processado[features_categoricas], drop_first=True, dtype=float)
-    
-    # 4. Combina as features numéricas originais com as categóricas transformadas
-    df_final_features = pd.concat([df_numerico_original, df_encoded], axis=1)
+    # 2. Aplica One-Hot Encoding nas variáveis categóricas com o esquema fixo
+    # (drop_first: a primeira categoria de cada feature é omitida para evitar multicolinearidade)
+    # e combina com as features numéricas originais
+    dtype = np.float32 if baixa_memoria else np.float64
+    matriz = codificar_com_esquema(df, esquema, dtype=dtype)
     
     print("One-Hot Encoding aplicado com sucesso.")
-    print(f"Dimensões do DataFrame final para modelagem: {df_final_features.shape}")
+    print(f"Dimensões do DataFrame final para modelagem: {matriz.shape}")
     
-    # 5. Retorna ambos os DataFrames
+    # 3. Retorna ambos os DataFrames
+    if retornar_matriz:
+        return df_numerico_original, matriz
+    df_final_features = pd.DataFrame(matriz, columns=esquema['colunas_modelo'], index=df.index, copy=False)
     return df_numerico_original, df_final_features
 
-def padronizar_dados(df_features):
+def padronizar_dados(df_features, retornar_scaler=False, baixa_memoria=False, colunas=None):
     """
     Padroniza os dados usando StandardScaler (média 0, desvio padrão 1).
+    Com retornar_scaler=True, retorna também o StandardScaler ajustado.
+
+    Com baixa_memoria=True, a matriz é padronizada em float32. Se df_features for um
+    np.ndarray float32 gravável (ex.: selecionar_e_transformar_features com
+    retornar_matriz=True), a padronização é feita no próprio buffer, que não deve
+    mais ser usado depois da chamada. Um DataFrame é copiado uma vez: com o
+    copy-on-write do pandas, o seu buffer não pode ser alterado no lugar.
+
+    Args:
+        colunas (list, opcional): Nomes das colunas quando df_features é um np.ndarray.
     """
-    scaler = StandardScaler()
-    dados_padronizados = scaler.fit_transform(df_features)
-    df_padronizado = pd.DataFrame(dados_padronizados, columns=df_features.columns)
+    # Importação local: a codificação (usada na pontuação) não depende do scikit-learn
+    from sklearn.preprocessing import StandardScaler
+    if isinstance(df_features, pd.DataFrame):
+        colunas = df_features.columns
+    if baixa_memoria:
+        dados = df_features
+        if isinstance(dados, pd.DataFrame) or dados.dtype != np.float32 or not dados.flags.writeable:
+            dados = np.array(dados, dtype=np.float32)
+        scaler = StandardScaler(copy=False)
+    else:
+        dados = df_features
+        scaler = StandardScaler()
+    dados_padronizados = scaler.fit_transform(dados)
+    df_padronizado = pd.DataFrame(dados_padronizados, columns=colunas, copy=False)
     print("Dados padronizados com sucesso.")
+    if retornar_scaler:
+        return df_padronizado, scaler
     return df_padronizado
 
+def estatisticas_scaler(scaler):
+    """
+    Estatísticas de um StandardScaler ajustado em listas (serializáveis em JSON).
+    """
+    return {
+        'media': np.asarray(scaler.mean_).tolist(),
+        'variancia': np.asarray(scaler.var_).tolist(),
+        'escala': np.asarray(scaler.scale_).tolist(),
+        'n_linhas': int(np.max(scaler.n_samples_seen_))
+    }
+
+def montar_scaler(estatisticas):
+    """
+    Reconstrói um StandardScaler ajustado a partir de suas estatísticas
+    (ver estatisticas_scaler), sem reler os dados.
+    """
+    from sklearn.preprocessing import StandardScaler
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(estatisticas['media'], dtype=np.float64)
+    scaler.var_ = np.asarray(estatisticas['variancia'], dtype=np.float64)
+    scaler.scale_ = np.asarray(estatisticas['escala'], dtype=np.float64)
+    scaler.n_samples_seen_ = estatisticas['n_linhas']
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
 def normalizar_para_radar(df):
     """
     Normaliza os dados para a visualização em Radar Chart (escala 0-1).
     """
+    from sklearn.preprocessing import MinMaxScaler
     scaler = MinMaxScaler()
     df_normalized = pd.DataFrame(scaler.fit_transform(df), columns=df.columns, index=df.index)
     return df_normalized
\ No newline at end of file
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Linhas por bloco no acúmulo da matriz de covariância
+TAMANHO_BLOCO_PROJECAO = 200_000
+# Projeções guardadas em memória (uma por base de dados)
+MAX_PROJECOES_EM_CACHE = 4
+
+# Cache em memória: hash do conteúdo da matriz -> projeção
+_PROJECOES = {}
+
+
+def projetar_pca(dados, n_componentes=2, tamanho_bloco=TAMANHO_BLOCO_PROJECAO):
+    """
+    Projeção PCA calculada pela decomposição da matriz de covariância (d x d),
+    acumulada em blocos de linhas: custo O(n d^2), memória O(bloco x d) e mesmo
+    resultado do sklearn.decomposition.PCA (a menos do sinal de cada componente).
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados (n x d).
+        n_componentes (int): Número de componentes principais.
+        tamanho_bloco (int): Linhas por bloco.
+
+    Returns:
+        dict: {'coordenadas': matriz n x n_componentes (float32), 'componentes',
+               'media', 'variancia_explicada'}
+    """
+    X = np.asarray(dados)
+    n, d = X.shape
+    media = np.zeros(d)
+    for inicio in range(0, n, tamanho_bloco):
+        media += X[inicio:inicio + tamanho_bloco].sum(axis=0, dtype=np.float64)
+    media /= n
+
+    covariancia = np.zeros((d, d))
+    for inicio in range(0, n, tamanho_bloco):
+        bloco = X[inicio:inicio + tamanho_bloco].astype(np.float64) - media
+        covariancia += bloco.T @ bloco
+    covariancia /= max(n - 1, 1)
+
+    autovalores, autovetores = np.linalg.eigh(covariancia)
+    ordem = np.argsort(autovalores)[::-1][:n_componentes]
+    componentes = autovetores[:, ordem].T
+    # Convenção de sinal determinística: maior carga absoluta de cada componente positiva
+    sinais = np.sign(componentes[np.arange(len(componentes)), np.abs(componentes).argmax(axis=1)])
+    componentes *= sinais[:, None]
+
+    coordenadas = np.empty((n, len(componentes)), dtype=np.float32)
+    for inicio in range(0, n, tamanho_bloco):
+        coordenadas[inicio:inicio + tamanho_bloco] = (X[inicio:inicio + tamanho_bloco] - media) @ componentes.T
+    return {
+        'coordenadas': coordenadas,
+        'componentes': componentes,
+        'media': media,
+        'variancia_explicada': autovalores[ordem] / autovalores.sum()
+    }
+
+
+def projecao_pca_em_cache(dados, n_componentes=2):
+    """
+    Projeção PCA calculada uma única vez por base de dados e reaproveitada por
+    todos os modelos: a chave é o hash do conteúdo da matriz, não o objeto.
+    """
+    # Importação local: o hash só é necessário quando o cache é usado
+    import cache_etapas
+
+    chave = (cache_etapas.hash_conteudo(np.asarray(dados)), n_componentes)
+    if chave not in _PROJECOES:
+        while len(_PROJECOES) >= MAX_PROJECOES_EM_CACHE:
+            _PROJECOES.pop(next(iter(_PROJECOES)))
+        _PROJECOES[chave] = projetar_pca(dados, n_componentes)
+    return _PROJECOES[chave]
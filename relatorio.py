@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Renderização do relatório de figuras em lote, sem interface gráfica (backend Agg).
+
+Cada figura é descrita por uma tarefa (nome, função desenhar_* de visualization,
+argumentos) cujos argumentos são resumos leves já calculados (histogramas,
+contagens, médias, grades de densidade), nunca os DataFrames completos. As tarefas
+independentes são desenhadas em paralelo em um pool de processos e gravadas na
+pasta de imagens; com núcleos suficientes, o lote leva o tempo da figura mais lenta.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import pandas as pd
+
+import memoria_compartilhada
+import visualization
+
+
+def _inicializar_renderizador():
+    """
+    Inicializador dos processos: backend não interativo e bibliotecas gráficas pré-carregadas.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import seaborn  # noqa: F401
+
+
+@contextmanager
+def _backend_agg():
+    """
+    Usa o backend Agg durante o bloco e restaura o backend de quem chamou ao sair
+    (o caminho serial desenha no próprio processo, que pode ser interativo).
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+    anterior = matplotlib.get_backend()
+    plt.switch_backend('Agg')
+    try:
+        yield
+    finally:
+        plt.switch_backend(anterior)
+
+
+def _renderizar(nome, funcao, argumentos):
+    """
+    Desenha e grava uma figura; retorna (nome, tempo em segundos).
+    """
+    import matplotlib.pyplot as plt
+
+    inicio = time.perf_counter()
+    fig = getattr(visualization, funcao)(**argumentos)
+    plt.close(fig)
+    return nome, time.perf_counter() - inicio
+
+
+def tarefas_do_pipeline(df_clientes, df_numerico, resultados_k, labels_dict, projecao_pca,
+                        labels_referencia, n_clusters, colunas_demograficas, colunas_financeiras,
+                        colunas_categoricas, features_radar, resultados_k_hierarquico=None):
+    """
+    Resume os dados do pipeline em tarefas de desenho leves (uma por figura).
+    Com resultados_k_hierarquico (hierarquico.encontrar_k_hierarquico), inclui também
+    o cotovelo e a silhueta do Hierárquico.
+
+    Returns:
+        list: Tuplas (nome, função desenhar_* de visualization, argumentos).
+    """
+    tarefas = [
+        ('matriz_correlacao', 'desenhar_matriz_correlacao', {'corr': df_numerico.corr()}),
+        ('distribuicoes_demograficas', 'desenhar_distribuicoes', {
+            'resumo': visualization.resumir_distribuicoes(df_numerico, colunas_demograficas),
+            'filename': 'distribuicoes_demograficas.png'
+        }),
+        ('distribuicoes_financeiras', 'desenhar_distribuicoes', {
+            'resumo': visualization.resumir_distribuicoes(df_numerico, colunas_financeiras),
+            'filename': 'distribuicoes_financeiras.png'
+        }),
+        ('distribuicoes_categoricas', 'desenhar_categoricas', {
+            'contagens': visualization.resumir_categoricas(df_clientes, colunas_categoricas),
+            'filename': 'distribuicoes_categoricas.png'
+        }),
+        ('cotovelo_silhueta', 'plotar_cotovelo_e_silhueta_juntos', {
+            'resultados_k': resultados_k, 'filename': 'cotovelo_silhueta.png'
+        }),
+    ]
+    if resultados_k_hierarquico is not None:
+        tarefas.append(('cotovelo_silhueta_hierarquico', 'plotar_cotovelo_e_silhueta_juntos', {
+            'resultados_k': resultados_k_hierarquico, 'filename': 'cotovelo_silhueta_hierarquico.png'
+        }))
+    for nome_modelo, labels in labels_dict.items():
+        if len(set(labels)) > 1:
+            tarefas.append((f'clusters_pca_{nome_modelo}', 'desenhar_clusters_pca', {
+                'resumo': visualization.resumir_clusters_pca(None, labels, projecao_pca=projecao_pca),
+                'nome_modelo': nome_modelo
+            }))
+    df_clusters = df_numerico[features_radar].assign(cluster=labels_referencia)
+    tarefas.append(('radar_clusters', 'desenhar_radar_clusters', {
+        'cluster_means_norm': visualization.resumir_radar_clusters(df_clusters, features_radar),
+        'n_clusters': n_clusters
+    }))
+    return tarefas
+
+
+def renderizar_figuras(tarefas, n_jobs=-1):
+    """
+    Desenha as figuras em paralelo (backend Agg) e as grava em lote.
+
+    Args:
+        tarefas (list): Tuplas (nome, função desenhar_* de visualization, argumentos).
+        n_jobs (int): Número de processos (-1 = todos os núcleos); 1 desenha no próprio processo.
+
+    Returns:
+        pd.DataFrame: Tempo de cada figura, do mais lento para o mais rápido.
+    """
+    n_jobs = min(memoria_compartilhada.resolver_n_jobs(n_jobs), len(tarefas))
+    inicio = time.perf_counter()
+    tempos = []
+    if n_jobs <= 1:
+        with _backend_agg():
+            tempos = [_renderizar(*tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_inicializar_renderizador) as executor:
+            futuros = [executor.submit(_renderizar, *tarefa) for tarefa in tarefas]
+            for futuro in as_completed(futuros):
+                tempos.append(futuro.result())
+
+    total = time.perf_counter() - inicio
+    tabela = pd.DataFrame(tempos, columns=['figura', 'tempo_s']).set_index('figura').sort_values('tempo_s', ascending=False)
+    print(f"{len(tarefas)} figuras gravadas em '{visualization.PASTA_IMAGENS}/' em {total:.2f}s "
+          f"({n_jobs} processo(s); figura mais lenta: {tabela['tempo_s'].max():.2f}s).")
+    return tabela
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Re-segmentação diária incremental, com warm start e detecção de deriva.
+
+O estado do último ajuste fica em uma pasta: o artefato (esquema, scaler e
+centróides), as estatísticas suficientes de cada segmento (contagens, somas e
+somas de quadrados no espaço padronizado), a referência do último reajuste
+completo e o retrato da base com o segmento de cada cliente.
+
+A cada execução, a base do dia é comparada ao retrato pelo identificador e por
+um hash de cada linha. Só os clientes novos, alterados e removidos mexem no
+modelo: as contribuições antigas saem das estatísticas, as novas entram, e o
+K-Means é continuado a partir dos centróides anteriores (iterações de Lloyd
+apenas sobre os clientes do delta; os demais mantêm o seu segmento). Os
+centróides evoluem continuamente, então os ids dos segmentos não mudam.
+
+As estatísticas de deriva (fração da base alterada, deslocamento dos centróides e
+das médias, variação das proporções e da inércia, sempre em relação ao último
+reajuste completo) decidem se o modelo precisa ser reajustado. O reajuste completo
+parte dos centróides anteriores e os ids são preservados pelo pareamento de
+centróides (algoritmo húngaro).
+
+Uso:
+    python resegmentacao.py --base base_do_dia.parquet --estado estado_segmentacao/ --saida segmentos.parquet
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import armazenamento
+import artefato
+import preprocessing
+
+PASTA_ESTADO_PADRAO = 'estado_segmentacao'
+# Reajuste completo quando alguma estatística de deriva passa do seu limiar
+LIMIARES_DERIVA = {
+    # Clientes novos, alterados ou removidos desde o último reajuste / base do reajuste
+    'fracao_alterada': 0.30,
+    # Maior deslocamento de um centróide desde o último reajuste, em desvios-padrão
+    'deslocamento_centroides': 0.50,
+    # Maior |média| de uma feature padronizada: o scaler está desatualizado
+    'deslocamento_medias': 0.25,
+    # Distância de variação total entre as proporções dos segmentos
+    'variacao_proporcoes': 0.10,
+    # Variação relativa da inércia média por cliente
+    'variacao_inercia': 0.20,
+}
+MAX_ITERACOES_INCREMENTAIS = 10
+_ARQUIVO_MODELO = 'modelo_segmentacao.npz'
+_ARQUIVO_ESTATISTICAS = 'estatisticas.npz'
+_ARQUIVO_CLIENTES = 'clientes.parquet'
+
+
+def _colunas_esquema(esquema):
+    return esquema['numericas'] + list(esquema['categoricas'])
+
+
+def hash_linhas(df, colunas, coluna_id):
+    """
+    Hash de cada cliente (conteúdo das colunas do modelo), indexado pelo identificador.
+    """
+    hashes = pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+    return pd.Series(hashes, index=pd.Index(df[coluna_id].to_numpy(), name=coluna_id))
+
+
+def comparar_bases(anterior, atual, colunas, coluna_id):
+    """
+    Classifica os clientes da base do dia em relação ao retrato anterior.
+
+    Returns:
+        dict: {'novos', 'alterados', 'removidos', 'inalterados'}, arrays de identificadores.
+    """
+    hash_anterior = hash_linhas(anterior, colunas, coluna_id)
+    hash_atual = hash_linhas(atual, colunas, coluna_id)
+    comuns = hash_atual.index.intersection(hash_anterior.index)
+    iguais = hash_atual.loc[comuns].to_numpy() == hash_anterior.loc[comuns].to_numpy()
+    return {
+        'novos': hash_atual.index.difference(hash_anterior.index).to_numpy(),
+        'alterados': comuns[~iguais].to_numpy(),
+        'removidos': hash_anterior.index.difference(hash_atual.index).to_numpy(),
+        'inalterados': comuns[iguais].to_numpy(),
+    }
+
+
+def estatisticas_segmentos(X, labels, n_clusters):
+    """
+    Contagens, somas (k x p) e somas de ||x||² de cada segmento.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.int64)
+    contagens = np.bincount(labels, minlength=n_clusters).astype(np.float64)
+    somas = np.zeros((n_clusters, X.shape[1]))
+    for j in range(X.shape[1]):
+        somas[:, j] = np.bincount(labels, weights=X[:, j], minlength=n_clusters)
+    somas_quadrados = np.bincount(labels, weights=np.einsum('ij,ij->i', X, X), minlength=n_clusters)
+    return contagens, somas, somas_quadrados
+
+
+def _centros(contagens, somas, centros_anteriores):
+    """
+    Centróides a partir das somas; segmentos que ficaram vazios mantêm o centróide anterior.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centros = somas / contagens[:, None]
+    return np.where(contagens[:, None] > 0, centros, centros_anteriores)
+
+
+def _inercia_media(contagens, somas, somas_quadrados):
+    """
+    Inércia (WCSS) por cliente a partir das estatísticas suficientes.
+    """
+    centros = _centros(contagens, somas, np.zeros_like(somas))
+    intra = somas_quadrados - contagens * np.einsum('ij,ij->i', centros, centros)
+    return float(np.maximum(intra, 0).sum() / max(contagens.sum(), 1))
+
+
+def alinhar_centros(centros, centros_referencia):
+    """
+    Pareamento de centróides (algoritmo húngaro) que minimiza a distância total.
+
+    Returns:
+        np.ndarray: ordem tal que centros[ordem][i] corresponde a centros_referencia[i].
+    """
+    # Importação local: o scipy só é necessário no reajuste completo
+    from scipy.optimize import linear_sum_assignment
+    from scipy.spatial.distance import cdist
+    _, ordem = linear_sum_assignment(cdist(centros_referencia, centros))
+    return ordem
+
+
+def _converter_centros(centros, modelo_origem, modelo_destino):
+    """
+    Leva centróides padronizados com o scaler de um artefato para o de outro.
+    """
+    originais = np.asarray(centros) * modelo_origem['escala'] + modelo_origem['media']
+    return (originais - modelo_destino['media']) / modelo_destino['escala']
+
+
+def _estado(modelo, labels, X, retrato):
+    """
+    Monta o estado a partir de um ajuste completo (também é a nova referência de deriva).
+    """
+    n_clusters = len(modelo['centros'])
+    contagens, somas, somas_quadrados = estatisticas_segmentos(X, labels, n_clusters)
+    return {
+        'artefato': modelo,
+        'contagens': contagens,
+        'somas': somas,
+        'somas_quadrados': somas_quadrados,
+        'referencia': {
+            'centros': modelo['centros'].copy(),
+            'proporcoes': contagens / max(contagens.sum(), 1),
+            'inercia_media': _inercia_media(contagens, somas, somas_quadrados),
+            'n_clientes': int(contagens.sum()),
+            'n_alterados': 0,
+        },
+        'clientes': retrato.assign(segmento=np.asarray(labels, dtype=np.int16)),
+    }
+
+
+def ajuste_completo(df_clientes, n_clusters=4, coluna_id='cliente_id', estado_anterior=None, modo_kmeans='completo'):
+    """
+    Reajusta esquema, scaler e K-Means na base inteira.
+
+    Com um estado anterior de mesmo K e mesmas colunas, o K-Means parte dos centróides
+    anteriores (convertidos para o novo scaler) e os ids dos segmentos são preservados
+    pelo pareamento com esses centróides.
+
+    Returns:
+        dict: O novo estado (ver salvar_estado).
+    """
+    # Importação local: aplicar o estado (pontuar) não exige o scikit-learn
+    import clustering_models
+    esquema = preprocessing.extrair_esquema(df_clientes.drop(columns=[coluna_id], errors='ignore'))
+    _, df_features = preprocessing.selecionar_e_transformar_features(df_clientes, esquema=esquema)
+    df_padronizado, scaler = preprocessing.padronizar_dados(df_features, retornar_scaler=True)
+    modelo = artefato.montar_artefato(esquema, scaler, np.zeros((n_clusters, df_padronizado.shape[1])))
+
+    anterior = estado_anterior['artefato'] if estado_anterior is not None else None
+    compativel = (anterior is not None and len(anterior['centros']) == n_clusters
+                  and anterior['esquema']['colunas_modelo'] == esquema['colunas_modelo'])
+    iniciais = _converter_centros(anterior['centros'], anterior, modelo) if compativel else None
+    ajuste = clustering_models.ajustar_kmeans(df_padronizado, n_clusters, modo=modo_kmeans, centros_iniciais=iniciais)
+    centros, labels = ajuste['centros'], np.asarray(ajuste['labels'])
+    if compativel:
+        ordem = alinhar_centros(centros, iniciais)
+        centros = centros[ordem]
+        # O segmento antigo ordem[i] passa a ser o i
+        labels = np.argsort(ordem)[labels]
+    elif anterior is not None:
+        print("Aviso: K ou colunas do modelo mudaram; os ids dos segmentos não são preservados.")
+
+    modelo['centros'] = np.asarray(centros, dtype=np.float64)
+    if anterior is not None and compativel:
+        modelo['nomes_segmentos'] = anterior.get('nomes_segmentos')
+    retrato = df_clientes[[coluna_id] + _colunas_esquema(esquema)]
+    return _estado(modelo, labels, df_padronizado, retrato)
+
+
+def atualizar_incremental(estado, df_clientes, coluna_id='cliente_id', max_iteracoes=MAX_ITERACOES_INCREMENTAIS):
+    """
+    Atualiza o modelo apenas com os clientes novos, alterados e removidos.
+
+    As contribuições antigas dos alterados e removidos saem das estatísticas; os novos
+    e alterados são atribuídos a partir dos centróides anteriores (warm start) e as
+    iterações de Lloyd seguem só sobre eles até os rótulos do delta se estabilizarem.
+
+    Returns:
+        tuple: (novo estado, comparação de comparar_bases)
+    """
+    modelo = estado['artefato']
+    colunas = _colunas_esquema(modelo['esquema'])
+    retrato = estado['clientes']
+    atual = df_clientes[[coluna_id] + colunas]
+    comparacao = comparar_bases(retrato, atual, colunas, coluna_id)
+    n_clusters = len(modelo['centros'])
+
+    # Remove as contribuições antigas de quem mudou ou saiu da base
+    saem = retrato[retrato[coluna_id].isin(np.concatenate([comparacao['alterados'], comparacao['removidos']]))]
+    contagens, somas, somas_quadrados = (estado['contagens'].copy(), estado['somas'].copy(),
+                                        estado['somas_quadrados'].copy())
+    if len(saem):
+        c, s, q = estatisticas_segmentos(artefato.transformar(modelo, saem), saem['segmento'].to_numpy(), n_clusters)
+        contagens, somas, somas_quadrados = contagens - c, somas - s, np.maximum(somas_quadrados - q, 0)
+
+    # Warm start: Lloyd sobre o delta, com os demais clientes fixos nas estatísticas
+    entram = atual[atual[coluna_id].isin(np.concatenate([comparacao['novos'], comparacao['alterados']]))]
+    centros = estado['artefato']['centros']
+    labels_delta = np.empty(0, dtype=np.int64)
+    base = (contagens, somas, somas_quadrados)
+    if len(entram):
+        X_delta = artefato.transformar(modelo, entram)
+        labels_delta = None
+        for _ in range(max_iteracoes):
+            distancias = (np.einsum('ij,ij->i', X_delta, X_delta)[:, None] - 2 * X_delta @ centros.T
+                          + np.einsum('ij,ij->i', centros, centros)[None, :])
+            novos_labels = distancias.argmin(axis=1)
+            if labels_delta is not None and np.array_equal(novos_labels, labels_delta):
+                break
+            labels_delta = novos_labels
+            c, s, q = estatisticas_segmentos(X_delta, labels_delta, n_clusters)
+            contagens, somas, somas_quadrados = base[0] + c, base[1] + s, base[2] + q
+            centros = _centros(contagens, somas, centros)
+    else:
+        centros = _centros(contagens, somas, centros)
+
+    # Inalterados mantêm o segmento do retrato; novos e alterados recebem o do delta
+    ids_atuais = pd.Index(atual[coluna_id].to_numpy())
+    posicoes = pd.Index(retrato[coluna_id].to_numpy()).get_indexer(ids_atuais)
+    segmentos = np.full(len(atual), -1, dtype=np.int16)
+    segmentos[posicoes >= 0] = retrato['segmento'].to_numpy()[posicoes[posicoes >= 0]]
+    segmentos[ids_atuais.get_indexer(entram[coluna_id].to_numpy())] = labels_delta
+    novo_modelo = {**modelo, 'centros': np.asarray(centros, dtype=np.float64)}
+    referencia = {**estado['referencia'], 'n_alterados': estado['referencia']['n_alterados'] + sum(
+        len(comparacao[chave]) for chave in ('novos', 'alterados', 'removidos'))}
+    novo_estado = {
+        'artefato': novo_modelo,
+        'contagens': contagens,
+        'somas': somas,
+        'somas_quadrados': somas_quadrados,
+        'referencia': referencia,
+        'clientes': atual.assign(segmento=segmentos),
+    }
+    return novo_estado, comparacao
+
+
+def medir_deriva(estado):
+    """
+    Estatísticas de deriva do estado em relação ao último reajuste completo.
+
+    Returns:
+        dict: Um valor por chave de LIMIARES_DERIVA, mais 'deslocamento_por_segmento'.
+    """
+    referencia = estado['referencia']
+    contagens, somas = estado['contagens'], estado['somas']
+    n = max(contagens.sum(), 1)
+    deslocamentos = np.linalg.norm(estado['artefato']['centros'] - referencia['centros'], axis=1)
+    proporcoes = contagens / n
+    inercia = _inercia_media(contagens, somas, estado['somas_quadrados'])
+    return {
+        'fracao_alterada': referencia['n_alterados'] / max(referencia['n_clientes'], 1),
+        'deslocamento_centroides': float(deslocamentos.max()),
+        'deslocamento_medias': float(np.abs(somas.sum(axis=0) / n).max()),
+        'variacao_proporcoes': float(0.5 * np.abs(proporcoes - referencia['proporcoes']).sum()),
+        'variacao_inercia': abs(inercia - referencia['inercia_media']) / max(referencia['inercia_media'], 1e-12),
+        'deslocamento_por_segmento': deslocamentos.tolist(),
+    }
+
+
+def salvar_estado(estado, pasta=PASTA_ESTADO_PADRAO):
+    """
+    Grava o estado na pasta: artefato (.npz, legível por pontuar.py), estatísticas e retrato dos clientes.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    artefato.salvar_artefato(estado['artefato'], os.path.join(pasta, _ARQUIVO_MODELO))
+    referencia = estado['referencia']
+    np.savez(
+        os.path.join(pasta, _ARQUIVO_ESTATISTICAS),
+        contagens=estado['contagens'], somas=estado['somas'], somas_quadrados=estado['somas_quadrados'],
+        centros_referencia=referencia['centros'], proporcoes_referencia=referencia['proporcoes'],
+        referencia=np.array(json.dumps({chave: referencia[chave] for chave in ('inercia_media', 'n_clientes', 'n_alterados')}))
+    )
+    armazenamento.salvar_base(estado['clientes'], os.path.join(pasta, _ARQUIVO_CLIENTES))
+
+
+def carregar_estado(pasta=PASTA_ESTADO_PADRAO):
+    """
+    Carrega o estado gravado por salvar_estado, ou None se a pasta não tiver um.
+    """
+    if not os.path.exists(os.path.join(pasta, _ARQUIVO_ESTATISTICAS)):
+        return None
+    modelo = artefato.carregar_artefato(os.path.join(pasta, _ARQUIVO_MODELO))
+    with np.load(os.path.join(pasta, _ARQUIVO_ESTATISTICAS), allow_pickle=False) as arquivo:
+        referencia = {**json.loads(str(arquivo['referencia'])), 'centros': arquivo['centros_referencia'],
+                      'proporcoes': arquivo['proporcoes_referencia']}
+        estado = {'artefato': modelo, 'contagens': arquivo['contagens'], 'somas': arquivo['somas'],
+                  'somas_quadrados': arquivo['somas_quadrados'], 'referencia': referencia}
+    estado['clientes'] = armazenamento.carregar_base(os.path.join(pasta, _ARQUIVO_CLIENTES))
+    return estado
+
+
+def resegmentar(df_clientes, pasta_estado=PASTA_ESTADO_PADRAO, n_clusters=4, coluna_id='cliente_id',
+                limiares=None, forcar_reajuste=False, modo_kmeans='completo'):
+    """
+    Re-segmentação do dia: incremental quando possível, completa quando a deriva exige.
+
+    Args:
+        df_clientes (pd.DataFrame): Base do dia (com a coluna de identificação).
+        pasta_estado (str): Pasta do estado do último ajuste (criada na primeira execução).
+        n_clusters (int): K usado nos ajustes completos.
+        coluna_id (str): Identificador dos clientes.
+        limiares (dict, opcional): Limiares de deriva (padrão: LIMIARES_DERIVA).
+        forcar_reajuste (bool): Reajusta tudo independentemente da deriva.
+        modo_kmeans (str): Modo do K-Means no reajuste completo ('completo' ou 'minibatch').
+
+    Returns:
+        dict: {'segmentos' (DataFrame id/segmento), 'modo' ('incremental' ou 'completo'),
+               'deriva', 'motivos' (estatísticas acima do limiar), 'comparacao', 'tempo_s'}
+    """
+    inicio = time.perf_counter()
+    limiares = {**LIMIARES_DERIVA, **(limiares or {})}
+    estado = carregar_estado(pasta_estado)
+    comparacao, motivos = None, []
+
+    if estado is None or forcar_reajuste or len(estado['artefato']['centros']) != n_clusters:
+        motivos = ['sem estado anterior'] if estado is None else ['reajuste solicitado']
+        novo_estado = ajuste_completo(df_clientes, n_clusters, coluna_id, estado, modo_kmeans)
+        deriva = medir_deriva(novo_estado)
+        modo = 'completo'
+    else:
+        novo_estado, comparacao = atualizar_incremental(estado, df_clientes, coluna_id)
+        # A deriva reportada é a do modelo atualizado, mesmo quando ela leva ao reajuste
+        deriva = medir_deriva(novo_estado)
+        motivos = [chave for chave, limiar in limiares.items() if deriva[chave] > limiar]
+        modo = 'incremental'
+        if motivos:
+            print(f"Deriva acima do limiar ({', '.join(motivos)}): reajuste completo.")
+            novo_estado = ajuste_completo(df_clientes, n_clusters, coluna_id, novo_estado, modo_kmeans)
+            modo = 'completo'
+
+    salvar_estado(novo_estado, pasta_estado)
+    tempo = time.perf_counter() - inicio
+    if comparacao is not None:
+        print(f"Re-segmentação {modo}: {len(comparacao['novos'])} novos, {len(comparacao['alterados'])} alterados, "
+              f"{len(comparacao['removidos'])} removidos em {tempo:.2f}s.")
+    else:
+        print(f"Re-segmentação {modo} de {len(df_clientes)} clientes em {tempo:.2f}s.")
+    return {'segmentos': novo_estado['clientes'][[coluna_id, 'segmento']], 'modo': modo, 'deriva': deriva,
+            'motivos': motivos, 'comparacao': comparacao, 'tempo_s': tempo}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-segmentação diária incremental com detecção de deriva.")
+    parser.add_argument('--base', required=True, help="Base do dia (Parquet, pasta Parquet, Feather ou CSV).")
+    parser.add_argument('--estado', default=PASTA_ESTADO_PADRAO, help="Pasta do estado do último ajuste.")
+    parser.add_argument('--k', type=int, default=4, help="K dos reajustes completos.")
+    parser.add_argument('--coluna-id', default='cliente_id', help="Coluna de identificação dos clientes.")
+    parser.add_argument('--saida', help="Arquivo com o segmento de cada cliente (.parquet ou .csv).")
+    parser.add_argument('--reajustar', action='store_true', help="Força o reajuste completo.")
+    args = parser.parse_args()
+
+    # iterar_blocos lê Parquet (arquivo ou pasta), Feather e CSV
+    base = pd.concat(armazenamento.iterar_blocos(args.base), ignore_index=True)
+    resultado = resegmentar(base, args.estado, args.k, args.coluna_id, forcar_reajuste=args.reajustar)
+    print("Deriva em relação ao último reajuste completo:")
+    for chave, limiar in LIMIARES_DERIVA.items():
+        print(f"  {chave:<25} {resultado['deriva'][chave]:.4f} (limiar {limiar})")
+    if args.saida:
+        with armazenamento.EscritorEmBlocos(args.saida) as escritor:
+            escritor.escrever(resultado['segmentos'])
+        print(f"Segmentos gravados em '{args.saida}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de segmentação fora da memória (out-of-core), para bases maiores que a RAM.
+
+A base é lida em blocos (armazenamento.iterar_blocos) em três passagens, e a
+memória usada depende do tamanho do bloco, nunca do tamanho do arquivo:
+
+1. Vocabulário e estatísticas: categorias de cada coluna categórica e média/variância
+   de cada coluna numérica (combinadas bloco a bloco pelo método de Chan). As médias
+   e variâncias das colunas One-Hot saem das contagens de categoria (p e p(1 - p)),
+   de modo que o esquema e o scaler ficam prontos ao fim de uma única passagem.
+2. Ajuste incremental: MiniBatchKMeans.partial_fit sobre cada bloco codificado e padronizado.
+3. Rótulos e perfis: cada cliente recebe o centróide mais próximo (gravado bloco a bloco,
+   se houver arquivo de saída), e as somas numéricas e tabelas de contingência por
+   cluster são acumuladas para o perfil no mesmo formato de evaluation.perfilar_clusters.
+
+O resultado inclui o artefato (artefato.py), compatível com pontuar.py.
+
+Uso:
+    python segmentacao_em_blocos.py --entrada base_grande/ --k 4 --saida segmentos.parquet --artefato modelo.npz
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import armazenamento
+import artefato
+import evaluation
+import preprocessing
+
+TAMANHO_BLOCO_PADRAO = 500_000
+TAMANHO_LOTE_PADRAO = 10_000
+
+
+def _valores_categoria(serie):
+    """
+    Contagem de cada categoria de um bloco (chaves como texto, como em extrair_esquema).
+    Colunas 'category' incluem as categorias declaradas, mesmo sem ocorrências.
+    """
+    contagens = serie.value_counts(dropna=True)
+    contagens.index = contagens.index.astype(str)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        contagens = contagens.reindex(serie.cat.categories.astype(str), fill_value=0)
+    return contagens.groupby(level=0).sum()
+
+
+def estatisticas_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Passagem 1: vocabulário das categóricas e média/variância de todas as colunas de modelagem.
+
+    Args:
+        caminho (str): Base de clientes (Parquet, pasta Parquet, Feather ou CSV).
+        tamanho_bloco (int): Linhas por bloco.
+
+    Returns:
+        dict: {'esquema' (como preprocessing.extrair_esquema), 'media', 'variancia',
+               'escala', 'n_linhas'}
+    """
+    numericas = categoricas = None
+    n_linhas = 0
+    contagem_num = media_num = m2_num = None
+    contagens_cat = {}
+
+    for bloco in armazenamento.iterar_blocos(caminho, tamanho_bloco):
+        if numericas is None:
+            # As colunas do primeiro bloco definem os papéis (mesma regra de extrair_esquema)
+            esquema_bloco = preprocessing.extrair_esquema(bloco.head(0))
+            numericas = esquema_bloco['numericas']
+            categoricas = list(esquema_bloco['categoricas'])
+            contagem_num = np.zeros(len(numericas))
+            media_num = np.zeros(len(numericas))
+            m2_num = np.zeros(len(numericas))
+            contagens_cat = {coluna: pd.Series(dtype=np.int64) for coluna in categoricas}
+
+        n_linhas += len(bloco)
+        valores = bloco[numericas].to_numpy(dtype=np.float64)
+        n_b = np.count_nonzero(~np.isnan(valores), axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_b = np.where(n_b > 0, np.nansum(valores, axis=0) / n_b, 0.0)
+        m2_b = np.nansum((valores - media_b) ** 2, axis=0)
+        # Combinação de Chan: numericamente estável para bases de qualquer tamanho
+        total = contagem_num + n_b
+        delta = media_b - media_num
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(total > 0, n_b / total, 0.0)
+        media_num += delta * peso
+        m2_num += m2_b + delta ** 2 * contagem_num * peso
+        contagem_num = total
+
+        for coluna in categoricas:
+            contagens_cat[coluna] = contagens_cat[coluna].add(_valores_categoria(bloco[coluna]), fill_value=0)
+
+    if numericas is None:
+        raise ValueError(f"A base '{caminho}' está vazia.")
+
+    vocabulario = {coluna: sorted(contagens_cat[coluna].index) for coluna in categoricas}
+    colunas_modelo = list(numericas)
+    media, variancia = list(media_num), list(np.where(contagem_num > 0, m2_num / np.maximum(contagem_num, 1), 0.0))
+    for coluna in categoricas:
+        categorias = vocabulario[coluna]
+        colunas_modelo += [f"{coluna}_{categoria}" for categoria in categorias[1:]]
+        # Coluna One-Hot: média p e variância p(1 - p), com p a fração de linhas da categoria
+        p = contagens_cat[coluna].reindex(categorias[1:]).to_numpy(dtype=np.float64) / n_linhas
+        media += list(p)
+        variancia += list(p * (1 - p))
+
+    variancia = np.asarray(variancia)
+    # Mesma regra do StandardScaler: variância nula não reescala a coluna
+    escala = np.where(variancia > 0, np.sqrt(variancia), 1.0)
+    esquema = {'numericas': numericas, 'categoricas': vocabulario, 'colunas_modelo': colunas_modelo}
+    return {'esquema': esquema, 'media': np.asarray(media), 'variancia': variancia,
+            'escala': escala, 'n_linhas': n_linhas}
+
+
+def _colunas_esquema(esquema):
+    return esquema['numericas'] + list(esquema['categoricas'])
+
+
+def ajustar_kmeans_em_blocos(caminho, estatisticas, n_clusters=4, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                             tamanho_lote=TAMANHO_LOTE_PADRAO, n_epocas=1, random_state=42):
+    """
+    Passagem 2: ajuste incremental do K-Means (MiniBatchKMeans.partial_fit) bloco a bloco.
+
+    Cada bloco é codificado e padronizado com o esquema e as estatísticas da passagem 1
+    e enviado em lotes de tamanho_lote linhas, em ordem aleatória dentro do bloco.
+
+    Args:
+        caminho (str): Base de clientes.
+        estatisticas (dict): Resultado de estatisticas_em_blocos.
+        n_clusters (int): Número de clusters.
+        tamanho_bloco (int): Linhas lidas por bloco.
+        tamanho_lote (int): Linhas por chamada de partial_fit.
+        n_epocas (int): Passagens sobre o arquivo.
+        random_state (int): Semente.
+
+    Returns:
+        np.ndarray: Centróides no espaço padronizado (n_clusters x p).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    modelo = MiniBatchKMeans(n_clusters=n_clusters, init='k-means++', random_state=random_state,
+                             batch_size=tamanho_lote)
+    rng = np.random.default_rng(random_state)
+    colunas = _colunas_esquema(estatisticas['esquema'])
+    pendente = None
+    for _ in range(n_epocas):
+        for bloco in armazenamento.iterar_blocos(caminho, tamanho_bloco, colunas=colunas):
+            X = artefato.transformar(estatisticas, bloco)
+            iniciado = hasattr(modelo, 'cluster_centers_')
+            # O primeiro partial_fit inicializa os centróides e precisa de pelo menos K linhas
+            if not iniciado:
+                if pendente is not None:
+                    X = np.vstack([pendente, X])
+                if len(X) < n_clusters:
+                    pendente = X
+                    continue
+                pendente = None
+            for inicio in rng.permutation(np.arange(0, len(X), tamanho_lote)):
+                lote = X[inicio:inicio + tamanho_lote]
+                if hasattr(modelo, 'cluster_centers_') or len(lote) >= n_clusters:
+                    modelo.partial_fit(lote)
+    if not hasattr(modelo, 'cluster_centers_'):
+        raise ValueError(f"A base tem menos linhas que o número de clusters ({n_clusters}).")
+    return modelo.cluster_centers_
+
+
+def rotular_e_perfilar_em_blocos(caminho, modelo, tamanho_bloco=TAMANHO_BLOCO_PADRAO, caminho_saida=None,
+                                 coluna_id='cliente_id'):
+    """
+    Passagem 3: atribui o segmento de cada cliente e acumula os perfis por cluster.
+
+    Args:
+        caminho (str): Base de clientes.
+        modelo (dict): Artefato (artefato.montar_artefato) com esquema, estatísticas e centróides.
+        tamanho_bloco (int): Linhas por bloco.
+        caminho_saida (str, opcional): Arquivo (.parquet ou .csv) onde gravar os segmentos.
+        coluna_id (str): Coluna de identificação copiada para a saída (se existir).
+
+    Returns:
+        dict: {'n_clientes', 'numerico', 'modas', 'categorico'} (mesmo formato de
+              evaluation.perfilar_clusters) e 'inercia' (WCSS sobre a base inteira).
+    """
+    esquema = modelo['esquema']
+    numericas, categoricas = esquema['numericas'], esquema['categoricas']
+    k = len(modelo['centros'])
+    colunas = _colunas_esquema(esquema)
+    if caminho_saida is not None and coluna_id in armazenamento.listar_colunas(caminho):
+        colunas = [coluna_id] + colunas
+
+    n_clientes = np.zeros(k, dtype=np.int64)
+    somas = np.zeros((k, len(numericas)))
+    presentes = np.zeros((k, len(numericas)), dtype=np.int64)
+    tabelas = {coluna: np.zeros((k, len(categorias)), dtype=np.int64) for coluna, categorias in categoricas.items()}
+    inercia = 0.0
+
+    escritor = armazenamento.EscritorEmBlocos(caminho_saida) if caminho_saida is not None else None
+    try:
+        for bloco in armazenamento.iterar_blocos(caminho, tamanho_bloco, colunas=colunas):
+            labels, distancias = artefato.atribuir_segmentos(modelo, bloco)
+            inercia += float(np.dot(distancias, distancias))
+            n_clientes += np.bincount(labels, minlength=k)
+
+            valores = bloco[numericas].to_numpy(dtype=np.float64)
+            validos = ~np.isnan(valores)
+            for j in range(len(numericas)):
+                somas[:, j] += np.bincount(labels[validos[:, j]], weights=valores[validos[:, j], j], minlength=k)
+                presentes[:, j] += np.bincount(labels[validos[:, j]], minlength=k)
+
+            for coluna, categorias in categoricas.items():
+                codigos = preprocessing._codigos_categoria(bloco[coluna], categorias)
+                ok = codigos >= 0
+                m = len(categorias)
+                tabelas[coluna] += np.bincount(labels[ok].astype(np.int64) * m + codigos[ok],
+                                               minlength=k * m).reshape(k, m)
+
+            if escritor is not None:
+                saida = pd.DataFrame({'segmento': labels})
+                if coluna_id in bloco.columns:
+                    saida.insert(0, coluna_id, bloco[coluna_id].to_numpy())
+                escritor.escrever(saida)
+    finally:
+        if escritor is not None:
+            escritor.fechar()
+
+    # Clusters sem nenhum cliente ficam fora do perfil, como em perfilar_clusters
+    ocupados = np.flatnonzero(n_clientes)
+    indice = pd.Index(ocupados, name='cluster')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        numerico = pd.DataFrame(somas[ocupados] / presentes[ocupados], index=indice, columns=numericas)
+    categorico, modas = {}, {}
+    for coluna, categorias in categoricas.items():
+        categorico[coluna], modas[coluna] = evaluation.resumir_contingencia(
+            tabelas[coluna][ocupados], indice, categorias, coluna
+        )
+    return {
+        'n_clientes': pd.Series(n_clientes[ocupados], index=indice, name='n_clientes'),
+        'numerico': numerico,
+        'modas': pd.DataFrame(modas, index=indice),
+        'categorico': categorico,
+        'inercia': inercia
+    }
+
+
+def segmentar_em_blocos(caminho_entrada, n_clusters=4, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                        tamanho_lote=TAMANHO_LOTE_PADRAO, n_epocas=1, random_state=42, caminho_saida=None,
+                        caminho_artefato=None, coluna_id='cliente_id'):
+    """
+    Executa as três passagens e devolve o artefato e os perfis dos segmentos.
+
+    Args:
+        caminho_entrada (str): Base de clientes (Parquet, pasta Parquet, Feather ou CSV).
+        n_clusters (int): Número de clusters do K-Means.
+        tamanho_bloco (int): Linhas por bloco lido.
+        tamanho_lote (int): Linhas por partial_fit.
+        n_epocas (int): Passagens de ajuste sobre o arquivo.
+        random_state (int): Semente.
+        caminho_saida (str, opcional): Arquivo onde gravar o segmento de cada cliente.
+        caminho_artefato (str, opcional): Arquivo .npz onde salvar o artefato.
+        coluna_id (str): Coluna de identificação copiada para a saída.
+
+    Returns:
+        dict: {'artefato', 'perfil' (formato de evaluation.perfilar_clusters), 'perfil_numerico' e
+               'perfil_categorico' (formatos de analisar_perfis_clusters/categoricos), 'inercia', 'n_linhas'}
+    """
+    inicio = time.perf_counter()
+    print(f"Passagem 1/3: vocabulário e estatísticas de '{caminho_entrada}'...")
+    estatisticas = estatisticas_em_blocos(caminho_entrada, tamanho_bloco)
+    print(f"  {estatisticas['n_linhas']} clientes, {len(estatisticas['esquema']['colunas_modelo'])} colunas de modelagem.")
+
+    print(f"Passagem 2/3: ajuste incremental do K-Means com {n_clusters} clusters...")
+    centros = ajustar_kmeans_em_blocos(caminho_entrada, estatisticas, n_clusters, tamanho_bloco, tamanho_lote,
+                                       n_epocas, random_state)
+    modelo = artefato.montar_artefato(estatisticas['esquema'], preprocessing.montar_scaler(estatisticas), centros)
+    if caminho_artefato is not None:
+        artefato.salvar_artefato(modelo, caminho_artefato)
+
+    print("Passagem 3/3: rótulos e perfis dos segmentos...")
+    perfil = rotular_e_perfilar_em_blocos(caminho_entrada, modelo, tamanho_bloco, caminho_saida, coluna_id)
+    inercia = perfil.pop('inercia')
+
+    perfil_numerico = perfil['numerico'].assign(n_clientes=perfil['n_clientes'])
+    perfil_numerico.index.name = 'cluster_K-Means'
+    perfil_categorico = perfil['modas'].assign(n_clientes=perfil['n_clientes'])
+    perfil_categorico.index = [f"cluster_K-Means_{i}" for i in perfil_categorico.index]
+
+    print(f"Segmentação em blocos concluída em {time.perf_counter() - inicio:.1f}s (inércia = {inercia:.1f}).")
+    return {
+        'artefato': modelo,
+        'perfil': perfil,
+        'perfil_numerico': perfil_numerico,
+        'perfil_categorico': perfil_categorico,
+        'inercia': inercia,
+        'n_linhas': estatisticas['n_linhas']
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Segmentação de clientes fora da memória, em blocos.")
+    parser.add_argument('--entrada', required=True, help="Base de clientes (.parquet, pasta, .feather ou .csv).")
+    parser.add_argument('--k', type=int, default=4, help="Número de clusters.")
+    parser.add_argument('--saida', default=None, help="Arquivo de segmentos (.parquet ou .csv).")
+    parser.add_argument('--artefato', default=None, help="Arquivo .npz do artefato (para pontuar.py).")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO_PADRAO)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO)
+    parser.add_argument('--n-epocas', type=int, default=1)
+    parser.add_argument('--coluna-id', default='cliente_id')
+    args = parser.parse_args()
+
+    resultado = segmentar_em_blocos(args.entrada, args.k, args.tamanho_bloco, args.tamanho_lote, args.n_epocas,
+                                    caminho_saida=args.saida, caminho_artefato=args.artefato,
+                                    coluna_id=args.coluna_id)
+    print("\nPerfil numérico dos segmentos:")
+    print(resultado['perfil_numerico'].to_string())
+    print("\nPerfil categórico dos segmentos:")
+    print(resultado['perfil_categorico'].to_string())
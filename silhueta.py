@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from scipy import sparse, stats
+from sklearn.metrics.pairwise import euclidean_distances
+
+# Acima deste número de linhas o modo 'auto' usa a estimativa amostral
+MAX_LINHAS_EXATO = 50_000
+# Memória máxima (em MB) para cada bloco da matriz de distâncias
+MEMORIA_MAX_MB = 256
+
+
+def _tamanho_bloco(n_linhas, memoria_max_mb):
+    """
+    Número de linhas por bloco para que a matriz de distâncias (bloco x n) e
+    os temporários do cálculo caibam no orçamento de memória.
+    """
+    bytes_por_linha = n_linhas * 8 * 3
+    return max(1, int(memoria_max_mb * 2**20 // bytes_por_linha))
+
+
+def _silhuetas_pontos(X, labels, indices, memoria_max_mb=MEMORIA_MAX_MB):
+    """
+    Calcula a silhueta individual dos pontos em 'indices' contra a base inteira.
+
+    As distâncias são calculadas em blocos de linhas; para cada bloco, as somas
+    de distâncias por cluster são obtidas com um único produto por uma matriz
+    esparsa de pertinência (n x K), sem laços em Python por cluster.
+
+    Args:
+        X (np.ndarray): Matriz de dados (n x d).
+        labels (np.ndarray): Códigos de cluster 0..K-1 de cada linha.
+        indices (np.ndarray): Linhas cuja silhueta será calculada.
+        memoria_max_mb (float): Orçamento de memória por bloco.
+
+    Returns:
+        np.ndarray: Silhueta de cada ponto de 'indices'.
+    """
+    n = X.shape[0]
+    n_clusters = labels.max() + 1
+    contagens = np.bincount(labels, minlength=n_clusters).astype(float)
+    pertinencia = sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, n_clusters))
+
+    bloco = _tamanho_bloco(n, memoria_max_mb)
+    resultado = np.empty(len(indices))
+    for inicio in range(0, len(indices), bloco):
+        linhas = indices[inicio:inicio + bloco]
+        distancias = euclidean_distances(X[linhas], X)
+        somas = np.asarray(pertinencia.T.dot(distancias.T).T)
+        proprio = labels[linhas]
+        posicoes = np.arange(len(linhas))
+
+        # a(i): distância média aos demais pontos do próprio cluster
+        tamanho_proprio = contagens[proprio]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = somas[posicoes, proprio] / (tamanho_proprio - 1)
+            medias = somas / contagens
+        # b(i): menor distância média a um outro cluster
+        medias[posicoes, proprio] = np.inf
+        b = medias.min(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        # Pontos em clusters unitários têm silhueta 0 (mesma convenção do scikit-learn)
+        s[tamanho_proprio <= 1] = 0.0
+        resultado[inicio:inicio + len(linhas)] = np.nan_to_num(s)
+    return resultado
+
+
+def _preparar(dados, labels):
+    """
+    Converte os dados para ndarray (float32 é preservado) e os rótulos para códigos 0..K-1.
+    """
+    X = np.asarray(dados)
+    if X.dtype != np.float32:
+        X = X.astype(np.float64, copy=False)
+    _, codigos = np.unique(np.asarray(labels), return_inverse=True)
+    return X, codigos.ravel()
+
+
+def silhueta_exata(dados, labels, memoria_max_mb=MEMORIA_MAX_MB):
+    """
+    Coeficiente de silhueta exato, calculado em blocos com memória limitada.
+
+    Equivale a sklearn.metrics.silhouette_score, mas nunca aloca mais que
+    memoria_max_mb por bloco da matriz de distâncias.
+
+    Returns:
+        dict: {'silhueta', 'ic_inferior', 'ic_superior', 'modo', 'n_pontos'}
+    """
+    X, codigos = _preparar(dados, labels)
+    valor = float(_silhuetas_pontos(X, codigos, np.arange(X.shape[0]), memoria_max_mb).mean())
+    return {'silhueta': valor, 'ic_inferior': valor, 'ic_superior': valor, 'modo': 'exato', 'n_pontos': X.shape[0]}
+
+
+def silhueta_amostrada(dados, labels, tamanho_amostra=5000, estratificada=True,
+                       nivel_confianca=0.95, memoria_max_mb=MEMORIA_MAX_MB, random_state=42):
+    """
+    Estima o coeficiente de silhueta da base inteira a partir de uma amostra de pontos.
+
+    A silhueta de cada ponto amostrado é calculada contra todos os pontos da base
+    (e não apenas contra a amostra), de forma que a média é um estimador não
+    viesado da silhueta completa. Com estratificação por cluster, a alocação é
+    proporcional ao tamanho de cada cluster (no mínimo 2 pontos por cluster) e o
+    intervalo de confiança usa a variância estratificada.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        labels (array-like): Rótulos dos clusters.
+        tamanho_amostra (int): Número de pontos amostrados.
+        estratificada (bool): Amostra estratificada por cluster.
+        nivel_confianca (float): Nível do intervalo de confiança.
+        memoria_max_mb (float): Orçamento de memória por bloco.
+        random_state (int): Semente da amostragem.
+
+    Returns:
+        dict: {'silhueta', 'ic_inferior', 'ic_superior', 'modo', 'n_pontos'}
+    """
+    X, codigos = _preparar(dados, labels)
+    n = X.shape[0]
+    if tamanho_amostra >= n:
+        return silhueta_exata(X, codigos, memoria_max_mb)
+
+    rng = np.random.default_rng(random_state)
+    contagens = np.bincount(codigos)
+    pesos = contagens / n
+
+    if estratificada:
+        alocacao = np.minimum(contagens, np.maximum(2, np.round(pesos * tamanho_amostra).astype(int)))
+        ordem = np.argsort(codigos, kind='stable')
+        inicios = np.concatenate(([0], np.cumsum(contagens)[:-1]))
+        estratos = [
+            ordem[inicio + rng.choice(tamanho, size=m, replace=False)]
+            for inicio, tamanho, m in zip(inicios, contagens, alocacao)
+        ]
+    else:
+        estratos = [rng.choice(n, size=tamanho_amostra, replace=False)]
+        pesos = np.array([1.0])
+        contagens = np.array([n])
+
+    indices = np.concatenate(estratos)
+    valores = _silhuetas_pontos(X, codigos, indices, memoria_max_mb)
+
+    # Estimativa e variância estratificadas (com correção de população finita)
+    estimativa, variancia, posicao = 0.0, 0.0, 0
+    for peso, tamanho, amostra in zip(pesos, contagens, estratos):
+        m = len(amostra)
+        s = valores[posicao:posicao + m]
+        posicao += m
+        estimativa += peso * s.mean()
+        if m > 1:
+            variancia += peso**2 * s.var(ddof=1) / m * (1 - m / tamanho)
+
+    margem = stats.norm.ppf(0.5 + nivel_confianca / 2) * np.sqrt(variancia)
+    return {
+        'silhueta': float(estimativa),
+        'ic_inferior': float(estimativa - margem),
+        'ic_superior': float(estimativa + margem),
+        'modo': 'amostrado',
+        'n_pontos': len(indices)
+    }
+
+
+def calcular_silhueta(dados, labels, modo='auto', max_linhas_exato=MAX_LINHAS_EXATO,
+                      memoria_max_mb=MEMORIA_MAX_MB, tamanho_amostra=5000, nivel_confianca=0.95):
+    """
+    Calcula a silhueta escolhendo entre o modo exato e o amostrado.
+
+    Args:
+        dados (pd.DataFrame ou np.ndarray): Dados padronizados.
+        labels (array-like): Rótulos dos clusters.
+        modo (str): 'exato', 'amostrado' ou 'auto' (exato até max_linhas_exato linhas).
+        max_linhas_exato (int): Orçamento de linhas para o modo exato no modo 'auto'.
+        memoria_max_mb (float): Orçamento de memória por bloco de distâncias.
+        tamanho_amostra (int): Pontos amostrados no modo amostrado.
+        nivel_confianca (float): Nível do intervalo de confiança no modo amostrado.
+
+    Returns:
+        dict: {'silhueta', 'ic_inferior', 'ic_superior', 'modo', 'n_pontos'}
+    """
+    if modo not in ('auto', 'exato', 'amostrado'):
+        raise ValueError(f"Modo de silhueta '{modo}' inválido. Use 'auto', 'exato' ou 'amostrado'.")
+    if modo == 'auto':
+        modo = 'exato' if len(dados) <= max_linhas_exato else 'amostrado'
+
+    if modo == 'exato':
+        return silhueta_exata(dados, labels, memoria_max_mb)
+    return silhueta_amostrada(dados, labels, tamanho_amostra, nivel_confianca=nivel_confianca,
+                              memoria_max_mb=memoria_max_mb)
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+import os
+
+# Figuras sempre sem interface gráfica nos testes
+os.environ.setdefault('MPLBACKEND', 'Agg')
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import armazenamento
+
+
+def _base():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'cliente_id': np.arange(1_000),
+        'renda_mensal': rng.gamma(2.0, 2_000.0, 1_000),
+        'sexo': rng.choice(['F', 'M'], 1_000),
+    })
+
+
+@pytest.mark.parametrize('extensao', ['.parquet', '.feather'])
+def test_base_colunar_volta_igual_com_texto_como_category(tmp_path, extensao):
+    df = _base()
+    caminho = str(tmp_path / f'clientes{extensao}')
+    armazenamento.salvar_base(df, caminho)
+
+    lida = armazenamento.carregar_base(caminho)
+    assert isinstance(lida['sexo'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(lida, df, check_dtype=False, check_categorical=False)
+    # Projeção de colunas e leitura em blocos
+    assert armazenamento.listar_colunas(caminho) == list(df.columns)
+    assert list(armazenamento.carregar_base(caminho, colunas=['renda_mensal']).columns) == ['renda_mensal']
+    blocos = list(armazenamento.iterar_blocos(caminho, tamanho_bloco=300))
+    assert max(len(bloco) for bloco in blocos) <= 300
+    pd.testing.assert_frame_equal(pd.concat(blocos, ignore_index=True), lida)
+
+
+def test_escritor_em_blocos_grava_parquet_e_csv(tmp_path):
+    df = _base()
+    for nome in ('saida.parquet', 'saida.csv'):
+        caminho = str(tmp_path / nome)
+        with armazenamento.EscritorEmBlocos(caminho) as escritor:
+            for inicio in range(0, len(df), 400):
+                escritor.escrever(df.iloc[inicio:inicio + 400])
+        lida = pd.concat(armazenamento.iterar_blocos(caminho, tamanho_bloco=250), ignore_index=True)
+        pd.testing.assert_frame_equal(lida, df, check_dtype=False)
+
+
+def test_excel_nao_e_formato_de_trabalho(tmp_path):
+    with pytest.raises(ValueError, match='Excel'):
+        armazenamento.salvar_base(_base(), str(tmp_path / 'clientes.xlsx'))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_blobs
+
+import artefato
+import densidade
+
+
+def _artefato_densidade(X, labels, indices_nucleo, eps, min_samples=10):
+    p = X.shape[1]
+    esquema = {'numericas': [f'x{i}' for i in range(p)], 'categoricas': {}, 'colunas_modelo': [f'x{i}' for i in range(p)]}
+    scaler = SimpleNamespace(mean_=np.zeros(p), scale_=np.ones(p))
+    return artefato.montar_artefato_densidade(esquema, scaler, X, labels, indices_nucleo, eps, min_samples)
+
+
+@pytest.mark.parametrize('n_dimensoes, indice', [(5, 'arvore_kd'), (21, 'bruta')])
+def test_densidade_reproduz_os_rotulos_do_dbscan(tmp_path, n_dimensoes, indice):
+    X, _ = make_blobs(n_samples=4_000, n_features=n_dimensoes, centers=4, cluster_std=1.0, random_state=0)
+    X = np.vstack([X, np.random.default_rng(0).uniform(-30, 30, size=(200, n_dimensoes))])
+    eps = 2.0 if n_dimensoes == 5 else 5.0
+    labels, resumo = densidade.dbscan_indexado(X, eps=eps, min_samples=10)
+    assert resumo['n_ruido'] > 0
+
+    caminho = str(tmp_path / 'modelo_dbscan.npz')
+    artefato.salvar_artefato(_artefato_densidade(X, labels, resumo['indices_nucleo'], eps), caminho)
+    modelo = artefato.carregar_artefato(caminho)
+    assert modelo['indice'] == indice
+    # A árvore é persistida ao lado do .npz e reaproveitada na carga
+    assert os.path.exists(artefato.caminho_indice(caminho)) == (indice == 'arvore_kd')
+    assert ('arvore' in modelo) == (indice == 'arvore_kd')
+
+    atribuidos, distancias = artefato.atribuir_por_densidade(modelo, X)
+    np.testing.assert_array_equal(atribuidos, labels)
+    assert np.all(distancias[labels >= 0] <= eps)
+    assert np.all(np.isinf(distancias[labels == -1]))
+
+
+def test_densidade_consulta_abaixo_de_um_milissegundo():
+    rng = np.random.default_rng(0)
+    nucleos = rng.normal(size=(50_000, 21))
+    modelo = _artefato_densidade(nucleos, np.zeros(len(nucleos), dtype=int), np.arange(len(nucleos)), eps=2.5)
+    assert modelo['indice'] == 'bruta'
+    consultas = rng.normal(size=(2_000, 21))
+    artefato.atribuir_por_densidade(modelo, consultas[:10])
+    inicio = time.perf_counter()
+    artefato.atribuir_por_densidade(modelo, consultas)
+    assert (time.perf_counter() - inicio) / len(consultas) < 1e-3
+
+
+def test_artefato_kmeans_reproduz_o_treino_e_pontua_em_blocos(tmp_path):
+    import subprocess
+    import sys
+
+    import pandas as pd
+
+    import armazenamento
+    import data_generator
+    import pontuar
+
+    df = data_generator.gerar_dados_sinteticos(n_clientes=4_000, seed=11)
+    modelo, labels = artefato.ajustar_artefato(df, n_clusters=4)
+    caminho = str(tmp_path / 'modelo_segmentacao.npz')
+    artefato.salvar_artefato(modelo, caminho)
+    carregado = artefato.carregar_artefato(caminho)
+    assert carregado['esquema'] == modelo['esquema']
+    np.testing.assert_array_equal(carregado['centros'], modelo['centros'])
+
+    # Sem reajuste, os clientes de treino caem nos mesmos segmentos (mesmo com colunas em outra ordem)
+    atribuidos, _ = artefato.atribuir_segmentos(carregado, df[df.columns[::-1]])
+    np.testing.assert_array_equal(atribuidos, labels)
+
+    entrada = tmp_path / 'novos.parquet'
+    armazenamento.salvar_base(df, str(entrada))
+    for saida, comando in [(tmp_path / 'segmentos.parquet', False), (tmp_path / 'segmentos.csv', True)]:
+        if comando:
+            subprocess.run([sys.executable, pontuar.__file__, '--artefato', caminho, '--entrada', str(entrada),
+                            '--saida', str(saida), '--tamanho-bloco', '700', '--incluir-distancia'],
+                           check=True, capture_output=True)
+        else:
+            assert pontuar.pontuar_arquivo(caminho, str(entrada), str(saida), tamanho_bloco=700,
+                                           incluir_distancia=True) == len(df)
+        segmentos = pd.concat(armazenamento.iterar_blocos(str(saida)), ignore_index=True)
+        assert list(segmentos.columns) == ['cliente_id', 'segmento', 'distancia_centroide']
+        assert segmentos['cliente_id'].tolist() == df['cliente_id'].tolist()
+        np.testing.assert_array_equal(segmentos['segmento'].to_numpy(), labels)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks import bench_pipeline
+
+
+def _execucao(tempos, picos):
+    return {'metadados': {}, 'resultados': [
+        {'etapa': etapa, 'n_linhas': 1_000, 'tempo_s': tempo, 'pico_mb': pico}
+        for (etapa, tempo), pico in zip(tempos.items(), picos)
+    ]}
+
+
+def test_comparacao_marca_so_pioras_acima_do_limite_e_do_piso(tmp_path):
+    base = _execucao({'lenta': 1.0, 'rapida': 0.01, 'memoria': 1.0, 'estavel': 1.0}, [10.0, 1.0, 10.0, 10.0])
+    atual = _execucao({'lenta': 1.5, 'rapida': 0.03, 'memoria': 1.0, 'estavel': 1.1}, [10.0, 1.0, 20.0, None])
+    tabela = bench_pipeline.comparar(base, atual, limite_pct=20)
+    regressoes = tabela['regressao'].xs(1_000, level='n_linhas')
+    # 'rapida' triplica, mas abaixo do piso de tempo; 'estavel' fica dentro do limite e sem pico medido
+    assert regressoes.to_dict() == {'lenta': True, 'rapida': False, 'memoria': True, 'estavel': False}
+
+    caminhos = []
+    for nome, execucao in [('base.json', base), ('atual.json', atual)]:
+        caminhos.append(str(tmp_path / nome))
+        bench_pipeline.salvar_resultados(execucao, caminhos[-1])
+    assert bench_pipeline.carregar_resultados(caminhos[0]) == base
+    processo = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pipeline', '--comparar', *caminhos],
+                              cwd=bench_pipeline.RAIZ, capture_output=True, text=True)
+    assert processo.returncode == 1
+    processo = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pipeline', '--comparar', caminhos[0], caminhos[0]],
+                              cwd=bench_pipeline.RAIZ, capture_output=True, text=True)
+    assert processo.returncode == 0
+
+
+def test_execucao_mede_so_as_etapas_pedidas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    resultado = bench_pipeline.executar([1_500], etapas=['projetar_pca'])
+    assert [linha['etapa'] for linha in resultado['resultados']] == ['projetar_pca']
+    linha = resultado['resultados'][0]
+    assert linha['n_linhas'] == 1_500 and linha['tempo_s'] > 0 and np.isfinite(linha['pico_mb'])
+    assert resultado['metadados']['repeticoes'] == 1
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+
+import cache_etapas
+import matriz_mapeada
+
+
+def test_matriz_maior_que_o_limite_nao_e_removida(tmp_path):
+    cache = cache_etapas.CacheEtapas(pasta=str(tmp_path), tamanho_max_mb=0.01)
+    dados = np.random.default_rng(0).normal(size=(2_000, 4))
+    (df, _), chave = cache.etapa_matriz('padronizacao', lambda: (dados, {}), ['base'])
+    caminho = os.path.join(str(tmp_path), chave + matriz_mapeada.EXTENSAO_MATRIZ)
+    assert matriz_mapeada.existe_matriz(caminho)
+    np.testing.assert_array_equal(df.to_numpy(), dados)
+
+    # Outra instância (próxima execução) reabre a matriz e remove só as entradas antigas
+    cache.etapa('antiga', lambda: np.zeros(10_000), ['x'])
+    nova = cache_etapas.CacheEtapas(pasta=str(tmp_path), tamanho_max_mb=0.01)
+    (df, _), _ = nova.etapa_matriz('padronizacao', lambda: (None, {}), ['base'])
+    np.testing.assert_array_equal(df.to_numpy(), dados)
+    assert nova.limpar() >= 1
+    assert matriz_mapeada.existe_matriz(caminho)
+
+
+def test_entrada_recem_gravada_nao_e_removida(tmp_path):
+    cache = cache_etapas.CacheEtapas(pasta=str(tmp_path), tamanho_max_mb=0.01)
+    _, antiga = cache.etapa('antiga', lambda: np.zeros(10_000), ['x'])
+    _, nova = cache.etapa('nova', lambda: np.ones(10_000), ['x'])
+    arquivos = os.listdir(str(tmp_path))
+    assert nova + '.pkl' in arquivos
+    assert antiga + '.pkl' not in arquivos
+
+
+def test_hash_de_matriz_nao_depende_do_layout_nem_muda_as_chaves():
+    import hashlib
+    dados = np.random.default_rng(1).normal(size=(500, 6))
+    # Fatias e transpostas (não contíguas) têm o mesmo hash da cópia contígua
+    assert cache_etapas.hash_conteudo(dados.T) == cache_etapas.hash_conteudo(np.ascontiguousarray(dados.T))
+    assert cache_etapas.hash_conteudo(dados[:, ::2]) == cache_etapas.hash_conteudo(dados[:, ::2].copy())
+    # Mesmos bytes que tobytes(): as chaves já gravadas em disco continuam válidas
+    for matriz in [dados, np.zeros((0, 3)), np.arange(7, dtype=np.int8)]:
+        referencia = hashlib.blake2b(digest_size=16)
+        referencia.update(f"{matriz.dtype.str}{matriz.shape}".encode())
+        referencia.update(matriz.tobytes())
+        assert cache_etapas.hash_conteudo(matriz) == referencia.hexdigest()
+
+
+def test_etapa_reaproveita_e_invalida_por_dados_parametros_e_codigo(tmp_path):
+    import importlib.util
+
+    fonte = tmp_path / 'modulo_etapa.py'
+    fonte.write_text("VALOR = 1\n")
+    especificacao = importlib.util.spec_from_file_location('modulo_etapa', fonte)
+    modulo = importlib.util.module_from_spec(especificacao)
+    especificacao.loader.exec_module(modulo)
+
+    cache = cache_etapas.CacheEtapas(pasta=str(tmp_path / 'cache'))
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return np.arange(5)
+
+    def rodar(dependencias=('base',), parametros=None):
+        return cache.etapa('etapa', calcular, list(dependencias), parametros, [modulo])
+
+    resultado, chave = rodar()
+    np.testing.assert_array_equal(resultado, np.arange(5))
+    assert rodar()[1] == chave
+    assert len(chamadas) == 1
+    # Outra instância (próxima execução) também reaproveita
+    outra = cache_etapas.CacheEtapas(pasta=str(tmp_path / 'cache'))
+    assert outra.etapa('etapa', calcular, ['base'], None, [modulo])[1] == chave
+    assert len(chamadas) == 1
+
+    rodar(dependencias=('outra base',))
+    rodar(parametros={'k': 4})
+    fonte.write_text("VALOR = 2\n")
+    assert rodar()[1] != chave
+    assert len(chamadas) == 4
+
+    # Arquivo corrompido: recalcula em vez de falhar
+    with open(os.path.join(str(tmp_path / 'cache'), chave + '.pkl'), 'wb') as arquivo:
+        arquivo.write(b'incompleto')
+    fonte.write_text("VALOR = 1\n")
+    np.testing.assert_array_equal(rodar()[0], np.arange(5))
+    assert len(chamadas) == 5
+
+
+def test_etapas_em_lote_calculam_so_os_itens_ausentes(tmp_path):
+    cache = cache_etapas.CacheEtapas(pasta=str(tmp_path))
+    pedidos = []
+
+    def calcular(pendentes):
+        pedidos.append(sorted(pendentes))
+        return {item: item * 10 for item in pendentes}
+
+    itens = {item: (['base'], {'item': item}) for item in (1, 2)}
+    cache.etapas_em_lote('lote', calcular, itens)
+    itens[3] = (['base'], {'item': 3})
+    resultado = cache.etapas_em_lote('lote', calcular, itens)
+    assert pedidos == [[1, 2], [3]]
+    assert [valor for valor, _ in resultado.values()] == [10, 20, 30]
+
+
+def test_cache_inativo_recalcula_e_nao_grava(tmp_path):
+    pasta = tmp_path / 'cache'
+    cache = cache_etapas.CacheEtapas(pasta=str(pasta), ativo=False)
+    chamadas = []
+    for _ in range(2):
+        cache.etapa('etapa', lambda: chamadas.append(1), ['base'])
+    assert len(chamadas) == 2
+    assert not pasta.exists()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import clustering_models
+
+
+@pytest.mark.parametrize('semente', [1, 3, 5])
+def test_minibatch_com_bloco_final_menor_que_k(semente):
+    # 20003 % 10000 = 3 linhas no último bloco, menos que K=4
+    X = np.random.default_rng(0).normal(size=(20_003, 5))
+    ajuste = clustering_models.ajustar_kmeans(X, 4, modo='minibatch', random_state=semente, n_init=1)
+    assert ajuste['centros'].shape == (4, 5)
+    assert len(ajuste['labels']) == len(X)
+
+
+def test_minibatch_sem_dois_blocos_completos_usa_fit_unico():
+    X = np.random.default_rng(0).normal(size=(700, 3))
+    ajuste = clustering_models.ajustar_kmeans(X, 500, modo='minibatch', n_init=1, n_epocas=1)
+    assert ajuste['centros'].shape == (500, 3)
+
+
+def test_varredura_de_k_em_paralelo_confere_com_a_serial():
+    from sklearn.datasets import make_blobs
+
+    X, _ = make_blobs(n_samples=3_000, centers=4, n_features=5, random_state=0)
+    serial = clustering_models.encontrar_k_otimo(X, max_k=6, n_jobs=1)
+    progresso = []
+    paralela = clustering_models.encontrar_k_otimo(X, max_k=6, n_jobs=2, callback=lambda r: progresso.append(r['k']))
+    assert sorted(progresso) == [2, 3, 4, 5, 6]
+    assert paralela['range_k'] == serial['range_k'] == [2, 3, 4, 5, 6]
+    np.testing.assert_allclose(paralela['inercias'], serial['inercias'], rtol=1e-9)
+    np.testing.assert_allclose(paralela['scores_silhueta'], serial['scores_silhueta'], rtol=1e-9)
+
+    # Com as inicializações distribuídas, as sementes mudam: mesma qualidade de ajuste
+    por_inicializacao = clustering_models.encontrar_k_otimo(X, max_k=6, n_jobs=2, paralelizar_n_init=True)
+    np.testing.assert_allclose(por_inicializacao['inercias'], serial['inercias'], rtol=1e-2)
+    assert int(np.argmax(por_inicializacao['scores_silhueta'])) == int(np.argmax(serial['scores_silhueta'])) == 2
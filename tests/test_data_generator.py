@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+import armazenamento
+import data_generator
+
+
+def test_geracao_determinista_e_independente_do_paralelismo(tmp_path):
+    df = data_generator.gerar_dados_sinteticos(n_clientes=5_000, seed=3, tamanho_bloco=1_200)
+    assert len(df) == 5_000
+    assert df['cliente_id'].is_unique
+    pd.testing.assert_frame_equal(df, data_generator.gerar_dados_sinteticos(n_clientes=5_000, seed=3,
+                                                                            tamanho_bloco=1_200))
+    assert not df.equals(data_generator.gerar_dados_sinteticos(n_clientes=5_000, seed=4, tamanho_bloco=1_200))
+
+    # A base em blocos (1 ou 2 processos) é a mesma da geração em memória
+    for n_workers, pasta in [(1, 'serial'), (2, 'paralela')]:
+        caminhos = data_generator.gerar_base_em_blocos(str(tmp_path / pasta), n_clientes=5_000, seed=3,
+                                                       tamanho_bloco=1_200, n_workers=n_workers)
+        assert len(caminhos) == 5
+        lida = armazenamento.carregar_base(str(tmp_path / pasta))
+        pd.testing.assert_frame_equal(lida, df, check_dtype=False, check_categorical=False)
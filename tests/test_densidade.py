@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+import densidade
+
+
+@pytest.fixture(scope='module')
+def blobs():
+    X, _ = make_blobs(n_samples=1_500, centers=4, n_features=3, cluster_std=0.6, random_state=0)
+    ruido = np.random.default_rng(0).uniform(X.min(), X.max(), size=(60, 3))
+    return np.vstack([X, ruido])
+
+
+@pytest.mark.parametrize('algoritmo', ['kd_tree', 'ball_tree', 'brute'])
+def test_dbscan_indexado_igual_ao_sklearn(blobs, algoritmo):
+    referencia = DBSCAN(eps=0.5, min_samples=10).fit(blobs)
+    labels, resumo = densidade.dbscan_indexado(blobs, eps=0.5, min_samples=10, algoritmo=algoritmo)
+    np.testing.assert_array_equal(labels == -1, referencia.labels_ == -1)
+    assert adjusted_rand_score(labels, referencia.labels_) == 1.0
+    np.testing.assert_array_equal(resumo['indices_nucleo'], referencia.core_sample_indices_)
+    assert resumo['n_clusters'] == 4
+
+
+def test_teto_de_memoria_nao_muda_os_rotulos(blobs):
+    # Teto minúsculo: contagem e união dos núcleos em muitos blocos
+    labels, _ = densidade.dbscan_indexado(blobs, eps=0.5, min_samples=10, algoritmo='brute')
+    em_blocos, _ = densidade.dbscan_indexado(blobs, eps=0.5, min_samples=10, algoritmo='brute', memoria_max_mb=0.05)
+    assert len(densidade._blocos_por_memoria(np.full(len(blobs), len(blobs)), 0.05)) > 10
+    np.testing.assert_array_equal(labels, em_blocos)
+
+
+def test_eps_automatico_no_joelho_da_curva():
+    X, _ = make_blobs(n_samples=1_500, centers=4, n_features=3, cluster_std=0.6, random_state=0)
+    eps = densidade.estimar_eps(X, min_samples=10)
+    # Entre o espalhamento dos blobs (0.6) e a menor distância entre centros (~3.9)
+    assert 0.3 < eps < 2.0
+    labels, resumo = densidade.dbscan_indexado(X, eps='auto', min_samples=10)
+    assert resumo['eps'] == pytest.approx(eps)
+    assert resumo['n_clusters'] == 4
+
+
+def test_indice_automatico_pela_dimensao():
+    rng = np.random.default_rng(0)
+    assert type(densidade.construir_indice(rng.normal(size=(50, 3)))).__name__ == 'KDTree'
+    assert type(densidade.construir_indice(rng.normal(size=(50, 21)))).__name__ == 'NearestNeighbors'
+
+
+def test_grade_de_um_grafo_confere_com_cada_dbscan(blobs):
+    tabela, labels_grade = densidade.grade_dbscan(blobs, [0.3, 0.5, 0.8], [5, 10, 20], modo_silhueta=None,
+                                                  memoria_max_mb=0.05, retornar_labels=True)
+    assert len(tabela) == 9
+    for linha in tabela.itertuples():
+        labels, resumo = densidade.dbscan_indexado(blobs, eps=linha.eps, min_samples=linha.min_samples)
+        np.testing.assert_array_equal(labels_grade[(linha.eps, linha.min_samples)], labels)
+        assert linha.n_clusters == resumo['n_clusters']
+        assert linha.n_ruido == resumo['n_ruido']
+    assert tabela['silhueta'].isna().all()
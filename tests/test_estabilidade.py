@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.metrics.cluster import pair_confusion_matrix
+
+import estabilidade
+
+
+def test_concordancia_confere_com_ari_e_jaccard_do_sklearn():
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 4, 600)
+    # Réplicas com ruído crescente: de idênticas à base até quase independentes
+    rotulos = np.array([np.where(rng.random(600) < ruido, rng.integers(0, 4, 600), base)
+                        for ruido in np.linspace(0, 0.9, 7)])
+    # Orçamento minúsculo: os 21 pares são processados em vários blocos
+    concordancia = estabilidade.concordancia_entre_replicas(rotulos, 4, memoria_max_mb=0.01)
+
+    for posicao, (i, j) in enumerate(zip(*np.triu_indices(len(rotulos), k=1))):
+        np.testing.assert_allclose(concordancia['ari'][posicao], adjusted_rand_score(rotulos[i], rotulos[j]),
+                                   rtol=1e-9, atol=1e-12)
+        pares = pair_confusion_matrix(rotulos[i], rotulos[j])
+        np.testing.assert_allclose(concordancia['jaccard'][posicao],
+                                   pares[1, 1] / (pares[1, 1] + pares[0, 1] + pares[1, 0]), rtol=1e-9)
+
+
+def test_concordancia_de_particoes_triviais_e_perfeita():
+    rotulos = np.zeros((3, 50), dtype=np.int64)
+    concordancia = estabilidade.concordancia_entre_replicas(rotulos, 2)
+    np.testing.assert_array_equal(concordancia['ari'], 1.0)
+    np.testing.assert_array_equal(concordancia['jaccard'], 1.0)
+
+
+def test_estabilidade_recomenda_o_k_dos_blobs():
+    from sklearn.datasets import make_blobs
+
+    X, _ = make_blobs(n_samples=2_000, centers=4, n_features=5, cluster_std=0.8, random_state=0)
+    resultado = estabilidade.estabilidade_k(X, range_k=range(2, 7), n_replicas=5, n_jobs=1, n_init=1)
+    assert resultado['k_recomendado'] == 4
+    assert resultado['n_replicas'] == [5] * 5
+    assert resultado['estabilidade_ari'][2] > 0.99
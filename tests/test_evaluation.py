@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+import evaluation
+
+
+def _base_com_ruido(n=3_000, semente=0):
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        'cliente_id': np.arange(n),
+        'idade': rng.integers(18, 80, n),
+        'renda_mensal': rng.gamma(2.0, 2_000.0, n),
+        'sexo': rng.choice(['F', 'M'], n),
+        'tipo_emprego': rng.choice(['CLT', 'Autônomo', 'Público', 'Desempregado'], n, p=[0.5, 0.2, 0.2, 0.1]),
+    })
+    labels = rng.integers(-1, 4, n)
+    return df, labels
+
+
+def test_perfil_categorico_confere_com_crosstab_incluindo_ruido():
+    df, labels = _base_com_ruido()
+    perfil = evaluation.perfilar_clusters(df, labels, incluir_ruido=True)
+    assert -1 in perfil['n_clientes'].index
+
+    for coluna in ['sexo', 'tipo_emprego']:
+        contagens = pd.crosstab(pd.Series(labels, name='cluster'), df[coluna])
+        participacoes = contagens.div(contagens.sum(axis=1), axis=0)
+        lift = participacoes / (df[coluna].value_counts(normalize=True)[contagens.columns])
+        resumo = perfil['categorico'][coluna]
+
+        np.testing.assert_array_equal(resumo['contagens'][contagens.columns].to_numpy(), contagens.to_numpy())
+        np.testing.assert_allclose(resumo['participacoes'][contagens.columns].to_numpy(), participacoes.to_numpy())
+        np.testing.assert_allclose(resumo['lift'][contagens.columns].to_numpy(), lift.to_numpy())
+        assert list(perfil['modas'][coluna]) == list(contagens.idxmax(axis=1))
+
+
+def test_analisar_perfis_equivale_as_duas_analises_separadas():
+    df, labels = _base_com_ruido(semente=1)
+    numerico, categorico = evaluation.analisar_perfis(df, labels, 'Teste')
+
+    pd.testing.assert_frame_equal(numerico, evaluation.analisar_perfis_clusters(df, labels, 'Teste'))
+    pd.testing.assert_frame_equal(categorico, evaluation.analisar_perfis_categoricos(df, labels, 'Teste'))
+    # O ruído fica fora do perfil numérico e dentro do categórico
+    assert -1 not in numerico.index
+    assert 'cluster_Teste_-1' in categorico.index
+    medias = df[labels != -1].groupby(labels[labels != -1])[['idade', 'renda_mensal']].mean()
+    np.testing.assert_allclose(numerico[['idade', 'renda_mensal']].to_numpy(), medias.to_numpy())
+
+
+def test_metricas_de_estatisticas_suficientes_conferem_com_sklearn():
+    from sklearn.datasets import make_blobs
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+
+    X, labels_blobs = make_blobs(n_samples=4_000, centers=4, n_features=6, random_state=0)
+    labels_ruido = labels_blobs.copy()
+    labels_ruido[::7] = -1
+    metricas = evaluation.calcular_metricas(X, {'blobs': labels_blobs, 'ruido': labels_ruido}, tamanho_bloco=333)
+
+    for nome, labels in [('blobs', labels_blobs), ('ruido', labels_ruido)]:
+        validos = labels != -1
+        Xv, lv = X[validos], labels[validos]
+        inercia = sum(((Xv[lv == c] - Xv[lv == c].mean(axis=0)) ** 2).sum() for c in np.unique(lv))
+        np.testing.assert_allclose(metricas[nome]['inercia'], inercia, rtol=1e-9)
+        np.testing.assert_allclose(metricas[nome]['calinski_harabasz'], calinski_harabasz_score(Xv, lv), rtol=1e-9)
+        np.testing.assert_allclose(metricas[nome]['davies_bouldin'], davies_bouldin_score(Xv, lv), rtol=1e-9)
+    assert metricas['blobs']['fracao_ruido'] == 0
+    np.testing.assert_allclose(metricas['ruido']['fracao_ruido'], np.mean(labels_ruido == -1))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import hierarquico
+
+
+def test_microclusters_com_bloco_final_menor_que_n_microclusters():
+    # 10100 % 10000 = 100 linhas no último bloco, menos que os 500 micro-clusters
+    X = np.random.default_rng(42).normal(size=(10_100, 4))
+    resumo = hierarquico.resumir_em_microclusters(X, n_microclusters=500)
+    assert len(resumo['labels']) == len(X)
+    assert resumo['pesos'].sum() == len(X)
+
+
+def test_microclusters_com_poucas_linhas():
+    X = np.random.default_rng(0).normal(size=(600, 4))
+    resumo = hierarquico.resumir_em_microclusters(X, n_microclusters=500, tamanho_lote=100)
+    assert resumo['pesos'].sum() == len(X)
+
+
+def test_ward_ponderado_com_pesos_unitarios_confere_com_scipy():
+    from scipy.cluster.hierarchy import cut_tree, ward
+    from sklearn.metrics import adjusted_rand_score
+
+    X = np.random.default_rng(3).normal(size=(300, 5))
+    linkage = hierarquico.linkage_ward_ponderado(X, np.ones(len(X)))
+    referencia = ward(X)
+    np.testing.assert_allclose(linkage[:, 2], referencia[:, 2], rtol=1e-9)
+    np.testing.assert_array_equal(linkage[:, 3], referencia[:, 3])
+    for k in (2, 4, 7, 12):
+        assert adjusted_rand_score(cut_tree(referencia, n_clusters=k).ravel(),
+                                   hierarquico.cortar_arvore(linkage, k)) == 1.0
+
+
+def test_ward_ponderado_equivale_a_repetir_cada_centro_pelo_seu_peso():
+    from scipy.cluster.hierarchy import ward
+
+    rng = np.random.default_rng(4)
+    centros = rng.normal(size=(40, 3))
+    pesos = rng.integers(1, 6, len(centros))
+    linkage = hierarquico.linkage_ward_ponderado(centros, pesos)
+    # Nas réplicas, as cópias de cada centro se unem primeiro (altura 0); as
+    # m-1 últimas fusões são as dos micro-clusters
+    referencia = ward(np.repeat(centros, pesos, axis=0))
+    np.testing.assert_allclose(linkage[:, 2], referencia[-(len(centros) - 1):, 2], rtol=1e-9)
+
+
+def test_cortes_da_arvore_exata_conferem_com_agglomerative_clustering():
+    from sklearn.cluster import AgglomerativeClustering
+    from sklearn.metrics import adjusted_rand_score
+
+    X = np.random.default_rng(5).normal(size=(400, 4))
+    arvore = hierarquico.construir_arvore(X, modo='exato')
+    cortes = hierarquico.cortar_em_varios_k(arvore, range(2, 9))
+    for k, labels in cortes.items():
+        referencia = AgglomerativeClustering(n_clusters=k, linkage='ward').fit_predict(X)
+        assert adjusted_rand_score(referencia, labels) == 1.0
+
+
+def test_inercias_por_k_saem_das_estatisticas_das_folhas():
+    X = np.random.default_rng(6).normal(size=(3_000, 5))
+    arvore = hierarquico.construir_arvore(X, n_microclusters=200)
+    resultado = hierarquico.encontrar_k_hierarquico(X, max_k=7, arvore=arvore)
+    cortes = hierarquico.cortar_em_varios_k(arvore, resultado['range_k'])
+    for k, inercia in zip(resultado['range_k'], resultado['inercias']):
+        labels = cortes[k]
+        direta = sum(((X[labels == c] - X[labels == c].mean(axis=0)) ** 2).sum() for c in np.unique(labels))
+        np.testing.assert_allclose(inercia, direta, rtol=1e-9)
+    # Mais clusters, menor inércia
+    assert np.all(np.diff(resultado['inercias']) < 0)
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from benchmarks import bench_importacao
+
+
+@pytest.mark.parametrize('modulo', sorted(bench_importacao.PROIBIDOS))
+def test_importacao_sem_bibliotecas_pesadas_nem_efeitos_colaterais(modulo):
+    # Só as regras: o tempo de importação depende da máquina e fica no benchmark
+    medicao = bench_importacao.medir_importacao(modulo)
+    assert medicao['carregados'] == []
+    assert medicao['arquivos_criados'] == []
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pytest
+
+import monitoramento
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason="requer o VmHWM do Linux")
+def test_pico_do_intervalo_externo_sobrevive_ao_intervalo_interno():
+    perfilador = monitoramento.Perfilador()
+    with perfilador.intervalo('externo'):
+        base = monitoramento._rss_pico_recente_mb()
+        bloco = np.ones(25_000_000)  # ~200 MB
+        del bloco
+        with perfilador.intervalo('interno'):
+            pass
+    picos = {evento['nome']: evento['rss_pico_mb'] for evento in perfilador.eventos}
+    assert picos['externo'] >= base + 150
+    assert picos['interno'] < picos['externo']
+    assert monitoramento._rss_pico_mb() >= picos['externo']
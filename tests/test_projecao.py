@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from sklearn.decomposition import PCA
+
+import projecao
+
+
+def test_projetar_pca_em_blocos_confere_com_sklearn():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5_000, 8)) @ rng.normal(size=(8, 8)) + 3.0
+    resultado = projecao.projetar_pca(X, n_componentes=3, tamanho_bloco=700)
+    referencia = PCA(n_components=3, svd_solver='full').fit(X)
+
+    # Componentes iguais a menos do sinal; as coordenadas seguem o mesmo sinal
+    sinais = np.sign((resultado['componentes'] * referencia.components_).sum(axis=1))
+    np.testing.assert_allclose(resultado['componentes'], referencia.components_ * sinais[:, None], atol=1e-8)
+    np.testing.assert_allclose(resultado['coordenadas'], referencia.transform(X) * sinais, rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(resultado['media'], referencia.mean_)
+    np.testing.assert_allclose(resultado['variancia_explicada'], referencia.explained_variance_ratio_, rtol=1e-9)
+    assert resultado['coordenadas'].dtype == np.float32
+
+
+def test_projecao_em_cache_reaproveita_a_mesma_base():
+    X = np.random.default_rng(1).normal(size=(300, 4))
+    primeira = projecao.projecao_pca_em_cache(X)
+    assert projecao.projecao_pca_em_cache(X.copy()) is primeira
+    assert projecao.projecao_pca_em_cache(X + 1.0) is not primeira
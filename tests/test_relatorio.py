@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+
+import projecao
+import relatorio
+
+
+def _tarefas():
+    rng = np.random.default_rng(0)
+    n = 800
+    df_numerico = pd.DataFrame(rng.normal(size=(n, 3)), columns=['idade', 'renda_mensal', 'score_credito'])
+    df_clientes = df_numerico.assign(sexo=rng.choice(['F', 'M'], n))
+    labels = np.arange(n) % 3
+    resultados_k = {'range_k': [2, 3, 4], 'inercias': [30.0, 20.0, 15.0], 'scores_silhueta': [0.3, 0.4, 0.35],
+                    'silhueta_ic': [(0.3, 0.3), (0.4, 0.4), (0.35, 0.35)]}
+    return relatorio.tarefas_do_pipeline(
+        df_clientes, df_numerico, resultados_k, {'K-Means': labels}, projecao.projetar_pca(df_numerico),
+        labels_referencia=labels, n_clusters=3, colunas_demograficas=['idade'],
+        colunas_financeiras=['renda_mensal', 'score_credito'], colunas_categoricas=['sexo'],
+        features_radar=['idade', 'renda_mensal', 'score_credito']
+    )
+
+
+def test_renderizacao_serial_e_paralela_gravam_as_mesmas_figuras(tmp_path, monkeypatch):
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    tarefas = _tarefas()
+    arquivos = {}
+    anterior = matplotlib.get_backend()
+    try:
+        # Backend "de quem chama" diferente do Agg: o caminho serial deve restaurá-lo
+        plt.switch_backend('svg')
+        for n_jobs in (1, 2):
+            pasta = tmp_path / f'n_jobs_{n_jobs}'
+            pasta.mkdir()
+            monkeypatch.chdir(pasta)
+            tempos = relatorio.renderizar_figuras(tarefas, n_jobs=n_jobs)
+            assert sorted(tempos.index) == sorted(nome for nome, _, _ in tarefas)
+            assert matplotlib.get_backend().lower() == 'svg'
+            arquivos[n_jobs] = sorted(os.listdir(pasta / 'images'))
+    finally:
+        plt.switch_backend(anterior)
+    assert arquivos[1] == arquivos[2]
+    assert len(arquivos[1]) == len(tarefas)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_generator
+import resegmentacao
+
+
+@pytest.fixture(scope='module')
+def base():
+    return data_generator.gerar_dados_sinteticos(3_000, seed=1)
+
+
+def test_atualizacao_incremental_mantem_ids_dos_segmentos(base, tmp_path):
+    pasta = str(tmp_path / 'estado')
+    inicial = resegmentacao.resegmentar(base, pasta, n_clusters=4)
+    assert inicial['modo'] == 'completo'
+
+    # Delta pequeno: 30 alterados, 10 removidos e 20 novos
+    dia = base.iloc[10:].copy()
+    dia.loc[dia.index[:30], 'renda_mensal'] *= 1.05
+    novos = data_generator.gerar_dados_sinteticos(20, seed=2).assign(cliente_id=lambda d: d['cliente_id'] + 10_000)
+    dia = pd.concat([dia, novos], ignore_index=True)
+    resultado = resegmentacao.resegmentar(dia, pasta, n_clusters=4)
+
+    assert resultado['modo'] == 'incremental'
+    assert resultado['motivos'] == []
+    assert len(resultado['comparacao']['alterados']) == 30
+    assert len(resultado['comparacao']['removidos']) == 10
+    assert len(resultado['comparacao']['novos']) == 20
+    anteriores = inicial['segmentos'].set_index('cliente_id')['segmento']
+    atuais = resultado['segmentos'].set_index('cliente_id')['segmento']
+    inalterados = base['cliente_id'].iloc[40:]
+    np.testing.assert_array_equal(atuais.loc[inalterados].to_numpy(), anteriores.loc[inalterados].to_numpy())
+    assert (resultado['segmentos']['segmento'] >= 0).all()
+
+
+def test_reajuste_alinha_ids_com_o_ajuste_anterior(base, tmp_path):
+    pasta = str(tmp_path / 'estado')
+    inicial = resegmentacao.resegmentar(base, pasta, n_clusters=4)
+    reajuste = resegmentacao.resegmentar(base, pasta, n_clusters=4, forcar_reajuste=True)
+    assert reajuste['modo'] == 'completo'
+    iguais = (reajuste['segmentos']['segmento'].to_numpy() == inicial['segmentos']['segmento'].to_numpy()).mean()
+    assert iguais > 0.95
+
+
+def test_lote_deslocado_passa_do_limiar_e_reajusta(base, tmp_path):
+    pasta = str(tmp_path / 'estado')
+    resegmentacao.resegmentar(base, pasta, n_clusters=4)
+    deslocada = base.assign(renda_mensal=base['renda_mensal'] * 3, valor_divida=base['valor_divida'] * 3)
+    resultado = resegmentacao.resegmentar(deslocada, pasta, n_clusters=4)
+    assert resultado['modo'] == 'completo'
+    assert 'deslocamento_medias' in resultado['motivos']
+    assert resultado['deriva']['deslocamento_medias'] > resegmentacao.LIMIARES_DERIVA['deslocamento_medias']
+    # O reajuste completo reinicia a referência da deriva
+    deriva = resegmentacao.medir_deriva(resegmentacao.carregar_estado(pasta))
+    assert deriva['fracao_alterada'] == 0
+    assert deriva['deslocamento_medias'] < 1e-6
+
+
+def test_cli_le_e_grava_csv(base, tmp_path):
+    entrada, saida = tmp_path / 'base.csv', tmp_path / 'segmentos.csv'
+    base.to_csv(entrada, index=False)
+    subprocess.run([sys.executable, resegmentacao.__file__, '--base', str(entrada),
+                    '--estado', str(tmp_path / 'estado'), '--saida', str(saida)], check=True,
+                   capture_output=True)
+    segmentos = pd.read_csv(saida)
+    assert list(segmentos.columns) == ['cliente_id', 'segmento']
+    assert len(segmentos) == len(base)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import adjusted_rand_score
+
+import armazenamento
+import artefato
+import data_generator
+import evaluation
+import preprocessing
+import segmentacao_em_blocos
+
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    df = data_generator.gerar_dados_sinteticos(n_clientes=12_000, seed=7)
+    caminho = str(tmp_path_factory.mktemp('base') / 'clientes.parquet')
+    armazenamento.salvar_base(df, caminho)
+    return df, caminho
+
+
+def test_passagem_1_confere_com_esquema_e_scaler_da_base_inteira(base):
+    df, caminho = base
+    estatisticas = segmentacao_em_blocos.estatisticas_em_blocos(caminho, tamanho_bloco=1_700)
+    esquema = preprocessing.extrair_esquema(df)
+    _, df_modelagem = preprocessing.selecionar_e_transformar_features(df, esquema)
+    _, scaler = preprocessing.padronizar_dados(df_modelagem, retornar_scaler=True)
+
+    assert estatisticas['esquema'] == esquema
+    assert estatisticas['n_linhas'] == len(df)
+    np.testing.assert_allclose(estatisticas['media'], scaler.mean_, rtol=1e-9)
+    np.testing.assert_allclose(estatisticas['variancia'], scaler.var_, rtol=1e-9)
+
+
+def test_tres_passagens_conferem_com_o_ajuste_em_memoria(base, tmp_path):
+    from sklearn.cluster import KMeans
+
+    df, caminho = base
+    saida = str(tmp_path / 'segmentos.parquet')
+    resultado = segmentacao_em_blocos.segmentar_em_blocos(caminho, n_clusters=4, tamanho_bloco=1_700,
+                                                          tamanho_lote=1_000, n_epocas=3, caminho_saida=saida)
+
+    # Mesmos segmentos (a menos da numeração) e inércia próxima da do K-Means em memória
+    _, df_modelagem = preprocessing.selecionar_e_transformar_features(df)
+    X = preprocessing.padronizar_dados(df_modelagem).to_numpy()
+    kmeans = KMeans(n_clusters=4, n_init=10, random_state=0).fit(X)
+    segmentos = armazenamento.carregar_base(saida)
+    assert segmentos['cliente_id'].tolist() == df['cliente_id'].tolist()
+    assert adjusted_rand_score(kmeans.labels_, segmentos['segmento']) > 0.95
+    assert resultado['inercia'] <= 1.02 * kmeans.inertia_
+
+    # O perfil acumulado em blocos é o mesmo de perfilar_clusters sobre a base inteira
+    labels, _ = artefato.atribuir_segmentos(resultado['artefato'], df)
+    np.testing.assert_array_equal(labels, segmentos['segmento'].to_numpy())
+    referencia = evaluation.perfilar_clusters(df, labels)
+    # (os rótulos do artefato são compactos, int16: só o dtype do índice difere)
+    pd.testing.assert_series_equal(resultado['perfil']['n_clientes'], referencia['n_clientes'], check_index_type=False)
+    pd.testing.assert_frame_equal(resultado['perfil']['numerico'], referencia['numerico'], rtol=1e-9,
+                                  check_index_type=False)
+    pd.testing.assert_frame_equal(resultado['perfil']['modas'], referencia['modas'], check_dtype=False,
+                                  check_index_type=False)
+    for coluna, resumo in referencia['categorico'].items():
+        pd.testing.assert_frame_equal(resultado['perfil']['categorico'][coluna]['contagens'], resumo['contagens'],
+                                      check_names=False, check_index_type=False)
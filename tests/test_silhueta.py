@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from sklearn.datasets import make_blobs
+from sklearn.metrics import silhouette_score
+
+import silhueta
+
+
+def test_silhueta_exata_em_blocos_confere_com_sklearn():
+    X, labels = make_blobs(n_samples=3_000, centers=5, n_features=8, cluster_std=2.5, random_state=0)
+    # Orçamento minúsculo: a matriz de distâncias é percorrida em muitos blocos
+    resultado = silhueta.silhueta_exata(X, labels, memoria_max_mb=0.5)
+    np.testing.assert_allclose(resultado['silhueta'], silhouette_score(X, labels), rtol=1e-9)
+    assert resultado['modo'] == 'exato'
+
+
+def test_silhueta_amostrada_cobre_o_valor_exato():
+    X, labels = make_blobs(n_samples=6_000, centers=4, n_features=6, cluster_std=3.0, random_state=1)
+    referencia = silhouette_score(X, labels)
+    for estratificada in (True, False):
+        resultado = silhueta.silhueta_amostrada(X, labels, tamanho_amostra=1_500, estratificada=estratificada)
+        assert resultado['modo'] == 'amostrado'
+        assert resultado['ic_inferior'] <= referencia <= resultado['ic_superior']
+        assert abs(resultado['silhueta'] - referencia) < 0.02
+
+
+def test_calcular_silhueta_escolhe_o_modo_pelo_numero_de_linhas():
+    X, labels = make_blobs(n_samples=1_000, centers=3, random_state=2)
+    assert silhueta.calcular_silhueta(X, labels, max_linhas_exato=2_000)['modo'] == 'exato'
+    assert silhueta.calcular_silhueta(X, labels, max_linhas_exato=500, tamanho_amostra=200)['modo'] == 'amostrado'
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+
+import visualization
+
+
+def test_radar_com_mais_de_quatro_clusters(tmp_path):
+    rng = np.random.default_rng(0)
+    features = ['idade', 'renda_mensal', 'score_credito']
+    df_clusters = pd.DataFrame(rng.normal(size=(600, 3)), columns=features).assign(cluster=np.arange(600) % 6)
+    fig = visualization.plotar_radar_clusters(df_clusters, features, n_clusters=6, output_dir=str(tmp_path))
+    assert os.path.exists(tmp_path / 'radar_clusters.png')
+    visiveis = [ax for ax in fig.axes if ax.get_visible()]
+    assert len(visiveis) == 6
+    assert len(fig.axes) == 6
@@ -1,55 +1,117 @@
 # -*- coding: utf-8 -*-
-import matplotlib.pyplot as plt
-import seaborn as sns
+# matplotlib e seaborn são importados dentro de cada função de plotagem:
+# importar este módulo não carrega bibliotecas gráficas nem cria diretórios.
+# As funções resumir_* reduzem os dados ao que o gráfico precisa (histogramas,
+# contagens, médias, grades) e as desenhar_* desenham só a partir desses resumos,
+# o que permite renderizar as figuras em outros processos (ver relatorio.py).
 import pandas as pd
-from sklearn.decomposition import PCA
 import numpy as np
 import os
 import preprocessing  # Importação necessária para a normalização do radar
+import projecao
 from math import pi
 
-# Cria o diretório 'images' se não existir
-os.makedirs("images", exist_ok=True)
+# Diretório padrão das imagens geradas (criado apenas no primeiro salvamento)
+PASTA_IMAGENS = "images"
+# Acima deste número de pontos, a projeção PCA é desenhada como densidade agregada
+MAX_PONTOS_DISPERSAO = 50_000
+# Células por eixo da grade de densidade
+RESOLUCAO_DENSIDADE = 400
+# Pontos usados para estimar a curva KDE das distribuições
+TAMANHO_AMOSTRA_KDE = 20_000
+
+def _caminho_imagem(filename, pasta=PASTA_IMAGENS):
+    """
+    Caminho de saída de uma imagem, criando o diretório se necessário.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, filename)
 
 def salvar_tabela_descritiva(df_numerico, filename="tabela_descritiva.csv"):
     """
     Salva a tabela de estatísticas descritivas das variáveis numéricas.
     """
     tabela = df_numerico.describe().transpose()
-    tabela.to_csv(f"images/{filename}")
+    tabela.to_csv(_caminho_imagem(filename))
 
 def plotar_matriz_correlacao(df_numerico, filename="matriz_correlacao.png"):
+    return desenhar_matriz_correlacao(df_numerico.corr(), filename)
+
+def desenhar_matriz_correlacao(corr, filename="matriz_correlacao.png"):
+    """
+    Desenha o heatmap a partir da matriz de correlação já calculada (d x d).
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(12, 10))
-    corr = df_numerico.corr()
     sns.heatmap(corr, annot=True, fmt=".2f", cmap='coolwarm', ax=ax, vmin=-1, vmax=1, cbar_kws={'label': 'Correlação'})
     ax.set_title('Matriz de Correlação das Variáveis Numéricas', fontsize=16)
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
 
-def plotar_distribuicoes(df_numerico, filename_prefix="distribuicao"):
+def resumir_distribuicoes(df_numerico, colunas=None, bins=50, pontos_kde=200, tamanho_amostra_kde=TAMANHO_AMOSTRA_KDE):
+    """
+    Resume cada variável numérica em histograma e curva KDE, de modo que o
+    desenho não precise dos dados originais.
+
+    Returns:
+        dict: {coluna: {'contagens', 'bordas', 'kde_x', 'kde_y'}}, com a KDE na
+              escala de contagens do histograma (como no seaborn.histplot).
+    """
+    from scipy.stats import gaussian_kde
+
+    resumo = {}
+    rng = np.random.default_rng(42)
+    for col in (colunas if colunas is not None else df_numerico.columns):
+        valores = df_numerico[col].to_numpy(dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        contagens, bordas = np.histogram(valores, bins=bins)
+        kde_x = np.linspace(bordas[0], bordas[-1], pontos_kde)
+        amostra = valores if len(valores) <= tamanho_amostra_kde else rng.choice(valores, tamanho_amostra_kde, replace=False)
+        if len(np.unique(amostra)) > 1:
+            kde_y = gaussian_kde(amostra)(kde_x) * len(valores) * (bordas[1] - bordas[0])
+        else:
+            kde_y = None
+        resumo[col] = {'contagens': contagens, 'bordas': bordas, 'kde_x': kde_x, 'kde_y': kde_y}
+    return resumo
+
+def desenhar_distribuicoes(resumo, filename="distribuicao.png"):
+    """
+    Desenha a grade de histogramas (com KDE) a partir de resumir_distribuicoes.
+    """
+    import matplotlib.pyplot as plt
     plt.style.use('seaborn-v0_8-whitegrid')
-    num_plots = len(df_numerico.columns)
+    num_plots = len(resumo)
     num_cols = 2
     num_rows = (num_plots + num_cols - 1) // num_cols
     fig, axes = plt.subplots(num_rows, num_cols, figsize=(14, num_rows * 4))
-    axes = axes.flatten()
+    axes = np.atleast_1d(axes).flatten()
 
-    for i, col in enumerate(df_numerico.columns):
-        sns.histplot(df_numerico[col], kde=True, ax=axes[i], bins=50, color='royalblue')
+    for i, (col, r) in enumerate(resumo.items()):
+        axes[i].stairs(r['contagens'], r['bordas'], fill=True, color='royalblue', alpha=0.5)
+        axes[i].stairs(r['contagens'], r['bordas'], color='royalblue', linewidth=0.8)
+        if r['kde_y'] is not None:
+            axes[i].plot(r['kde_x'], r['kde_y'], color='royalblue', linewidth=2)
         axes[i].set_title(f'Distribuição de: {col}', fontsize=12)
         axes[i].set_xlabel(col)
         axes[i].set_ylabel('Frequência')
 
-    for j in range(i + 1, len(axes)):
+    for j in range(num_plots, len(axes)):
         axes[j].set_visible(False)
 
     fig.tight_layout(pad=3.0)
-    fig.savefig(f"images/{filename_prefix}.png")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
+
+def plotar_distribuicoes(df_numerico, filename_prefix="distribuicao"):
+    return desenhar_distribuicoes(resumir_distribuicoes(df_numerico), f"{filename_prefix}.png")
 
 def plotar_metodo_cotovelo(resultados_k, filename="metodo_cotovelo.png"):
+    import matplotlib.pyplot as plt
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.plot(resultados_k['range_k'], resultados_k['inercias'], 'bo-', label='WCSS')
@@ -59,10 +121,12 @@ def plotar_metodo_cotovelo(resultados_k, filename="metodo_cotovelo.png"):
     ax.grid(True)
     ax.legend()
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
 
 def plotar_score_silhueta(resultados_k, filename="score_silhueta.png"):
+    import matplotlib.pyplot as plt
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.plot(resultados_k['range_k'], resultados_k['scores_silhueta'], 'ro-', label='Coeficiente de Silhueta')
@@ -72,30 +136,112 @@ def plotar_score_silhueta(resultados_k, filename="score_silhueta.png"):
     ax.grid(True)
     ax.legend()
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
+
+def _rasterizar_clusters(coordenadas, labels, resolucao):
+    """
+    Agrega os pontos em uma grade resolucao x resolucao: para cada célula, o cluster
+    mais frequente e o total de pontos. O custo do desenho não depende do número de pontos.
 
-def plotar_cluster_pca_individual(df_padronizado, labels, nome_modelo, filename=None):
+    Returns:
+        dict: {'clusters', 'dominante' (índice em clusters), 'total', 'extent'}
+    """
+    clusters, codigos = np.unique(np.asarray(labels), return_inverse=True)
+    codigos = codigos.ravel()
+    x, y = coordenadas[:, 0], coordenadas[:, 1]
+    xmin, xmax, ymin, ymax = float(x.min()), float(x.max()), float(y.min()), float(y.max())
+    largura_x = (xmax - xmin) or 1.0
+    largura_y = (ymax - ymin) or 1.0
+    ix = np.clip(((x - xmin) / largura_x * resolucao).astype(np.int64), 0, resolucao - 1)
+    iy = np.clip(((y - ymin) / largura_y * resolucao).astype(np.int64), 0, resolucao - 1)
+
+    n_celulas = resolucao * resolucao
+    contagens = np.bincount(codigos * n_celulas + iy * resolucao + ix,
+                            minlength=len(clusters) * n_celulas).reshape(len(clusters), resolucao, resolucao)
+    return {
+        'clusters': clusters,
+        'dominante': contagens.argmax(axis=0).astype(np.int32),
+        'total': contagens.sum(axis=0),
+        'extent': [xmin, xmax, ymin, ymax]
+    }
+
+def resumir_clusters_pca(df_padronizado, labels, projecao_pca=None, modo='auto', resolucao=RESOLUCAO_DENSIDADE):
+    """
+    Dados leves para desenhar os clusters na projeção PCA: as coordenadas e rótulos
+    (modo 'pontos') ou a grade agregada por cluster (modo 'densidade').
+
+    Args:
+        df_padronizado (pd.DataFrame): Dados padronizados (ignorado se projecao_pca for informada).
+        labels (array-like): Rótulos dos clusters.
+        projecao_pca (dict ou np.ndarray, opcional): Resultado de projecao.projetar_pca (ou a
+            matriz n x 2 de coordenadas). Se None, usa a projeção em cache da base, calculada
+            uma única vez e reaproveitada entre os modelos.
+        modo (str): 'pontos' (dispersão), 'densidade' (grade agregada por cluster, custo
+            constante no número de pontos) ou 'auto' (densidade acima de MAX_PONTOS_DISPERSAO).
+        resolucao (int): Células por eixo no modo 'densidade'.
+
+    Returns:
+        dict: {'modo', ...} com os dados de desenhar_clusters_pca.
+    """
+    if projecao_pca is None:
+        projecao_pca = projecao.projecao_pca_em_cache(df_padronizado)
+    coordenadas = projecao_pca['coordenadas'] if isinstance(projecao_pca, dict) else np.asarray(projecao_pca)
+    if modo == 'auto':
+        modo = 'densidade' if len(coordenadas) > MAX_PONTOS_DISPERSAO else 'pontos'
+    if modo == 'pontos':
+        return {'modo': 'pontos', 'coordenadas': coordenadas, 'labels': np.asarray(labels)}
+    if modo == 'densidade':
+        return {'modo': 'densidade', **_rasterizar_clusters(coordenadas, labels, resolucao)}
+    raise ValueError(f"Modo '{modo}' inválido. Use 'pontos', 'densidade' ou 'auto'.")
+
+def desenhar_clusters_pca(resumo, nome_modelo, filename=None):
+    """
+    Desenha os clusters na projeção PCA a partir de resumir_clusters_pca.
+    """
+    import matplotlib.pyplot as plt
     if filename is None:
         filename = f"clusters_pca_{nome_modelo}.png"
-    
-    pca = PCA(n_components=2)
-    componentes_principais = pca.fit_transform(df_padronizado)
-    df_pca = pd.DataFrame(data=componentes_principais, columns=['PC1', 'PC2'])
-    df_pca['Cluster'] = labels
-    
+
     fig, ax = plt.subplots(figsize=(8, 6))
-    sns.scatterplot(x='PC1', y='PC2', hue='Cluster', data=df_pca, palette='tab10', alpha=0.7, s=50, ax=ax)
+    if resumo['modo'] == 'pontos':
+        import seaborn as sns
+        df_pca = pd.DataFrame(data=resumo['coordenadas'], columns=['PC1', 'PC2'])
+        df_pca['Cluster'] = resumo['labels']
+        sns.scatterplot(x='PC1', y='PC2', hue='Cluster', data=df_pca, palette='tab10', alpha=0.7, s=50, ax=ax)
+        ax.legend(title='Cluster')
+    else:
+        from matplotlib.patches import Patch
+        paleta = plt.get_cmap('tab10')
+        clusters = resumo['clusters']
+        cores = np.array([(0.6, 0.6, 0.6, 1.0) if c < 0 else paleta(c % 10) for c in clusters])
+        total = resumo['total']
+        imagem = cores[resumo['dominante']].copy()
+        opacidade = np.log1p(total) / np.log1p(max(total.max(), 1))
+        imagem[..., 3] = np.where(total > 0, 0.15 + 0.85 * opacidade, 0.0)
+        ax.imshow(imagem, origin='lower', extent=resumo['extent'], aspect='auto', interpolation='nearest')
+        ax.legend(handles=[Patch(color=cor, label='Ruído' if c < 0 else str(c)) for c, cor in zip(clusters, cores)],
+                  title='Cluster')
     ax.set_title(f'Clusters do Modelo: {nome_modelo}', fontsize=14)
     ax.set_xlabel('Componente Principal 1')
     ax.set_ylabel('Componente Principal 2')
     ax.grid(True)
-    ax.legend(title='Cluster')
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
+
+def plotar_cluster_pca_individual(df_padronizado, labels, nome_modelo, filename=None, projecao_pca=None,
+                                  modo='auto', resolucao=RESOLUCAO_DENSIDADE):
+    """
+    Plota os clusters na projeção 2D por PCA (ver resumir_clusters_pca para os modos).
+    """
+    resumo = resumir_clusters_pca(df_padronizado, labels, projecao_pca, modo, resolucao)
+    return desenhar_clusters_pca(resumo, nome_modelo, filename)
 
 def plotar_radar_individual(perfil_clusters, cluster_id, filename=None):
+    import matplotlib.pyplot as plt
     if filename is None:
         filename = f"radar_cluster_{cluster_id}.png"
     
@@ -119,76 +265,84 @@ def plotar_radar_individual(perfil_clusters, cluster_id, filename=None):
     ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1))
     
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
 
 def plotar_distribuicoes_separadas(df_numerico, colunas_demograficas, colunas_financeiras):
     """
     Plota distribuições das variáveis numéricas separando demográficas e financeiras.
     Salva duas imagens: uma para demográficas e outra para financeiras.
     """
-    def plotar(df_subset, filename):
-        plt.style.use('seaborn-v0_8-whitegrid')
-        num_plots = len(df_subset.columns)
-        num_cols = 2
-        num_rows = (num_plots + num_cols - 1) // num_cols
-        fig, axes = plt.subplots(num_rows, num_cols, figsize=(14, num_rows * 4))
-        axes = axes.flatten()
-    
-        for i, col in enumerate(df_subset.columns):
-            sns.histplot(df_subset[col], kde=True, ax=axes[i], bins=50, color='royalblue')
-            axes[i].set_title(f'Distribuição de: {col}', fontsize=12)
-            axes[i].set_xlabel(col)
-            axes[i].set_ylabel('Frequência')
-    
-        for j in range(i + 1, len(axes)):
-            axes[j].set_visible(False)
-    
-        fig.tight_layout(pad=3.0)
-        fig.savefig(f"images/{filename}")
-        plt.close(fig)
-    
     # Plotando variáveis demográficas
     if colunas_demograficas:
-        plotar(df_numerico[colunas_demograficas], "distribuicoes_demograficas.png")
+        desenhar_distribuicoes(resumir_distribuicoes(df_numerico, colunas_demograficas), "distribuicoes_demograficas.png")
     
     # Plotando variáveis financeiras
     if colunas_financeiras:
-        plotar(df_numerico[colunas_financeiras], "distribuicoes_financeiras.png")
+        desenhar_distribuicoes(resumir_distribuicoes(df_numerico, colunas_financeiras), "distribuicoes_financeiras.png")
 
 def plotar_categoricas(df, colunas_categoricas, filename_prefix="categoricas"):
     """
     Plota contagens das variáveis categóricas em gráficos de barra.
     """
+    return desenhar_categoricas(resumir_categoricas(df, colunas_categoricas), f"{filename_prefix}.png")
+
+def resumir_categoricas(df, colunas_categoricas):
+    """
+    Contagem de cada categoria (na ordem das categorias), sem os dados originais.
+
+    Returns:
+        dict: {coluna: pd.Series de contagens}
+    """
+    contagens = {}
+    for col in colunas_categoricas:
+        serie = df[col]
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype('category')
+        contagens[col] = serie.value_counts(sort=False)
+    return contagens
+
+def desenhar_categoricas(contagens, filename="categoricas.png"):
+    """
+    Desenha os gráficos de barra a partir de resumir_categoricas.
+    """
+    import matplotlib.pyplot as plt
     plt.style.use('seaborn-v0_8-whitegrid')
-    num_plots = len(colunas_categoricas)
+    num_plots = len(contagens)
     num_cols = 2
     num_rows = (num_plots + num_cols - 1) // num_cols
     fig, axes = plt.subplots(num_rows, num_cols, figsize=(14, num_rows * 4))
-    axes = axes.flatten()
-
-    for i, col in enumerate(colunas_categoricas):
-        sns.countplot(x=col, data=df, hue=col, ax=axes[i], palette='pastel', legend=False)
+    axes = np.atleast_1d(axes).flatten()
+    paleta = plt.get_cmap('Pastel1')
+
+    for i, (col, serie) in enumerate(contagens.items()):
+        posicoes = np.arange(len(serie))
+        barras = axes[i].bar(posicoes, serie.to_numpy(), color=[paleta(k % 9) for k in posicoes])
+        axes[i].set_xticks(posicoes)
+        axes[i].set_xticklabels([str(c) for c in serie.index])
         axes[i].set_title(f'Contagem de: {col}', fontsize=12)
         axes[i].set_xlabel(col)
         axes[i].set_ylabel('Frequência')
-        for p in axes[i].patches:
-            axes[i].annotate(f'{p.get_height()}', (p.get_x() + p.get_width() / 2., p.get_height()),
-                             ha='center', va='bottom', fontsize=10)
+        axes[i].bar_label(barras, fontsize=10)
 
-    for j in range(i + 1, len(axes)):
+    for j in range(num_plots, len(axes)):
         axes[j].set_visible(False)
 
     fig.tight_layout(pad=3.0)
-    fig.savefig(f"images/{filename_prefix}.png")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
 
 def plotar_cotovelo_e_silhueta_juntos(resultados_k, filename="cotovelo_silhueta.png"):
     """
-    Plota lado a lado o gráfico do método do cotovelo e o gráfico do coeficiente de silhueta.
+    Plota lado a lado o gráfico do método do cotovelo e o gráfico do coeficiente de silhueta
+    e, se resultados_k tiver a curva de estabilidade (estabilidade.py), o ARI médio entre réplicas.
     """
+    import matplotlib.pyplot as plt
     plt.style.use('seaborn-v0_8-whitegrid')
-    fig, axes = plt.subplots(1, 2, figsize=(18, 6))
+    com_estabilidade = 'estabilidade_ari' in resultados_k
+    fig, axes = plt.subplots(1, 3 if com_estabilidade else 2, figsize=(27 if com_estabilidade else 18, 6))
 
     # Gráfico do Cotovelo
     axes[0].plot(resultados_k['range_k'], resultados_k['inercias'], 'bo-', label='WCSS')
@@ -206,9 +360,25 @@ def plotar_cotovelo_e_silhueta_juntos(resultados_k, filename="cotovelo_silhueta.
     axes[1].grid(True)
     axes[1].legend()
 
+    if com_estabilidade:
+        # Curva de estabilidade: ARI médio entre réplicas, com faixa de ±1 desvio padrão
+        ari = np.asarray(resultados_k['estabilidade_ari'], dtype=float)
+        dp = np.asarray(resultados_k['estabilidade_ari_dp'], dtype=float)
+        axes[2].plot(resultados_k['range_k'], ari, 'go-', label='ARI médio entre réplicas')
+        axes[2].fill_between(resultados_k['range_k'], ari - dp, ari + dp, color='g', alpha=0.15)
+        if resultados_k.get('k_recomendado') is not None:
+            axes[2].axvline(resultados_k['k_recomendado'], color='gray', linestyle='--',
+                            label=f"K recomendado = {resultados_k['k_recomendado']}")
+        axes[2].set_xlabel('Número de Clusters (K)')
+        axes[2].set_ylabel('Índice de Rand Ajustado')
+        axes[2].set_title('Estabilidade por Reamostragem', fontsize=14)
+        axes[2].grid(True)
+        axes[2].legend()
+
     fig.tight_layout()
-    fig.savefig(f"images/{filename}")
+    fig.savefig(_caminho_imagem(filename))
     plt.close(fig)
+    return fig
 
 def normalizar_por_variavel(df):
     """
@@ -217,31 +387,40 @@ def normalizar_por_variavel(df):
     """
     return (df - df.min()) / (df.max() - df.min())
 
-def plotar_radar_clusters(df_clusters, features, n_clusters, output_dir="images", filename="radar_clusters.png"):
+def resumir_radar_clusters(df_clusters, features):
     """
-    Plota os gráficos de radar dos clusters em uma única figura com quadrantes.
-    Normaliza cada variável para [0,1] considerando apenas os valores médios dos clusters.
+    Médias por cluster normalizadas para [0, 1] por variável (entrada do radar).
     """
-    import numpy as np
-    import matplotlib.cm as cm
-
-    os.makedirs(output_dir, exist_ok=True)
-
     # Calcula médias por cluster
     cluster_means = df_clusters.groupby('cluster')[features].mean()
 
     # Normaliza cada variável (coluna) de forma independente
-    cluster_means_norm = (cluster_means - cluster_means.min()) / (cluster_means.max() - cluster_means.min())
+    return (cluster_means - cluster_means.min()) / (cluster_means.max() - cluster_means.min())
+
+def plotar_radar_clusters(df_clusters, features, n_clusters, output_dir="images", filename="radar_clusters.png"):
+    """
+    Plota os gráficos de radar dos clusters em uma única figura com quadrantes.
+    Normaliza cada variável para [0,1] considerando apenas os valores médios dos clusters.
+    """
+    return desenhar_radar_clusters(resumir_radar_clusters(df_clusters, features), n_clusters, output_dir, filename)
 
+def desenhar_radar_clusters(cluster_means_norm, n_clusters, output_dir="images", filename="radar_clusters.png"):
+    """
+    Desenha os radares a partir das médias normalizadas de resumir_radar_clusters.
+    """
+    import matplotlib.pyplot as plt
+
+    features = list(cluster_means_norm.columns)
     num_vars = len(features)
     angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
     angles += angles[:1]
 
     # Cores diferentes para cada cluster
-    colors = cm.get_cmap("tab10", n_clusters)
+    colors = plt.get_cmap("tab10", n_clusters)
 
-    # Subplots em 2x2
-    fig, axes = plt.subplots(2, 2, figsize=(12, 10), subplot_kw=dict(polar=True))
+    # Subplots em duas colunas, com tantas linhas quantas o K exigir (2x2 para K=4)
+    n_linhas = max(1, -(-n_clusters // 2))
+    fig, axes = plt.subplots(n_linhas, 2, figsize=(12, 5 * n_linhas), subplot_kw=dict(polar=True), squeeze=False)
     axes = axes.flatten()
 
     for cluster_id in range(n_clusters):
@@ -259,10 +438,11 @@ def plotar_radar_clusters(df_clusters, features, n_clusters, output_dir="images"
         ax.set_ylim(0, 1)
         ax.set_title(f'Cluster {cluster_id}', size=12, pad=15)
 
-    for j in range(cluster_id + 1, len(axes)):
+    for j in range(n_clusters, len(axes)):
         axes[j].set_visible(False)
 
     fig.suptitle("Perfis Normalizados dos Clusters (comparação por variável)", size=16, y=1.02)
     fig.tight_layout()
-    fig.savefig(os.path.join(output_dir, filename))
-    plt.close(fig)
\ No newline at end of file
+    fig.savefig(_caminho_imagem(filename, output_dir))
+    plt.close(fig)
+    return fig